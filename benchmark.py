@@ -0,0 +1,225 @@
+"""
+End-to-end benchmark of automate_web_actions against local mock devices (mock_device.py).
+
+Each unit provisions one fresh mock device: ECache deletion, Wi-Fi save, the simulated reboot,
+reconnect (resumed automatically), reload and the console command. Reports the wall time of every
+unit, the throughput and the per-step p50/p95 from the units' RunReports.
+
+    python benchmark.py --units 10 --workers 2 --ecache-files 50 --latency 0.02 --reboot-seconds 2
+    python benchmark.py --backend selenium --webdriver C:/path/msedgedriver.exe --units 3
+
+--compare-introspection instead opens the Files page of one mock device in Edge and compares the
+WebDriver round trips and latency of one PageIntrospector snapshot against reading the same state
+element by element, as the flow did before:
+
+    python benchmark.py --compare-introspection --webdriver C:/path/msedgedriver.exe --ecache-files 50
+
+--check-console feeds sample dfuu output through ConsoleOutputMonitor and exits non-zero if any
+sample is classified differently than expected.
+"""
+import argparse
+import concurrent.futures
+import json
+import sys
+import threading
+import time
+
+import update
+from mock_device import DELETE_ENDPOINT, DFUU_ENDINGS, DFUU_OUTPUT, MockDeviceState, start_mock_device
+from update import (DELETE_CONFIRM_XPATH, DEVICE_DRIVER_BACKENDS, ECACHE_DELETE_MODES, ECACHE_FILE_XPATH,
+                    ConsoleOutputMonitor, PageIntrospector, RunReport, SessionTimingSummary, _percentile,
+                    automate_web_actions, set_ecache_delete_endpoint)
+
+TARGET_SSID = "YourHomeNetwork"
+
+# Console lines and the outcome ConsoleOutputMonitor should read from each (None: the update goes on).
+CONSOLE_SAMPLE_LINES = [(line, None) for line in DFUU_OUTPUT] + [
+    ("dfuu: update complete, rebooting", "succeeded"),
+    ("DFUU: Update successful", "succeeded"),
+    ("update complete", "succeeded"),
+    ("dfuu: error: image verification failed", "failed"),
+    ("dfuu: error: download failed: timed out", "failed"),
+    ("dfuu: fatal: flash write failed", "failed"),
+    ("dfuu: update failed", "failed"),
+    ("dfuu: update aborted by user", "failed"),
+    ("dfuu: retrying after error", None),
+    ("dfuu: config not found, using defaults", None),
+    ("dfuu: no previous image found", None),
+    ("dfuu: last update failed, starting over", None),
+    ("dfuu: connected successfully", None),
+] + [(line, {"success": "succeeded", "failure": "failed"}[outcome])
+     for outcome, endings in DFUU_ENDINGS.items() for line in endings]
+
+
+def run_unit(index, args):
+    """Provisions one mock device. Returns (wall_seconds, RunReport, ecache_files_left)."""
+    state = MockDeviceState(ecache_files=args.ecache_files, networks=(TARGET_SSID, "Neighbor-5G"),
+                            latency=args.latency, failure_rate=args.failure_rate,
+                            reboot_seconds=args.reboot_seconds, seed=None if args.seed is None else args.seed + index,
+                            dfuu_seconds=args.dfuu_seconds)
+    server, url = start_mock_device(state)
+    log_func = print if args.verbose else (lambda message: None)
+    resume_event = threading.Event()
+    resume_event.set() # The mock needs no PC reconnect; the reboot is still waited out
+    report = RunReport(f"mock-{index}")
+    budgets = {"device_reboot": args.reboot_seconds + 5, "device_reachable": args.reboot_seconds + 10}
+    try:
+        start = time.perf_counter()
+        automate_web_actions(url, args.webdriver, "dfuu -i wlan --multi", log_func, lambda: None,
+                             TARGET_SSID, "password", resume_event, None, budgets,
+                             args.delete_mode, args.backend, run_report=report)
+        return time.perf_counter() - start, report, state.ecache_count()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _count_round_trips(driver):
+    """Wraps driver.execute (which WebElements call too) and returns a one-item list counting the calls."""
+    calls = [0]
+    execute = driver.execute
+    def counting_execute(*args, **kwargs):
+        calls[0] += 1
+        return execute(*args, **kwargs)
+    driver.execute = counting_execute
+    return calls
+
+
+def _read_files_page_per_element(driver):
+    """What the deletion loop used to read per poll: the file count, the ECache ids and the modal state."""
+    By = update.By
+    file_count = len(driver.find_elements(By.CSS_SELECTOR, "div.fs-file"))
+    ecache_ids = [e.get_attribute("data-id") for e in driver.find_elements(By.XPATH, ECACHE_FILE_XPATH)]
+    modal_visible = any(e.is_displayed() for e in driver.find_elements(By.XPATH, DELETE_CONFIRM_XPATH))
+    return file_count, ecache_ids, modal_visible
+
+
+def _read_files_page_snapshot(page):
+    snapshot = page.snapshot()
+    return len(snapshot.files), snapshot.ecache_ids, snapshot.modal_visible
+
+
+def compare_introspection(args):
+    """Times reading the Files page state element by element vs. with one snapshot. Returns the result dict."""
+    update.load_selenium()
+    state = MockDeviceState(ecache_files=args.ecache_files, networks=(TARGET_SSID,), latency=args.latency, seed=args.seed)
+    server, url = start_mock_device(state)
+    driver = update.webdriver.Edge(service=update.Service(args.webdriver))
+    try:
+        driver.get(url.rstrip("/") + "/files")
+        calls = _count_round_trips(driver)
+        page = PageIntrospector(driver)
+        readers = {"per_element": lambda: _read_files_page_per_element(driver),
+                   "snapshot": lambda: _read_files_page_snapshot(page)}
+        if readers["per_element"]() != readers["snapshot"]():
+            raise RuntimeError("The snapshot and the per-element reads disagree on the page state.")
+        result = {"ecache_files": args.ecache_files, "iterations": args.iterations}
+        for name, read in readers.items():
+            calls[0] = 0
+            timings = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                read()
+                timings.append(time.perf_counter() - start)
+            result[name] = {"round_trips_per_read": calls[0] / args.iterations,
+                            "p50_ms": round(_percentile(timings, 0.5) * 1000, 2),
+                            "p95_ms": round(_percentile(timings, 0.95) * 1000, 2)}
+            print(f"{name}: {result[name]['round_trips_per_read']:.0f} round trip(s)/read, "
+                  f"p50 {result[name]['p50_ms']}ms, p95 {result[name]['p95_ms']}ms")
+        return result
+    finally:
+        driver.quit()
+        server.shutdown()
+        server.server_close()
+
+
+def check_console_patterns():
+    """Classifies every CONSOLE_SAMPLE_LINES line on its own. Returns the mismatches as (line, expected, actual)."""
+    mismatches = []
+    for line, expected in CONSOLE_SAMPLE_LINES:
+        monitor = ConsoleOutputMonitor(lambda message: None)
+        monitor.feed(line + "\n")
+        if monitor.outcome != expected:
+            mismatches.append((line, expected, monitor.outcome))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark automate_web_actions against mock JuiceNet devices.")
+    parser.add_argument("--units", type=int, default=5, help="Number of devices to provision.")
+    parser.add_argument("--workers", type=int, default=1, help="Devices provisioned in parallel.")
+    parser.add_argument("--backend", choices=DEVICE_DRIVER_BACKENDS, default="http")
+    parser.add_argument("--webdriver", default=None, help="msedgedriver path (selenium backend).")
+    parser.add_argument("--delete-mode", choices=ECACHE_DELETE_MODES, default="script")
+    parser.add_argument("--ecache-files", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every mock response.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of an injected HTTP 500 per request.")
+    parser.add_argument("--reboot-seconds", type=float, default=1.0, help="Simulated reboot after the Wi-Fi save.")
+    parser.add_argument("--dfuu-seconds", type=float, default=0.0, help="How long the mock's firmware update prints output.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the results to this JSON file.")
+    parser.add_argument("--verbose", action="store_true", help="Print the automation log.")
+    parser.add_argument("--compare-introspection", action="store_true",
+                        help="Compare page snapshot reads with per-element WebDriver reads (needs --webdriver).")
+    parser.add_argument("--iterations", type=int, default=50, help="Reads per approach for --compare-introspection.")
+    parser.add_argument("--check-console", action="store_true",
+                        help="Check how sample dfuu console lines are classified, then exit.")
+    args = parser.parse_args()
+
+    if args.check_console:
+        mismatches = check_console_patterns()
+        for line, expected, actual in mismatches:
+            print(f"{line!r}: expected {expected}, got {actual}")
+        print(f"{len(CONSOLE_SAMPLE_LINES) - len(mismatches)}/{len(CONSOLE_SAMPLE_LINES)} console sample line(s) classified as expected")
+        sys.exit(1 if mismatches else 0)
+
+    if args.compare_introspection:
+        if not args.webdriver:
+            parser.error("--compare-introspection needs --webdriver")
+        result = compare_introspection(args)
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+        return
+
+    set_ecache_delete_endpoint(*DELETE_ENDPOINT) # The mock's route; a real charger's must be confirmed first
+    summary = SessionTimingSummary()
+    units = []
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [executor.submit(run_unit, index, args) for index in range(args.units)]
+        for index, future in enumerate(futures):
+            wall, report, left = future.result()
+            summary.add(report)
+            units.append({"unit": index, "wall": round(wall, 3), "succeeded": report.succeeded,
+                          "ecache_left": left, "retries": report.retries})
+            print(f"unit {index}: {wall:.2f}s {'ok' if report.succeeded else 'FAILED'}"
+                  f"{f', {left} ECache file(s) left' if left else ''}")
+    elapsed = time.perf_counter() - start
+
+    walls = [unit["wall"] for unit in units]
+    result = {
+        "units": args.units,
+        "workers": args.workers,
+        "backend": args.backend,
+        "delete_mode": args.delete_mode,
+        "elapsed": round(elapsed, 3),
+        "throughput_per_min": round(60 * args.units / elapsed, 2) if elapsed else None,
+        "unit_wall_p50": round(_percentile(walls, 0.5), 3) if walls else None,
+        "unit_wall_p95": round(_percentile(walls, 0.95), 3) if walls else None,
+        "succeeded": sum(1 for unit in units if unit["succeeded"]),
+        "steps": summary.summary(),
+        "per_unit": units,
+    }
+
+    print(f"\n{result['succeeded']}/{args.units} unit(s) succeeded in {elapsed:.2f}s "
+          f"({result['throughput_per_min']} units/min, wall p50 {result['unit_wall_p50']}s, p95 {result['unit_wall_p95']}s)")
+    summary.log_summary(print)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
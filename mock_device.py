@@ -0,0 +1,366 @@
+"""
+Local mock of the JuiceNet device web UI served at http://setup.com.
+
+Serves the pages and form endpoints update.py drives (Files with deletable ECache_ entries and a
+delete modal, Connect with the networks/ssid list and password form, Console with the cmdline
+input and its streamed output), so both device driver backends can be exercised without a physical charger.
+Response latency, injected failures and the reboot after a Wi-Fi save are configurable, so
+timing changes can be measured against it (see benchmark.py).
+
+Run standalone:  python mock_device.py --port 8080 --ecache-files 20 --latency 0.05 --reboot-seconds 5
+"""
+import argparse
+import hashlib
+import html
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockDeviceState:
+    """
+    Thread-safe state of one mock device: its file system, visible networks and console.
+    latency: seconds added to every response, or {path: seconds} (missing paths get no delay).
+    failure_rate: probability that a request fails with HTTP 500, or {path: probability}.
+    reboot_seconds: after a Wi-Fi save the device answers 503 for this long (0 disables the reboot).
+    reboot_delay: seconds between the Wi-Fi save and the start of the reboot.
+    seed: seeds the failure injection so runs are reproducible.
+    dfuu_seconds: how long a dfuu command takes to print its output (0 prints it at once).
+    dfuu_outcome: how dfuu ends, one of DFUU_OUTCOMES ("silent" stops printing halfway through).
+    A dfuu command with `--url URL` downloads its image from URL (e.g. update.py's firmware mirror)
+    and fails if it cannot; the SHA-256 of every downloaded image is kept in downloaded_images.
+    """
+    def __init__(self, ecache_files=10, other_files=("config.json", "log.txt"), networks=("YourHomeNetwork", "Neighbor-5G"),
+                 latency=0.0, failure_rate=0.0, reboot_seconds=0.0, reboot_delay=0.5, seed=None,
+                 dfuu_seconds=0.0, dfuu_outcome="success"):
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.reboot_seconds = reboot_seconds
+        self.reboot_delay = reboot_delay
+        self.random = random.Random(seed)
+        self.reboot_window = None # (start, end) monotonic times of the pending/current reboot
+        self.injected_failures = 0
+        self.files = {} # data-id -> file name
+        next_id = 1
+        for name in other_files:
+            self.files[str(next_id)] = name
+            next_id += 1
+        for i in range(ecache_files):
+            self.files[str(next_id)] = f"ECache_{i:04d}"
+            next_id += 1
+        self.networks = list(networks)
+        self.saved_wifi = None # (ssid, password) once saved
+        self.console_commands = []
+        self.console_output = "" # Everything the console printed, read back through /console/output
+        self.dfuu_seconds = dfuu_seconds
+        self.dfuu_outcome = dfuu_outcome
+        self.downloaded_images = []
+
+    def delete_file(self, data_id):
+        with self.lock:
+            return self.files.pop(data_id, None) is not None
+
+    def ecache_count(self):
+        with self.lock:
+            return sum(1 for name in self.files.values() if name.startswith("ECache_"))
+
+    def latency_for(self, path):
+        return self.latency.get(path, 0.0) if isinstance(self.latency, dict) else self.latency
+
+    def should_fail(self, path):
+        rate = self.failure_rate.get(path, 0.0) if isinstance(self.failure_rate, dict) else self.failure_rate
+        with self.lock:
+            failed = rate > 0 and self.random.random() < rate
+            if failed:
+                self.injected_failures += 1
+            return failed
+
+    def schedule_reboot(self):
+        if self.reboot_seconds > 0:
+            start = time.monotonic() + self.reboot_delay
+            with self.lock:
+                self.reboot_window = (start, start + self.reboot_seconds)
+
+    def is_rebooting(self):
+        with self.lock:
+            if not self.reboot_window:
+                return False
+            start, end = self.reboot_window
+        return start <= time.monotonic() < end
+
+    def _print(self, text):
+        with self.lock:
+            self.console_output += text
+
+    def read_console(self, offset=0):
+        with self.lock:
+            return self.console_output[offset:]
+
+    def run_console_command(self, command):
+        """
+        Records command and returns the console output the device prints for it at once.
+        dfuu prints the rest over dfuu_seconds in the background (read it through read_console).
+        """
+        with self.lock:
+            self.console_commands.append(command)
+        immediate = f"Running '{command}'\n"
+        if not command.startswith("dfuu"):
+            self._print(immediate)
+            return immediate
+        if self.dfuu_seconds <= 0:
+            immediate += "".join(line + "\n" for line in self._dfuu_lines(command))
+            self._print(immediate)
+            return immediate
+        self._print(immediate)
+
+        def stream():
+            lines = self._dfuu_lines(command)
+            for line in lines:
+                time.sleep(self.dfuu_seconds / len(lines))
+                self._print(line + "\n")
+
+        threading.Thread(target=stream, daemon=True).start()
+        return immediate
+
+    def _dfuu_lines(self, command):
+        """The console lines dfuu prints, downloading the image first when the command names a --url."""
+        lines = DFUU_OUTPUT
+        url = re.search(r"--url\s+(\S+)", command)
+        if url:
+            try:
+                with _direct_url_opener.open(url.group(1), timeout=30) as response:
+                    image = response.read()
+            except (urllib.error.URLError, OSError) as e:
+                return (f"dfuu: downloading firmware image from {url.group(1)}", f"dfuu: error: download failed: {e}")
+            with self.lock:
+                self.downloaded_images.append(hashlib.sha256(image).hexdigest())
+            lines = (f"dfuu: downloaded {len(image)} bytes from {url.group(1)}",) + DFUU_OUTPUT[1:]
+        if self.dfuu_outcome == "silent":
+            return lines[:len(lines) // 2 + 1]
+        return lines + DFUU_ENDINGS[self.dfuu_outcome]
+
+
+# The mirror is on the local network, so never route the image download through a system proxy.
+_direct_url_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+# Console output of a dfuu firmware update, and the line it ends with for each outcome.
+# The chatter lines mention errors without ending the update, as the real tool's output does.
+DFUU_OUTPUT = ("dfuu: downloading firmware image", "dfuu: config not found, using defaults",
+               "dfuu: no previous image found", "dfuu: progress 25%", "dfuu: retrying after error",
+               "dfuu: progress 50%", "dfuu: progress 75%", "dfuu: progress 100%")
+DFUU_ENDINGS = {"success": ("dfuu: update complete, rebooting",),
+                "failure": ("dfuu: error: image verification failed",),
+                "silent": ()}
+DFUU_OUTCOMES = tuple(DFUU_ENDINGS)
+
+# File-delete request the mock serves (pass to update.set_ecache_delete_endpoint).
+DELETE_ENDPOINT = ("/delete?id={data_id}", "POST")
+
+
+NAV_HTML = '<nav><a href="/">Home</a> <a href="/files">Files</a> <a href="/connect">Connect</a> <a href="/console">Console</a></nav>'
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>JuiceNet Setup (mock)</title></head>
+<body>
+{nav}
+{content}
+</body></html>"""
+
+FILES_SCRIPT = """
+<script>
+var pendingId = null;
+document.querySelectorAll('div.status').forEach(function (button) {
+    button.addEventListener('click', function () {
+        pendingId = button.getAttribute('data-id');
+        document.getElementById('delete-modal').style.display = 'block';
+    });
+});
+document.getElementById('confirm-delete').addEventListener('click', function () {
+    var id = pendingId;
+    fetch('/delete?id=' + encodeURIComponent(id), {method: 'POST'}).then(function (response) {
+        if (response.ok) {
+            var file = document.querySelector("div.fs-file[data-id='" + id + "']");
+            if (file) { file.remove(); }
+        }
+        document.getElementById('delete-modal').style.display = 'none';
+    });
+});
+</script>"""
+
+CONNECT_SCRIPT = """
+<script>
+var selectedSsid = null;
+document.querySelectorAll('div.network').forEach(function (network) {
+    network.addEventListener('click', function () {
+        selectedSsid = network.querySelector('div.ssid').textContent;
+        document.getElementById('wifi-form').style.display = 'block';
+    });
+});
+document.querySelector('button.save').addEventListener('click', function () {
+    var body = new URLSearchParams({ssid: selectedSsid, password: document.querySelector("input[name='password']").value});
+    fetch('/connect', {method: 'POST', body: body});
+});
+</script>"""
+
+CONSOLE_SCRIPT = """
+<script>
+var input = document.querySelector('input.cmdline');
+var output = document.querySelector('pre.output');
+var offset = 0;
+input.addEventListener('keydown', function (event) {
+    if (event.key !== 'Enter') { return; }
+    var command = input.value;
+    input.value = '';
+    fetch('/console', {method: 'POST', body: new URLSearchParams({cmd: command})});
+});
+setInterval(function () {
+    fetch('/console/output?offset=' + offset).then(function (r) { return r.ok ? r.text() : ''; })
+        .then(function (text) { offset += text.length; output.textContent += text; });
+}, 250);
+</script>"""
+
+
+class MockDeviceHandler(BaseHTTPRequestHandler):
+    """Request handler; the device state is taken from the server's `state` attribute."""
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _page(self, content):
+        self._send(200, PAGE_TEMPLATE.format(nav=NAV_HTML, content=content))
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return {k: v[0] for k, v in urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+
+    def _simulate(self, path):
+        """Applies the configured reboot, latency and failure injection. Returns True if the request was answered."""
+        state = self.server.state
+        if state.is_rebooting():
+            self._send(503, "Rebooting", "text/plain")
+            return True
+        delay = state.latency_for(path)
+        if delay:
+            time.sleep(delay)
+        if state.should_fail(path):
+            self._send(500, "Injected failure", "text/plain")
+            return True
+        return False
+
+    def do_GET(self):
+        state = self.server.state
+        path = urllib.parse.urlsplit(self.path).path
+        if self._simulate(path):
+            return
+        if path == "/":
+            self._page("<h1>JuiceNet Setup</h1>")
+        elif path == "/files":
+            with state.lock:
+                files = sorted(state.files.items(), key=lambda item: int(item[0]))
+            rows = []
+            for data_id, name in files:
+                if name.startswith("ECache_"):
+                    rows.append(f'<div class="file fs-file deletable" data-id="{data_id}">'
+                                f'<a href="http://setup.com/{html.escape(name)}">{html.escape(name)}</a>'
+                                f'<div class="status" data-id="{data_id}">Delete</div></div>')
+                else:
+                    rows.append(f'<div class="file fs-file" data-id="{data_id}">'
+                                f'<a href="http://setup.com/{html.escape(name)}">{html.escape(name)}</a></div>')
+            modal = ('<div id="delete-modal" class="modal" style="display:none">'
+                     '<p>Delete this file?</p><button id="confirm-delete" class="btn modal-primary">Delete</button></div>')
+            self._page('<div class="files">' + "".join(rows) + "</div>" + modal + FILES_SCRIPT)
+        elif path == "/connect":
+            networks = "".join(f'<div class="network"><div class="ssid">{html.escape(ssid)}</div></div>'
+                               for ssid in state.networks)
+            form = ('<div id="wifi-form" style="display:none"><input name="password" type="password">'
+                    '<button class="btn btn-lg save" type="button">Connect</button></div>')
+            self._page(f'<div class="networks">{networks}</div>{form}{CONNECT_SCRIPT}')
+        elif path == "/console/output":
+            offset = int(urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get("offset", ["0"])[0] or 0)
+            self._send(200, state.read_console(offset), "text/plain; charset=utf-8")
+        elif path == "/console":
+            self._page('<div class="console"><pre class="output"></pre><input class="cmdline" type="text"></div>' + CONSOLE_SCRIPT)
+        else:
+            self._send(404, "Not found", "text/plain")
+
+    def do_POST(self):
+        state = self.server.state
+        url = urllib.parse.urlsplit(self.path)
+        if self._simulate(url.path):
+            return
+        if url.path == "/delete":
+            data_id = urllib.parse.parse_qs(url.query).get("id", [""])[0]
+            if state.delete_file(data_id):
+                self._send(200, "OK", "text/plain")
+            else:
+                self._send(404, "No such file", "text/plain")
+        elif url.path == "/connect":
+            form = self._form()
+            with state.lock:
+                state.saved_wifi = (form.get("ssid"), form.get("password"))
+            state.schedule_reboot()
+            self._send(200, "Saved", "text/plain")
+        elif url.path == "/console":
+            self._send(200, state.run_console_command(self._form().get("cmd", "")), "text/plain")
+        else:
+            self._send(404, "Not found", "text/plain")
+
+
+def start_mock_device(state=None, host="127.0.0.1", port=0, verbose=False):
+    """
+    Starts a mock device server on a background thread.
+    Returns (server, url); call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), MockDeviceHandler)
+    server.daemon_threads = True
+    server.state = state or MockDeviceState()
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock JuiceNet device web UI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ecache-files", type=int, default=10, help="Number of ECache_ files on the device.")
+    parser.add_argument("--networks", default="YourHomeNetwork,Neighbor-5G", help="Comma-separated SSIDs the device sees.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of an injected HTTP 500 per request.")
+    parser.add_argument("--reboot-seconds", type=float, default=0.0, help="How long the device is down after a Wi-Fi save.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the failure injection.")
+    parser.add_argument("--dfuu-seconds", type=float, default=0.0, help="How long a dfuu command takes to print its output.")
+    parser.add_argument("--dfuu-outcome", choices=DFUU_OUTCOMES, default="success", help="How a dfuu command ends.")
+    args = parser.parse_args()
+
+    state = MockDeviceState(ecache_files=args.ecache_files, networks=args.networks.split(","), latency=args.latency,
+                            failure_rate=args.failure_rate, reboot_seconds=args.reboot_seconds, seed=args.seed,
+                            dfuu_seconds=args.dfuu_seconds, dfuu_outcome=args.dfuu_outcome)
+    server = ThreadingHTTPServer((args.host, args.port), MockDeviceHandler)
+    server.state = state
+    server.verbose = True
+    print(f"Mock JuiceNet device listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Parser for the netsh outputs update.py reads, turning them into typed records in one pass per output:
+
+    netsh wlan show networks mode=bssid   -> parse_networks()   -> [WifiNetwork] (with [BssidInfo])
+    netsh wlan show interfaces            -> parse_interfaces() -> [WlanInterface]
+    netsh interface ip show config        -> parse_ip_config()  -> [IpConfig]
+    netsh wlan show profiles              -> parse_profiles()   -> [profile name]
+
+Expects English netsh output (the commands are run after `chcp 65001`). Sample outputs live in
+netsh_samples/; `python netsh_parser.py --benchmark` times the parsers on them.
+"""
+import argparse
+import os
+import re
+import time
+from dataclasses import dataclass, field
+
+# "Key      : value" lines of `netsh wlan` and "Key:      value" lines of `netsh interface ip`.
+_FIELD_RE = re.compile(r"^\s*(?P<key>[^\s:][^:]*?)\s*:\s*(?P<value>.*?)\s*$")
+# Extra values of a multi-value field (e.g. further DNS servers) are listed alone on indented lines.
+_CONTINUATION_RE = re.compile(r"^\s{10,}(?P<value>\S+)\s*$")
+_SSID_KEY_RE = re.compile(r"^SSID (\d+)$")
+_BSSID_KEY_RE = re.compile(r"^BSSID (\d+)$")
+_IP_CONFIG_HEADER_RE = re.compile(r'^Configuration for interface "(?P<name>[^"]*)"\s*$')
+_PROFILE_RE = re.compile(r"^\s*(?:All User|Current User) Profile\s*:\s*(?P<name>.*?)\s*$", re.MULTILINE)
+_PERCENT_RE = re.compile(r"(\d+)\s*%")
+_IPV4_RE = re.compile(r"(?:\d{1,3}\.){3}\d{1,3}")
+_MASK_RE = re.compile(r"\(mask ((?:\d{1,3}\.){3}\d{1,3})\)")
+
+
+@dataclass
+class BssidInfo:
+    """One access point (radio) broadcasting a network."""
+    bssid: str
+    signal: int = None          # Percent
+    radio_type: str = None      # e.g. 802.11n
+    band: str = None            # e.g. 2.4 GHz (newer Windows builds only)
+    channel: int = None
+
+
+@dataclass
+class WifiNetwork:
+    """A network from `netsh wlan show networks mode=bssid`."""
+    ssid: str
+    interface: str = None       # Adapter that saw it
+    network_type: str = None    # Infrastructure / Adhoc
+    authentication: str = None  # e.g. WPA2-Personal, Open
+    encryption: str = None      # e.g. CCMP, None
+    bssids: list = field(default_factory=list)
+
+    @property
+    def signal(self):
+        """Strongest signal (percent) over the network's BSSIDs, or None if unknown."""
+        signals = [b.signal for b in self.bssids if b.signal is not None]
+        return max(signals) if signals else None
+
+
+@dataclass
+class WlanInterface:
+    """A Wi-Fi adapter from `netsh wlan show interfaces`."""
+    name: str
+    description: str = None
+    guid: str = None
+    physical_address: str = None
+    state: str = None           # e.g. connected, disconnected
+    ssid: str = None            # Connected network, None when not connected
+    bssid: str = None
+    network_type: str = None
+    radio_type: str = None
+    band: str = None
+    channel: int = None
+    authentication: str = None
+    cipher: str = None
+    receive_rate: float = None  # Mbps
+    transmit_rate: float = None # Mbps
+    signal: int = None          # Percent
+    profile: str = None
+
+    @property
+    def connected(self):
+        return self.state == "connected"
+
+
+@dataclass
+class IpConfig:
+    """IPv4 settings of one adapter from `netsh interface ip show config`."""
+    interface: str
+    dhcp_enabled: bool = None
+    ip_address: str = None
+    subnet_prefix: str = None   # e.g. 10.10.10.0/24
+    subnet_mask: str = None
+    default_gateway: str = None
+    dns_servers: list = field(default_factory=list)
+    dns_from_dhcp: bool = None  # True if the DNS servers were configured through DHCP
+
+
+def _fields(output):
+    """Yields (key, value, is_continuation) for every parseable line of output."""
+    for line in output.splitlines():
+        continuation = _CONTINUATION_RE.match(line)
+        if continuation:
+            yield None, continuation.group("value"), True
+            continue
+        match = _FIELD_RE.match(line)
+        if match:
+            yield match.group("key"), match.group("value"), False
+
+
+def _percent(value):
+    match = _PERCENT_RE.search(value)
+    return int(match.group(1)) if match else None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+_NETWORK_FIELDS = {"Network type": "network_type", "Authentication": "authentication", "Encryption": "encryption"}
+
+
+def parse_networks(output):
+    """Parses `netsh wlan show networks [mode=bssid]` output into WifiNetwork records (hidden SSIDs are "")."""
+    networks = []
+    interface = None
+    network = None
+    bssid = None
+    for key, value, _ in _fields(output):
+        if key is None:
+            continue
+        if key == "Interface name":
+            interface, network, bssid = value, None, None
+        elif _SSID_KEY_RE.match(key):
+            network = WifiNetwork(ssid=value, interface=interface)
+            networks.append(network)
+            bssid = None
+        elif network is None:
+            continue
+        elif _BSSID_KEY_RE.match(key):
+            bssid = BssidInfo(bssid=value)
+            network.bssids.append(bssid)
+        elif bssid is not None and key == "Signal":
+            bssid.signal = _percent(value)
+        elif bssid is not None and key == "Radio type":
+            bssid.radio_type = value
+        elif bssid is not None and key == "Band":
+            bssid.band = value
+        elif bssid is not None and key == "Channel":
+            bssid.channel = _int(value)
+        elif key in _NETWORK_FIELDS:
+            setattr(network, _NETWORK_FIELDS[key], value)
+    return networks
+
+
+_INTERFACE_FIELDS = {
+    "Description": ("description", str), "GUID": ("guid", str), "Physical address": ("physical_address", str),
+    "State": ("state", str), "SSID": ("ssid", str), "BSSID": ("bssid", str), "AP BSSID": ("bssid", str),
+    "Network type": ("network_type", str), "Radio type": ("radio_type", str), "Band": ("band", str),
+    "Channel": ("channel", _int), "Authentication": ("authentication", str), "Cipher": ("cipher", str),
+    "Receive rate (Mbps)": ("receive_rate", _float), "Transmit rate (Mbps)": ("transmit_rate", _float),
+    "Signal": ("signal", _percent), "Profile": ("profile", str),
+}
+
+
+def parse_interfaces(output):
+    """Parses `netsh wlan show interfaces` output into WlanInterface records."""
+    interfaces = []
+    interface = None
+    for key, value, _ in _fields(output):
+        if key == "Name":
+            interface = WlanInterface(name=value)
+            interfaces.append(interface)
+        elif interface is not None and key in _INTERFACE_FIELDS:
+            attribute, convert = _INTERFACE_FIELDS[key]
+            setattr(interface, attribute, convert(value))
+    return interfaces
+
+
+def parse_ip_config(output):
+    """Parses `netsh interface ip show config [name=...]` output into IpConfig records."""
+    configs = []
+    config = None
+    last_key = None
+    for line in output.splitlines():
+        header = _IP_CONFIG_HEADER_RE.match(line.strip())
+        if header:
+            config = IpConfig(interface=header.group("name"))
+            configs.append(config)
+            last_key = None
+            continue
+        if config is None:
+            continue
+        continuation = _CONTINUATION_RE.match(line)
+        if continuation:
+            if last_key == "dns" and _IPV4_RE.fullmatch(continuation.group("value")):
+                config.dns_servers.append(continuation.group("value"))
+            continue
+        match = _FIELD_RE.match(line)
+        if not match:
+            continue
+        key, value = match.group("key"), match.group("value")
+        last_key = None
+        if key == "DHCP enabled":
+            config.dhcp_enabled = value.lower() == "yes"
+        elif key == "IP Address" and config.ip_address is None:
+            config.ip_address = value
+        elif key == "Subnet Prefix":
+            config.subnet_prefix = value.split()[0] if value else None
+            mask = _MASK_RE.search(value)
+            config.subnet_mask = mask.group(1) if mask else None
+        elif key == "Default Gateway":
+            config.default_gateway = value or None
+        elif key.startswith("DNS servers configured through DHCP") or key.startswith("Statically Configured DNS Servers"):
+            config.dns_from_dhcp = key.startswith("DNS servers configured through DHCP")
+            config.dns_servers = [value] if _IPV4_RE.fullmatch(value) else []
+            last_key = "dns"
+    return configs
+
+
+def parse_profiles(output):
+    """Parses `netsh wlan show profiles` output into the list of profile names."""
+    return [name for name in _PROFILE_RE.findall(output) if name]
+
+
+def find_interface(interfaces, name=None):
+    """Returns the WlanInterface called name (or the only/first one if name is None or there is a single one)."""
+    if not interfaces:
+        return None
+    if name is None or len(interfaces) == 1:
+        return interfaces[0]
+    return next((interface for interface in interfaces if interface.name == name), None)
+
+
+# --- Benchmark ---
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "netsh_samples")
+# Sample file prefix -> parser
+SAMPLE_PARSERS = {"networks": parse_networks, "interfaces": parse_interfaces,
+                  "ip_config": parse_ip_config, "profiles": parse_profiles}
+
+
+def load_samples(directory=SAMPLES_DIR):
+    """Returns [(file name, parser, output)] for every sample in directory."""
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        parser = next((p for prefix, p in SAMPLE_PARSERS.items() if name.startswith(prefix)), None)
+        if parser and name.endswith(".txt"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                samples.append((name, parser, f.read()))
+    return samples
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Parse captured netsh outputs and optionally time the parsers.")
+    arg_parser.add_argument("--samples", default=SAMPLES_DIR, help="Directory of captured netsh outputs.")
+    arg_parser.add_argument("--benchmark", action="store_true", help="Time each parser over the samples.")
+    arg_parser.add_argument("--iterations", type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    for name, parser, output in load_samples(args.samples):
+        records = parser(output)
+        if not args.benchmark:
+            print(f"{name}: {len(records)} record(s)")
+            for record in records:
+                print(f"  {record}")
+            continue
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            parser(output)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(records)} record(s), {elapsed / args.iterations * 1e6:.1f} us/parse "
+              f"({len(output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from update import PROVISIONING_STATES, ProvisioningCheckpoint
+
+
+def test_fresh_checkpoint_has_nothing_completed(tmp_path):
+    checkpoint = ProvisioningCheckpoint.load(str(tmp_path), "JuiceNet-BC9", "YourHomeNetwork")
+    assert checkpoint.state is None
+    assert not any(checkpoint.completed(state) for state in PROVISIONING_STATES)
+
+
+@pytest.mark.parametrize("index", range(len(PROVISIONING_STATES)))
+def test_completed_covers_every_earlier_state(tmp_path, index):
+    checkpoint = ProvisioningCheckpoint(str(tmp_path), "JuiceNet-BC9", "YourHomeNetwork")
+    checkpoint.state = PROVISIONING_STATES[index]
+    assert [checkpoint.completed(state) for state in PROVISIONING_STATES] == \
+        [i <= index for i in range(len(PROVISIONING_STATES))]
+
+
+def test_advance_then_load_resumes(tmp_path):
+    ProvisioningCheckpoint(str(tmp_path), "JuiceNet-BC9", "YourHomeNetwork").advance("files_cleaned")
+    checkpoint = ProvisioningCheckpoint(str(tmp_path), "JuiceNet-BC9", "YourHomeNetwork")
+    checkpoint.advance("files_cleaned")
+    checkpoint.advance("wifi_pushed")
+
+    loaded = ProvisioningCheckpoint.load(str(tmp_path), "JuiceNet-BC9", "YourHomeNetwork")
+    assert loaded.state == "wifi_pushed"
+    assert [entry["state"] for entry in loaded.history] == ["files_cleaned", "wifi_pushed"]
+    assert loaded.completed("files_cleaned") and loaded.completed("wifi_pushed")
+    assert not loaded.completed("reconnected")
+    assert not (tmp_path / "JuiceNet-BC9.json.tmp").exists()
+
+
+def test_load_for_another_target_starts_over(tmp_path):
+    ProvisioningCheckpoint(str(tmp_path), "JuiceNet-BC9", "YourHomeNetwork").advance("wifi_pushed")
+    loaded = ProvisioningCheckpoint.load(str(tmp_path), "JuiceNet-BC9", "OtherNetwork")
+    assert loaded.state is None
+    assert loaded.history == []
+
+
+def test_load_after_done_starts_over(tmp_path):
+    ProvisioningCheckpoint(str(tmp_path), "JuiceNet-BC9", "YourHomeNetwork").advance("done")
+    assert ProvisioningCheckpoint.load(str(tmp_path), "JuiceNet-BC9", "YourHomeNetwork").state is None
+
+
+@pytest.mark.parametrize("content", ["{not json", json.dumps({"target_ssid": "YourHomeNetwork", "state": "unknown"})])
+def test_load_ignores_unusable_files(tmp_path, content):
+    (tmp_path / "JuiceNet-BC9.json").write_text(content, encoding="utf-8")
+    assert ProvisioningCheckpoint.load(str(tmp_path), "JuiceNet-BC9", "YourHomeNetwork").state is None
+
+
+def test_device_name_is_made_file_safe(tmp_path):
+    checkpoint = ProvisioningCheckpoint(str(tmp_path), "Juice/Net:1", "YourHomeNetwork")
+    checkpoint.advance("files_cleaned")
+    assert (tmp_path / "Juice_Net_1.json").exists()
+    assert ProvisioningCheckpoint.load(str(tmp_path), "Juice/Net:1", "YourHomeNetwork").state == "files_cleaned"
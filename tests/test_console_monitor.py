@@ -0,0 +1,49 @@
+import pytest
+
+from benchmark import CONSOLE_SAMPLE_LINES
+from update import ConsoleOutputMonitor
+
+
+@pytest.mark.parametrize("line, expected", CONSOLE_SAMPLE_LINES)
+def test_sample_line_outcome(line, expected):
+    monitor = ConsoleOutputMonitor(lambda message: None)
+    assert monitor.feed(line + "\n") == (expected is not None)
+    assert monitor.outcome == expected
+
+
+def test_line_split_across_chunks():
+    monitor = ConsoleOutputMonitor(lambda message: None)
+    assert not monitor.feed("dfuu: update com")
+    assert monitor.outcome is None
+    assert monitor.feed("plete, rebooting\r\n")
+    assert monitor.outcome == "succeeded"
+    assert monitor.outcome_line == "dfuu: update complete, rebooting"
+
+
+def test_flush_processes_unterminated_last_line():
+    monitor = ConsoleOutputMonitor(lambda message: None)
+    monitor.feed("dfuu: update failed")
+    assert monitor.outcome is None
+    assert monitor.flush()
+    assert monitor.outcome == "failed"
+
+
+def test_first_outcome_wins():
+    monitor = ConsoleOutputMonitor(lambda message: None)
+    monitor.feed("dfuu: error: image verification failed\nupdate complete\n")
+    assert monitor.outcome == "failed"
+    assert monitor.result()["line"] == "dfuu: error: image verification failed"
+
+
+def test_progress_reported_once_per_percentage():
+    statuses = []
+    monitor = ConsoleOutputMonitor(lambda message: None, statuses.append)
+    monitor.feed("Downloading 10%\nDownloading 10%\nWriting 55%\nbogus 250%\n")
+    assert statuses == ["Updating firmware 10%", "Updating firmware 55%"]
+    assert monitor.percent == 55
+
+
+def test_result_without_outcome_is_timeout():
+    monitor = ConsoleOutputMonitor(lambda message: None)
+    monitor.feed("dfuu: starting\n\n")
+    assert monitor.result() == {"outcome": "timeout", "percent": None, "line": None, "output_tail": ["dfuu: starting"]}
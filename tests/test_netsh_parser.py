@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+import netsh_parser
+from netsh_parser import (BssidInfo, IpConfig, find_interface, parse_interfaces, parse_ip_config, parse_networks,
+                          parse_profiles)
+
+
+def sample(name):
+    with open(os.path.join(netsh_parser.SAMPLES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_networks_with_bssids():
+    networks = parse_networks(sample("networks_bssid.txt"))
+    assert [n.ssid for n in networks] == ["JuiceNet-BC9", "YourHomeNetwork", "JuiceNet-7F2", ""]
+    assert {n.interface for n in networks} == {"Wi-Fi"}
+    home = networks[1]
+    assert (home.network_type, home.authentication, home.encryption) == ("Infrastructure", "WPA2-Personal", "CCMP")
+    assert home.bssids == [BssidInfo("3c:37:86:12:34:56", 62, "802.11ax", "5 GHz", 36),
+                           BssidInfo("3c:37:86:12:34:57", 91, "802.11ax", "2.4 GHz", 11)]
+    assert home.signal == 91
+    hidden = networks[3]
+    assert (hidden.authentication, hidden.encryption) == ("Open", "None")
+    assert hidden.bssids[0].band is None
+
+
+def test_networks_from_two_adapters():
+    networks = parse_networks(sample("networks_two_adapters.txt"))
+    assert [(n.ssid, n.interface, n.signal) for n in networks] == [
+        ("JuiceNet-BC9", "Wi-Fi", 80), ("YourHomeNetwork", "Wi-Fi", 88), ("JuiceNet-7F2", "Wi-Fi 2", 73)]
+
+
+def test_connected_interface():
+    [interface] = parse_interfaces(sample("interfaces_connected.txt"))
+    assert (interface.name, interface.state, interface.ssid, interface.bssid) == \
+        ("Wi-Fi", "connected", "JuiceNet-BC9", "9c:9c:1f:4a:bc:09")
+    assert (interface.signal, interface.channel, interface.band) == (88, 6, "2.4 GHz")
+    assert (interface.receive_rate, interface.transmit_rate) == (144.4, 144.4)
+    assert interface.profile == "JuiceNet-BC9"
+
+
+def test_disconnected_interface_has_no_connection_fields():
+    [interface] = parse_interfaces(sample("interfaces_disconnected.txt"))
+    assert (interface.name, interface.state) == ("Wi-Fi", "disconnected")
+    assert interface.description == "Intel(R) Dual Band Wireless-AC 8265"
+    assert interface.ssid is None and interface.signal is None and interface.profile is None
+
+
+def test_two_interfaces_and_find_interface():
+    interfaces = parse_interfaces(sample("interfaces_two_adapters.txt"))
+    assert [(i.name, i.ssid, i.signal) for i in interfaces] == [
+        ("Wi-Fi", "YourHomeNetwork", 91), ("Wi-Fi 2", "JuiceNet-7F2", 73)]
+    assert find_interface(interfaces, "Wi-Fi 2") is interfaces[1]
+    assert find_interface(interfaces) is interfaces[0]
+    assert find_interface(interfaces, "Ethernet") is None
+    assert find_interface([], "Wi-Fi") is None
+
+
+def test_find_interface_single_adapter_ignores_name():
+    interfaces = parse_interfaces(sample("interfaces_connected.txt"))
+    assert find_interface(interfaces, "Wi-Fi 2") is interfaces[0]
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("ip_config_static.txt", [IpConfig("Wi-Fi", False, "10.10.10.2", "10.10.10.0/24", "255.255.255.0", "10.10.10.1",
+                                       ["10.10.10.1"], False)]),
+    ("ip_config_dhcp.txt", [IpConfig("Wi-Fi", True, "192.168.1.57", "192.168.1.0/24", "255.255.255.0", "192.168.1.1",
+                                     ["192.168.1.1", "8.8.8.8"], True)]),
+    ("ip_config_all.txt", [IpConfig("Ethernet", True, dns_from_dhcp=True),
+                           IpConfig("Wi-Fi", True, "10.10.10.100", "10.10.10.0/24", "255.255.255.0", "10.10.10.1",
+                                    ["10.10.10.1"], True),
+                           IpConfig("Loopback Pseudo-Interface 1", False, "127.0.0.1", "127.0.0.0/8", "255.0.0.0",
+                                    dns_from_dhcp=False)]),
+])
+def test_ip_config(name, expected):
+    assert parse_ip_config(sample(name)) == expected
+
+
+def test_profiles_keep_names_with_colons():
+    assert parse_profiles(sample("profiles.txt")) == ["YourHomeNetwork", "JuiceNet-BC9", "JuiceNet-7F2", "Coffee Shop: Guest"]
+
+
+def test_load_samples_pairs_every_sample_with_its_parser():
+    samples = netsh_parser.load_samples()
+    assert len(samples) == len([n for n in os.listdir(netsh_parser.SAMPLES_DIR) if n.endswith(".txt")])
+    for name, parser, output in samples:
+        prefix = next(prefix for prefix in netsh_parser.SAMPLE_PARSERS if name.startswith(prefix))
+        assert parser is netsh_parser.SAMPLE_PARSERS[prefix]
+        assert parser(output)
+
+
+@pytest.mark.parametrize("parser", [parse_networks, parse_interfaces, parse_ip_config, parse_profiles])
+def test_empty_output(parser):
+    assert parser("") == []
@@ -0,0 +1,35 @@
+import pytest
+
+from update import _xpath_literal
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("YourHomeNetwork", "'YourHomeNetwork'"),
+    ("", "''"),
+    ('Say "hi"', "'Say \"hi\"'"),
+    ("Bob's Wi-Fi", '"Bob\'s Wi-Fi"'),
+    ("Bob's \"5G\"", "concat('Bob', \"'\", 's \"5G\"')"),
+    ("'\"'", "concat('', \"'\", '\"', \"'\", '')"),
+])
+def test_literal(value, expected):
+    assert _xpath_literal(value) == expected
+
+
+def _evaluate(literal):
+    """Evaluates the string literal or concat() of quoted literals _xpath_literal produces."""
+    if literal.startswith("concat(") and literal.endswith(")"):
+        parts, rest = [], literal[len("concat("):-1]
+        while rest:
+            quote = rest[0]
+            end = rest.index(quote, 1)
+            parts.append(rest[1:end])
+            rest = rest[end + 1:].lstrip(", ")
+        return "".join(parts)
+    assert literal[0] == literal[-1] and literal[0] in "'\""
+    assert literal[0] not in literal[1:-1]
+    return literal[1:-1]
+
+
+@pytest.mark.parametrize("value", ["plain", "it's", 'a "b"', "it's \"both\"", "''\"\"'", "trailing'"])
+def test_literal_round_trips(value):
+    assert _evaluate(_xpath_literal(value)) == value
@@ -1,258 +1,3829 @@
 import tkinter as tk
-from tkinter import scrolledtext, messagebox, ttk
+from tkinter import scrolledtext, messagebox, ttk, filedialog
 import tkinter.font as tkFont # Import the font module
+import argparse
 import sys
 import os
 import threading
 import time
+import datetime
 import subprocess
 import re
+import urllib.request
+import urllib.error
+import urllib.parse
+import csv
+import collections
+import gzip
+import concurrent.futures
+import queue
+import hashlib
+import heapq
+import shlex
+import ipaddress
+import contextlib
+import json
+import logging
+import logging.handlers
+import shutil
+import socket
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import netsh_parser
+
+STARTUP_T0 = time.perf_counter() # Reference point of the --startup-timing measurements
 
 print("--- Script has started execution! ---")
 print("--- Standard library imports complete ---")
 
 # --- Selenium imports ---
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+# Importing the Selenium stack takes a large share of the start-up time (especially in the frozen
+# executable), so its names are only bound by load_selenium() when a browser is first needed.
+# Until then the exception names point at a class nothing raises, so `except` clauses stay valid.
+class _SeleniumNotLoaded(Exception):
+    """Placeholder for the Selenium exception types before load_selenium() has run."""
 
-print("--- Selenium imports complete ---")
 
-# --- Helper function for web automation ---
-def automate_web_actions(url, webdriver_path, command_to_type, log_func, set_static_ip_func,
-                         target_wifi_ssid_web, target_wifi_password_web, resume_event, app_instance):
+webdriver = Service = By = WebDriverWait = EC = None
+TimeoutException = NoSuchElementException = StaleElementReferenceException = _SeleniumNotLoaded
+_selenium_lock = threading.Lock()
+
+
+def load_selenium():
+    """Imports Selenium (once, from any thread) and binds its names in this module."""
+    global webdriver, Service, By, WebDriverWait, EC
+    global TimeoutException, NoSuchElementException, StaleElementReferenceException
+    with _selenium_lock:
+        if webdriver is not None:
+            return
+        from selenium.webdriver.edge.service import Service
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+        from selenium import webdriver # Bound last: it marks the names above as loaded
+    print("--- Selenium imports complete ---")
+
+# --- Cooperative cancellation ---
+class OperationCancelled(BaseException):
     """
-    Automates web actions. Output is sent via log_func.
-    set_static_ip_func is a callback to set the static IP.
-    target_wifi_ssid_web and target_wifi_password_web are for the device's web UI.
-    resume_event: A threading.Event to signal when to resume script.
-    app_instance: Reference to the Application instance to update GUI elements.
+    Raised inside a run whose CancellationToken was cancelled. Derives from BaseException (like
+    asyncio.CancelledError) so the flow's broad `except Exception` handlers do not swallow it.
+    """
+
+
+class CancellationToken:
+    """
+    Cancels one provisioning run. While a token is active on a thread (see activate), waits, sleeps
+    and PC network commands on that thread observe it and raise OperationCancelled within a fraction
+    of a second; on_cancel callbacks tear down what cannot poll (the browser, a running shell command).
+    """
+    POLL_INTERVAL = 0.2
+
+    def __init__(self):
+        self.reason = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="Cancelled"):
+        """Cancels the run (once) and calls the on_cancel callbacks on this thread."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass # Tearing down is best effort
+
+    def on_cancel(self, callback):
+        """Calls callback when the token is cancelled (right away if it already is). Returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._callbacks.remove(callback) if callback in self._callbacks else None
+        callback()
+        return lambda: None
+
+    def wait(self, timeout=None):
+        """Waits up to timeout seconds for a cancellation without raising. Returns True if the token was cancelled."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled(self.reason)
+
+    def sleep(self, seconds):
+        """time.sleep that raises OperationCancelled as soon as the token is cancelled."""
+        if self._event.wait(seconds):
+            raise OperationCancelled(self.reason)
+
+    def wait_for(self, event, timeout=None):
+        """event.wait(timeout) that raises OperationCancelled as soon as the token is cancelled."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.raise_if_cancelled()
+            remaining = self.POLL_INTERVAL if deadline is None else min(self.POLL_INTERVAL, deadline - time.monotonic())
+            if remaining <= 0:
+                return event.is_set()
+            if event.wait(remaining):
+                return True
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Makes this the current thread's token for cancellable_sleep()/check_cancelled()/run_cancellable()."""
+        previous = getattr(_active_cancel, "token", None)
+        _active_cancel.token = self
+        try:
+            yield self
+        finally:
+            _active_cancel.token = previous
+
+
+# The CancellationToken of the run executing on the current thread (see CancellationToken.activate).
+_active_cancel = threading.local()
+
+
+def current_cancel_token():
+    return getattr(_active_cancel, "token", None)
+
+
+def check_cancelled():
+    """Raises OperationCancelled if the current thread's run was cancelled."""
+    token = current_cancel_token()
+    if token:
+        token.raise_if_cancelled()
+
+
+def cancellable_sleep(seconds):
+    token = current_cancel_token()
+    if token:
+        token.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def run_cancellable(args, timeout=None, **popen_options):
     """
-    service = Service(webdriver_path)
-    driver = None
+    subprocess.run(args, capture_output=True, text=True, check=True) that kills the child process
+    as soon as the current thread's run is cancelled (raising OperationCancelled).
+    """
+    token = current_cancel_token()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **popen_options) as process:
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=CancellationToken.POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if token and token.cancelled:
+                    process.kill()
+                    process.communicate()
+                    raise OperationCancelled(token.reason)
+                if deadline is not None and time.monotonic() > deadline:
+                    process.kill()
+                    process.communicate()
+                    raise subprocess.TimeoutExpired(args, timeout)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(args, process.returncode, stdout=stdout, stderr=stderr)
+
+
+# --- Condition-driven wait configuration ---
+# Upper-bound budget (in seconds) for each readiness wait in automate_web_actions.
+# Every wait returns as soon as its condition is met; the budget only caps it.
+DEFAULT_WAIT_BUDGETS = {
+    "files_list": 10,        # File list rendered after clicking 'Files'
+    "ecache_delete": 10,     # Delete modal closed and the file gone from the list
+    "delete_modal": 10,      # Delete confirmation shown after clicking a file's delete button
+    "stale_retry": 1,        # Back-off after a StaleElementReferenceException
+    "error_retry": 2,        # Back-off after an unexpected deletion error
+    "connect_page": 10,      # 'Connect' link available after the deletion loop
+    "network_list": 20,      # Target network listed on the 'Connect' page
+    "password_field": 10,    # Password input shown after clicking a network
+    "device_reboot": 90,     # Device stops answering after saving Wi-Fi (reboot started)
+    "device_reachable": 30,  # Device answers again after the static IP is applied
+    "page_refresh": 15,      # Page reloaded and 'Console' link present
+    "console_open": 10,      # Console input shown after clicking 'Console'
+    "command_sent": 5,       # Console input cleared after pressing ENTER
+    "command_complete": 300, # Console output reports the firmware update's success or failure
+    "ecache_bulk": 60,       # Whole batch of ECache deletions in "script"/"http" mode
+    "adapter_connect": 30,   # Batch job's adapter associated with the device's access point
+    "auto_resume": 600,      # Auto-resume: device SSID reappears after reboot (then the manual button remains)
+    "device_probe": 15,      # Auto-resume: device UI answers after the PC rejoined its SSID
+}
+
+# Fixed delays the waits above replaced, used to report how much time was saved.
+LEGACY_FIXED_DELAYS = {
+    "files_list": 2,
+    "ecache_delete": 4.5,    # 0.5 s before the pass + 1 s after delete + 3 s after confirm
+    "stale_retry": 1,
+    "error_retry": 2,
+    "connect_page": 2,
+    "password_field": 2,
+    "device_reboot": 90,
+    "device_reachable": 5,
+    "page_refresh": 5,
+    "console_open": 2,
+    "command_sent": 5,
+}
+
+ECACHE_FILE_XPATH = ("//div[contains(@class, 'file') and contains(@class, 'fs-file') and contains(@class, 'deletable') "
+                     "and .//a[starts-with(@href, 'http://setup.com/ECache_') or starts-with(text(), 'ECache_')]]")
+DELETE_CONFIRM_XPATH = "//button[contains(@class, 'modal-primary') and contains(text(), 'Delete')]"
+FILES_LINK_XPATH = "//a[contains(.,'Files')]"
+FILE_LIST_SELECTOR = "div.files" # Container the Files page renders its file rows into
+
+# How ECache files are removed in Step 2:
+#   "script" - one injected script drives the Files page's own delete/confirm UI for every file
+#   "http"   - one injected script calls the device's file-delete endpoint for every file
+#              (needs the endpoint to be configured; falls back to "script" otherwise)
+#   "legacy" - one file per pass through WebDriver clicks
+ECACHE_DELETE_MODES = ("script", "http", "legacy")
+# File-delete request issued by the Files page; {data_id} is the file's data-id attribute.
+# The firmware's route is not documented, so it is unset until confirmed against a charger and
+# configured with set_ecache_delete_endpoint() (--ecache-delete-endpoint, Application.ECACHE_DELETE_ENDPOINT).
+# Without it the "http" mode uses "script" and the http driver backend cannot delete files.
+ECACHE_DELETE_METHOD = "POST"
+ECACHE_DELETE_PATH = None
+
+
+def set_ecache_delete_endpoint(path, method="POST"):
+    """Configures the device's file-delete request, e.g. ("/delete?id={data_id}", "POST"); None disables it."""
+    global ECACHE_DELETE_PATH, ECACHE_DELETE_METHOD
+    if path is not None and "{data_id}" not in path:
+        raise ValueError(f"The ECache delete path '{path}' has no {{data_id}} placeholder.")
+    ECACHE_DELETE_PATH, ECACHE_DELETE_METHOD = path, method.upper()
+
+# setup.com only resolves on the device's network, so never route probes through a system proxy.
+_direct_url_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+def is_url_reachable(url, timeout=2):
+    """Returns True if the web server at url answers with a non-5xx response."""
     try:
-        log_func("\n--- Starting Web Automation ---")
-        driver = webdriver.Edge(service=service)
-        driver.maximize_window()
+        with _direct_url_opener.open(url, timeout=timeout):
+            return True
+    except urllib.error.HTTPError as e:
+        return e.code < 500
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+class WaitTracker:
+    """
+    Runs condition-driven waits, each capped by a per-step budget, and records how long
+    every wait actually took compared with the fixed sleep it replaced.
+    """
+    def __init__(self, log_func, budgets=None, poll_interval=0.25):
+        self.log_func = log_func
+        self.budgets = dict(DEFAULT_WAIT_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+        self.poll_interval = poll_interval
+        self.records = [] # (step, waited_seconds, legacy_seconds, condition_met)
+
+    def wait(self, step, condition, legacy_delay=None):
+        """
+        Polls condition() until it returns a truthy value or the step's budget runs out.
+        Exceptions raised by the condition (e.g. a stale element mid-render) count as "not yet".
+        Raises OperationCancelled if the current thread's run is cancelled meanwhile.
+        legacy_delay overrides the fixed delay this wait is reported against (0 for new waits).
+        Returns True if the condition was met.
+        """
+        budget = self.budgets.get(step, LEGACY_FIXED_DELAYS.get(step, 0))
+        start = time.monotonic()
+        met = False
+        while True:
+            check_cancelled()
+            try:
+                if condition():
+                    met = True
+                    break
+            except Exception:
+                pass
+            remaining = budget - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            cancellable_sleep(min(self.poll_interval, remaining))
+
+        waited = time.monotonic() - start
+        if legacy_delay is None:
+            legacy_delay = LEGACY_FIXED_DELAYS.get(step, 0)
+        self.records.append((step, waited, legacy_delay, met))
+        if not met:
+            self.log_func(f"Wait '{step}' reached its {budget}s budget without its condition being met. Continuing.")
+        return met
+
+    def log_report(self):
+        """Logs per-step and total waiting time against the old fixed delays."""
+        if not self.records:
+            return
+        totals = {}
+        for step, waited, legacy, _ in self.records:
+            count, waited_sum, legacy_sum = totals.get(step, (0, 0.0, 0.0))
+            totals[step] = (count + 1, waited_sum + waited, legacy_sum + legacy)
+
+        self.log_func("\n--- Wait timing report ---")
+        for step, (count, waited_sum, legacy_sum) in totals.items():
+            self.log_func(f"{step}: {count} wait(s), {waited_sum:.1f}s actual vs {legacy_sum:.1f}s fixed")
+        total_waited = sum(waited for _, waited, _, _ in self.records)
+        total_legacy = sum(legacy for _, _, legacy, _ in self.records)
+        self.log_func(f"Total waiting: {total_waited:.1f}s (fixed delays would have been {total_legacy:.1f}s, "
+                      f"saved {total_legacy - total_waited:.1f}s).")
+
+
+# --- Step timing and run reports ---
+# The RunReport of the provisioning run executing on the current thread (see RunReport.activate).
+_active_run = threading.local()
+
+
+class RunReport:
+    """
+    Timing spans, retries, exceptions and screenshot paths of one provisioning run.
+    Spans are opened with step_span() anywhere on the run's thread while the report is active,
+    so helpers (netsh calls, deletion retries) do not need the report passed to them.
+    """
+    def __init__(self, device=None):
+        self.device = device
+        self.started = time.time()
+        self._start = time.monotonic()
+        self.duration = None
+        self.succeeded = None
+        self.spans = [] # {"step", "offset", "duration", "error"}
+        self.retries = {} # step -> count
+        self.exceptions = [] # {"step", "type", "message"}
+        self.screenshots = []
+        self.waits = [] # WaitTracker records
+        self.command_result = None # ConsoleOutputMonitor.result() of the console command
+        self.artifacts = None # ArtifactRun receiving capture_artifact() output
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Makes this the current thread's report for step_span()/record_retry()/capture_artifact()."""
+        previous = getattr(_active_run, "report", None)
+        _active_run.report = self
+        try:
+            yield self
+        finally:
+            _active_run.report = previous
+
+    @contextlib.contextmanager
+    def span(self, step):
+        """Times the enclosed block as step; an exception escaping it is recorded and re-raised."""
+        start = time.monotonic()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            with self._lock:
+                self.exceptions.append({"step": step, "type": type(e).__name__, "message": str(e)})
+            raise
+        finally:
+            with self._lock:
+                self.spans.append({"step": step, "offset": round(start - self._start, 3),
+                                   "duration": round(time.monotonic() - start, 3), "error": error})
+
+    def add_retry(self, step):
+        with self._lock:
+            self.retries[step] = self.retries.get(step, 0) + 1
+
+    def add_screenshot(self, path):
+        with self._lock:
+            self.screenshots.append(os.path.abspath(path))
+
+    def finish(self, succeeded, wait_records=()):
+        self.duration = time.monotonic() - self._start
+        self.succeeded = succeeded
+        self.waits = [{"step": step, "waited": round(waited, 3), "legacy": legacy, "met": met}
+                      for step, waited, legacy, met in wait_records]
+
+    def step_totals(self):
+        """Returns {step: total seconds} summed over the run's spans of each step."""
+        totals = {}
+        for span in self.spans:
+            totals[span["step"]] = totals.get(span["step"], 0.0) + span["duration"]
+        return totals
+
+    def to_dict(self):
+        return {
+            "device": self.device,
+            "started": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "duration": None if self.duration is None else round(self.duration, 3),
+            "succeeded": self.succeeded,
+            "steps": self.spans,
+            "step_totals": {step: round(total, 3) for step, total in self.step_totals().items()},
+            "retries": self.retries,
+            "exceptions": self.exceptions,
+            "screenshots": self.screenshots,
+            "waits": self.waits,
+            "command_result": self.command_result,
+        }
+
+    def save(self, directory):
+        """Writes the report as JSON into directory and returns the file path."""
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.datetime.fromtimestamp(self.started).strftime("%Y%m%d_%H%M%S")
+        device = re.sub(r"[^\w.-]", "_", self.device or "device")
+        path = os.path.join(directory, f"run_{stamp}_{device}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+def step_span(step):
+    """Times the enclosed block as step in the current thread's RunReport (no-op outside a run)."""
+    report = getattr(_active_run, "report", None)
+    return report.span(step) if report else contextlib.nullcontext()
+
+
+def record_retry(step):
+    report = getattr(_active_run, "report", None)
+    if report:
+        report.add_retry(step)
+
+
+def record_command_result(result):
+    report = getattr(_active_run, "report", None)
+    if report:
+        report.command_result = result
+
+
+def _percentile(values, fraction):
+    """Linearly interpolated percentile of values (fraction 0..1), or None if empty."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class SessionTimingSummary:
+    """Collects the RunReports of a session and summarizes each step's duration across runs."""
+    def __init__(self):
+        self.reports = []
+        self._lock = threading.Lock()
+
+    def add(self, report):
+        with self._lock:
+            self.reports.append(report)
+
+    def summary(self):
+        """Returns {step: {"runs", "p50", "p95", "max"}} over the per-run totals of every step."""
+        with self._lock:
+            reports = list(self.reports)
+        samples = {}
+        for report in reports:
+            for step, total in report.step_totals().items():
+                samples.setdefault(step, []).append(total)
+        return {step: {"runs": len(values), "p50": round(_percentile(values, 0.5), 3),
+                       "p95": round(_percentile(values, 0.95), 3), "max": round(max(values), 3)}
+                for step, values in samples.items()}
+
+    def save(self, path):
+        with self._lock:
+            runs = len(self.reports)
+            succeeded = sum(1 for report in self.reports if report.succeeded)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"runs": runs, "succeeded": succeeded, "steps": self.summary()}, f, indent=2)
+
+    def log_summary(self, log_func):
+        log_func("\n--- Session step timing (p50 / p95 over runs) ---")
+        for step, stats in self.summary().items():
+            log_func(f"{step}: {stats['p50']:.1f}s / {stats['p95']:.1f}s ({stats['runs']} run(s), max {stats['max']:.1f}s)")
+
+
+# --- Diagnostic artifacts ---
+# What capture_artifact() records of the page: a PNG screenshot, the DOM (gzip-compressed HTML), both, or nothing.
+ARTIFACT_MODES = ("screenshot", "dom", "both", "off")
+
+
+class ArtifactWriter:
+    """
+    Writes diagnostic artifacts (screenshots, DOM snapshots) on a background thread, so capturing
+    one never waits for the disk. Each run gets its own directory under root (see start_run).
+    The queue is bounded: when the writer falls behind, further artifacts are dropped, not waited for.
+    max_bytes caps everything under root; the oldest files (from any run) are deleted to stay under it.
+    """
+    def __init__(self, root, log_func, mode="screenshot", max_bytes=200 * 1024 * 1024, queue_size=32):
+        if mode not in ARTIFACT_MODES:
+            raise ValueError(f"Unknown artifact mode '{mode}'. Expected one of {ARTIFACT_MODES}.")
+        self.root = root
+        self.log_func = log_func
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._runs = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._files = None # deque of (path, size), oldest first; built by the worker on its first write
+        self._total_bytes = 0
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def start_run(self, device=None):
+        """Returns the ArtifactRun (and directory) for one provisioning run's artifacts."""
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        name = re.sub(r"[^\w.-]", "_", device or "device")
+        with self._lock:
+            self._runs += 1
+            number = self._runs
+        directory = os.path.join(os.path.abspath(self.root), f"{stamp}_{name}_{number:03d}")
+        return ArtifactRun(self, directory)
+
+    def submit(self, path, data, compress=False):
+        """Queues data to be written to path (gzip-compressed first if compress). Returns False if dropped."""
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+                self._worker.start()
+        try:
+            self._queue.put_nowait((path, data, compress))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            self.log_func(f"Artifact writer is behind; dropped '{os.path.basename(path)}' ({self.dropped} dropped so far).")
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except OSError as e:
+                self.log_func(f"Could not write artifact '{item[0]}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def _scan_existing(self):
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        files.sort()
+        self._files = collections.deque((path, size) for _, path, size in files)
+        self._total_bytes = sum(size for _, size in self._files)
+
+    def _write(self, path, data, compress):
+        if self._files is None:
+            self._scan_existing()
+        if compress:
+            data = gzip.compress(data)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        self._files.append((path, len(data)))
+        self._total_bytes += len(data)
+        self._evict(keep=path)
+
+    def _evict(self, keep):
+        """Deletes the oldest artifacts until the total is back under max_bytes."""
+        while self._total_bytes > self.max_bytes and self._files and self._files[0][0] != keep:
+            path, size = self._files.popleft()
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+                directory = os.path.dirname(path)
+                if directory != self.root and not os.listdir(directory):
+                    os.rmdir(directory)
+            except OSError:
+                pass
+
+    def flush(self):
+        """Blocks until every queued artifact has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Writes what is queued, then stops the worker."""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker:
+            self._queue.put(None)
+            worker.join(timeout=10)
+
+
+class ArtifactRun:
+    """
+    One run's artifact directory. Captures are numbered in order, and a frame identical to one
+    already captured in the run (e.g. the same error page on every retry) is not written again.
+    """
+    def __init__(self, writer, directory):
+        self.writer = writer
+        self.directory = directory
+        self._sequence = 0
+        self._digests = {} # sha256 of the raw data -> path it was written to
+        self._lock = threading.Lock()
+
+    def add(self, name, data, compress=False):
+        """
+        Hands one artifact to the writer. Returns its path (an earlier identical one's when deduplicated),
+        or None if the writer dropped it.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._digests:
+                return self._digests[digest]
+            self._sequence += 1
+            path = os.path.join(self.directory, f"{self._sequence:03d}_{name}")
+            self._digests[digest] = path
+        if not self.writer.submit(path, data, compress):
+            with self._lock:
+                del self._digests[digest] # Let a later identical frame try again
+            return None
+        return path
+
+    def capture(self, driver, name):
+        """Captures driver's page per the writer's mode. Returns the paths of the artifacts not dropped."""
+        mode = self.writer.mode
+        paths = []
+        if mode in ("screenshot", "both"):
+            paths.append(self.add(f"{name}.png", driver.get_screenshot_as_png()))
+        if mode in ("dom", "both"):
+            paths.append(self.add(f"{name}.html.gz", driver.page_source.encode("utf-8"), compress=True))
+        return [path for path in paths if path]
+
+
+def capture_artifact(driver, name):
+    """
+    Captures driver's page into the current run's ArtifactRun (RunReport.artifacts) and records the
+    paths in the report. Returns the paths; [] outside a run, without an artifact writer, or on failure.
+    """
+    report = getattr(_active_run, "report", None)
+    if report is None or report.artifacts is None:
+        return []
+    try:
+        paths = report.artifacts.capture(driver, name)
+    except Exception:
+        return [] # The browser may be the thing that failed; a missing artifact must not fail the run
+    for path in paths:
+        if path not in report.screenshots:
+            report.add_screenshot(path)
+    return paths
+
+
+def _file_list_settled(page):
+    """
+    Condition: the number of listed files did not change since the last poll. An empty list only
+    counts once the file list container has rendered, so a page still loading is not read as "no files".
+    """
+    last_count = [None]
+    def condition():
+        snapshot = page.snapshot()
+        count = len(snapshot.files)
+        settled = count == last_count[0] and (count > 0 or snapshot.file_list_visible)
+        last_count[0] = count
+        return settled
+    return condition
+
+
+def _xpath_literal(value):
+    """Quotes value as an XPath string literal; values containing both quote kinds are built with concat()."""
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    return "concat(" + ", \"'\", ".join(f"'{part}'" for part in value.split("'")) + ")"
+
+
+def _document_ready(driver):
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+# Element showing the device console's output, and the script reading its text.
+CONSOLE_OUTPUT_SELECTOR = "pre.output, .console pre"
+_CONSOLE_TEXT_JS = "var el = document.querySelector(arguments[0]); return el ? el.textContent : '';"
+
+
+# --- Page introspection ---
+# Everything the provisioning steps poll for, gathered inside the page in one execute_script call.
+# arguments: ECache file XPath, delete confirm button XPath, console output selector.
+_PAGE_SNAPSHOT_JS = """
+var ecacheXPath = arguments[0], confirmXPath = arguments[1], consoleSelector = arguments[2], fileListSelector = arguments[3];
+function visible(el) { return !!el && el.offsetParent !== null; }
+function all(selector) { return Array.prototype.slice.call(document.querySelectorAll(selector)); }
+function xpathAll(xpath) {
+    var result = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var nodes = [];
+    for (var i = 0; i < result.snapshotLength; i++) { nodes.push(result.snapshotItem(i)); }
+    return nodes;
+}
+var cmdline = all('.cmdline').filter(visible)[0];
+var output = document.querySelector(consoleSelector);
+return {
+    url: location.href,
+    ready: document.readyState === 'complete',
+    links: all('a').filter(visible).map(function (a) { return a.textContent.trim(); }),
+    file_list_visible: !!document.querySelector(fileListSelector),
+    files: all('div.fs-file').map(function (el) {
+        var link = el.querySelector('a');
+        return {id: el.getAttribute('data-id'), name: link ? link.textContent.trim() : ''};
+    }),
+    ecache_ids: xpathAll(ecacheXPath).map(function (el) { return el.getAttribute('data-id'); }),
+    modal_visible: xpathAll(confirmXPath).some(visible),
+    networks: all('div.network > div.ssid').map(function (el) { return el.textContent; }),
+    password_visible: all("input[name='password'][type='password']").some(visible),
+    console_visible: !!cmdline,
+    console_value: cmdline ? cmdline.value : null,
+    console_output_length: output ? output.textContent.length : 0
+};
+"""
+
+
+@dataclass
+class PageSnapshot:
+    """The state of the device page at one instant, as read by PageIntrospector.snapshot()."""
+    url: str = None
+    ready: bool = False
+    links: list = None                # Texts of the visible links
+    file_list_visible: bool = False   # File list container (FILE_LIST_SELECTOR) rendered
+    files: list = None                # {"id", "name"} of every listed file
+    ecache_ids: list = None           # data-ids of the deletable ECache files (ECACHE_FILE_XPATH)
+    modal_visible: bool = False       # Delete confirmation shown
+    networks: list = None             # SSIDs listed on the 'Connect' page
+    password_visible: bool = False    # Wi-Fi password input shown
+    console_visible: bool = False     # Console input shown
+    console_value: str = None         # Text in the console input
+    console_output_length: int = 0    # Characters in the console output
+
+    def has_link(self, text):
+        return text in (self.links or ())
+
+    @property
+    def file_ids(self):
+        return [file["id"] for file in self.files or ()]
+
+
+class PageIntrospector:
+    """
+    Reads what a step waits for (file list, delete modal, networks, console) with a single
+    execute_script round trip per poll, instead of a find_elements/get_attribute/is_displayed
+    round trip for each element. Clicks and typing still go through WebDriver elements.
+    """
+    def __init__(self, driver):
+        self.driver = driver
+        self.snapshots = 0 # Round trips spent on snapshots
+
+    def snapshot(self):
+        self.snapshots += 1
+        data = self.driver.execute_script(_PAGE_SNAPSHOT_JS, ECACHE_FILE_XPATH, DELETE_CONFIRM_XPATH,
+                                          CONSOLE_OUTPUT_SELECTOR, FILE_LIST_SELECTOR) or {}
+        return PageSnapshot(**{key: value for key, value in data.items() if key in PageSnapshot.__dataclass_fields__})
+
+
+_COLLECT_ECACHE_IDS_JS = """
+var result = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+var ids = [];
+for (var i = 0; i < result.snapshotLength; i++) {
+    ids.push(result.snapshotItem(i).getAttribute('data-id'));
+}
+return ids;
+"""
+
+# Clicks each file's delete button and confirms the modal, all inside the page.
+# arguments: ids, confirm button XPath, per-file timeout (ms), callback.
+_BULK_DELETE_VIA_UI_JS = """
+var ids = arguments[0], confirmXPath = arguments[1], perFileMs = arguments[2];
+var done = arguments[arguments.length - 1];
+var failed = [];
+function first(xpath) {
+    return document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+// Ids are compared as values, never spliced into a selector, so quotes in an id cannot break the lookup.
+function withDataId(root, selector, id) {
+    return Array.prototype.filter.call(root.querySelectorAll(selector), function (el) {
+        return el.getAttribute('data-id') === id;
+    })[0] || null;
+}
+function visible(el) { return el && el.offsetParent !== null; }
+function waitFor(predicate, ms) {
+    return new Promise(function (resolve) {
+        var start = Date.now();
+        (function poll() {
+            var value = predicate();
+            if (value || Date.now() - start > ms) { resolve(value); } else { setTimeout(poll, 50); }
+        })();
+    });
+}
+(async function () {
+    for (var i = 0; i < ids.length; i++) {
+        var id = ids[i];
+        var file = withDataId(document, 'div.fs-file', id);
+        var button = file && withDataId(file, 'div[class="status"]', id);
+        if (!button) { failed.push(id); continue; }
+        button.click();
+        var confirm = await waitFor(function () { var b = first(confirmXPath); return visible(b) ? b : null; }, perFileMs);
+        if (!confirm) { failed.push(id); continue; }
+        confirm.click();
+        var gone = await waitFor(function () {
+            return !withDataId(document, 'div.fs-file', id) && !visible(first(confirmXPath));
+        }, perFileMs);
+        if (!gone) { failed.push(id); }
+    }
+    done({failed: failed});
+})();
+"""
+
+# Calls the device's file-delete endpoint for every id concurrently from the page's origin.
+# arguments: ids, method, path template, callback.
+_BULK_DELETE_VIA_HTTP_JS = """
+var ids = arguments[0], method = arguments[1], pathTemplate = arguments[2];
+var done = arguments[arguments.length - 1];
+Promise.all(ids.map(function (id) {
+    var path = pathTemplate.replace('{data_id}', encodeURIComponent(id));
+    return fetch(path, {method: method, credentials: 'same-origin'})
+        .then(function (r) { return r.ok ? null : id; }, function () { return id; });
+})).then(function (results) {
+    done({failed: results.filter(function (id) { return id !== null; })});
+});
+"""
+
+
+def _collect_ecache_ids(driver):
+    """Returns the data-id of every ECache file on the Files page in a single WebDriver call."""
+    return driver.execute_script(_COLLECT_ECACHE_IDS_JS, ECACHE_FILE_XPATH)
+
+
+def _reload_file_list(driver, waits):
+    """Reloads the page and reopens the Files view so the list reflects the device's file system."""
+    driver.refresh()
+    waits.wait("page_refresh", lambda: _document_ready(driver), legacy_delay=0)
+    WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.XPATH, FILES_LINK_XPATH))).click()
+    waits.wait("files_list", _file_list_settled(PageIntrospector(driver)), legacy_delay=0)
+
+
+def _bulk_delete_ecache_files(driver, mode, log_func, waits):
+    """
+    Deletes every ECache file in one batch: the data-ids are collected once, deleted by a single
+    injected script (mode "script" drives the page UI, mode "http" calls the delete endpoint),
+    then the file list is re-scanned. Returns the data-ids still present after the re-scan.
+    """
+    if mode == "http" and not ECACHE_DELETE_PATH:
+        log_func("No ECache delete endpoint is configured; deleting through the page UI instead.")
+        mode = "script"
+    ecache_ids = _collect_ecache_ids(driver)
+    log_func(f"Found {len(ecache_ids)} ECache file(s) for bulk deletion ({mode} mode).")
+    if not ecache_ids:
+        return []
+
+    budget = waits.budgets["ecache_bulk"]
+    driver.set_script_timeout(budget)
+    start = time.monotonic()
+    try:
+        if mode == "http":
+            result = driver.execute_async_script(_BULK_DELETE_VIA_HTTP_JS, ecache_ids,
+                                                 ECACHE_DELETE_METHOD, ECACHE_DELETE_PATH)
+        else:
+            per_file_ms = int(waits.budgets["ecache_delete"] * 1000)
+            result = driver.execute_async_script(_BULK_DELETE_VIA_UI_JS, ecache_ids,
+                                                 DELETE_CONFIRM_XPATH, per_file_ms)
+        failed = result.get("failed", []) if result else ecache_ids
+    except TimeoutException:
+        log_func(f"Bulk deletion did not finish within its {budget}s budget.")
+        failed = ecache_ids
+    log_func(f"Bulk deletion of {len(ecache_ids)} file(s) took {time.monotonic() - start:.1f}s "
+             f"({len(ecache_ids) - len(failed)} reported deleted, {len(failed)} failed).")
+
+    if mode == "http":
+        _reload_file_list(driver, waits)
+    remaining_ids = _collect_ecache_ids(driver)
+    log_func(f"Re-scan after bulk deletion: {len(remaining_ids)} ECache file(s) remaining.")
+    return remaining_ids
+
+
+def _delete_ecache_files_one_by_one(driver, log_func, waits):
+    """
+    Deletes ECache files one at a time through the Files page UI (click delete, confirm the modal).
+    Used as the "legacy" deletion mode and as the fallback when a bulk pass leaves files behind.
+    The page state between clicks is read through PageIntrospector snapshots.
+    Returns the number of files deleted.
+    """
+    page = PageIntrospector(driver)
+    delete_count = 0
+    max_attempts_overall = 100
+    num_ecache_files_found = 0
+
+    for attempt in range(1, max_attempts_overall + 1):
+        log_func(f"\n--- ECache Deletion Attempt {attempt} ---")
+
+        try:
+            snapshot = page.snapshot()
+            num_ecache_files_found = len(snapshot.ecache_ids)
+            log_func(f"Found {num_ecache_files_found} ECache file(s) on page.")
+
+            if not snapshot.ecache_ids:
+                log_func("No more ECache files found. Exiting deletion loop.")
+                break
+
+            parent_data_id = snapshot.ecache_ids[0]
+            log_func(f"Targeting ECache file with data-id='{parent_data_id}'.")
+
+            log_func(f"Attempting to click delete for ECache file data-id='{parent_data_id}'...")
+            try:
+                driver.find_element(By.XPATH, f"//div[@class='status' and @data-id={_xpath_literal(parent_data_id)}]").click()
+            except NoSuchElementException as e:
+                raise TimeoutException(f"No delete button for ECache file data-id='{parent_data_id}'.") from e
+            log_func("Successfully clicked individual ECache delete button.")
+
+            log_func("Waiting for delete confirmation modal to appear...")
+            if not waits.wait("delete_modal", lambda: page.snapshot().modal_visible, legacy_delay=0):
+                raise TimeoutException("The delete confirmation modal did not appear.")
+            log_func("Delete confirmation button found. Attempting to click to confirm...")
+            driver.find_element(By.XPATH, DELETE_CONFIRM_XPATH).click()
+            log_func("Successfully clicked delete confirmation button.")
+            delete_count += 1
+
+            def file_deleted(data_id=parent_data_id):
+                after = page.snapshot()
+                return data_id not in after.file_ids and not after.modal_visible
+
+            waits.wait("ecache_delete", file_deleted)
+
+        except StaleElementReferenceException:
+            log_func("StaleElementReferenceException caught. Element reference is no longer valid, likely due to DOM change. Retrying this deletion attempt.")
+            capture_artifact(driver, f"stale_element_error_attempt_{attempt}")
+            record_retry("ecache_delete")
+            waits.wait("stale_retry", lambda: _document_ready(driver))
+            continue
+        except TimeoutException as te:
+            log_func(f"TimeoutException caught during ECache deletion: {te}")
+            log_func("Could not find element within specified time. This might mean all ECache files are already deleted, or the locator is wrong, or elements are not becoming clickable.")
+            capture_artifact(driver, f"timeout_error_attempt_{attempt}")
+            break
+        except Exception as e:
+            log_func(f"An unexpected error occurred during ECache deletion (Attempt {attempt}): {e}")
+            import traceback
+            log_func(traceback.format_exc())
+            capture_artifact(driver, f"general_error_attempt_{attempt}")
+            record_retry("ecache_delete")
+            waits.wait("error_retry", lambda: _document_ready(driver))
+
+    log_func(f"\nFinished ECache deletion loop. Total deleted: {delete_count}")
+    if attempt >= max_attempts_overall and num_ecache_files_found > 0:
+        log_func(f"Warning: Reached maximum ECache deletion attempts ({max_attempts_overall}). Some ECache files might remain.")
+    return delete_count
+
+
+# --- Console output monitoring ---
+# Console lines that end the firmware update (dfuu); matched case-insensitively against the start of
+# the line, failures first. Anchored to dfuu's terminal lines ("dfuu: update complete", "dfuu: error: ...")
+# so chatter such as "retrying after error" or "config not found, using defaults" does not end the update.
+DFUU_SUCCESS_PATTERNS = (r"^(?:dfuu:\s*)?update (?:complete|successful)\b",)
+DFUU_FAILURE_PATTERNS = (r"^(?:dfuu:\s*)?(?:error|fatal):", r"^(?:dfuu:\s*)?update (?:failed|aborted)\b")
+DFUU_PROGRESS_PATTERN = r"(\d{1,3})\s*%"
+
+
+class ConsoleOutputMonitor:
+    """
+    Follows the device console's output as it streams in and decides how the firmware update ended.
+    feed() takes each new chunk of output (lines may be split across chunks); every completed line
+    is logged, progress percentages are reported through progress_func, and the first line matching
+    a failure or success pattern sets `outcome` to "failed" or "succeeded".
+    """
+    TAIL_LINES = 20 # Last lines kept for the run report
+
+    def __init__(self, log_func, progress_func=None, success_patterns=DFUU_SUCCESS_PATTERNS,
+                 failure_patterns=DFUU_FAILURE_PATTERNS, progress_pattern=DFUU_PROGRESS_PATTERN):
+        self.log_func = log_func
+        self.progress_func = progress_func or (lambda status: None)
+        self.success_res = [re.compile(pattern, re.IGNORECASE) for pattern in success_patterns]
+        self.failure_res = [re.compile(pattern, re.IGNORECASE) for pattern in failure_patterns]
+        self.progress_re = re.compile(progress_pattern)
+        self.outcome = None # None (still running), "succeeded" or "failed"
+        self.outcome_line = None
+        self.percent = None
+        self.tail = collections.deque(maxlen=self.TAIL_LINES)
+        self._partial = ""
+
+    @property
+    def finished(self):
+        return self.outcome is not None
+
+    def flush(self):
+        """Processes a trailing line that never received its newline (call once the output stops)."""
+        partial, self._partial = self._partial, ""
+        self._line(partial.rstrip("\r"))
+        return self.finished
+
+    def feed(self, text):
+        """Processes a chunk of console output. Returns True once the outcome is known."""
+        if text:
+            lines = (self._partial + text).split("\n")
+            self._partial = lines.pop() # Incomplete last line, completed by a later chunk
+            for line in lines:
+                self._line(line.rstrip("\r"))
+        return self.finished
+
+    def _line(self, line):
+        if not line.strip():
+            return
+        self.tail.append(line)
+        self.log_func(f"Device console: {line}")
+        if self.finished:
+            return
+        if any(pattern.search(line.strip()) for pattern in self.failure_res):
+            self.outcome, self.outcome_line = "failed", line
+        elif any(pattern.search(line.strip()) for pattern in self.success_res):
+            self.outcome, self.outcome_line = "succeeded", line
+        progress = self.progress_re.search(line)
+        if progress and int(progress.group(1)) <= 100 and int(progress.group(1)) != self.percent:
+            self.percent = int(progress.group(1))
+            self.progress_func(f"Updating firmware {self.percent}%")
+
+    def result(self):
+        """Summary for the RunReport."""
+        return {"outcome": self.outcome or "timeout", "percent": self.percent, "line": self.outcome_line,
+                "output_tail": list(self.tail)}
+
+
+# --- Device drivers ---
+# The provisioning flow talks to the device's web UI only through a DeviceDriver, so the
+# browser can be swapped for plain HTTP requests.
+DEVICE_DRIVER_BACKENDS = ("selenium", "http")
+
+
+class DeviceDriverError(Exception):
+    """Raised by a DeviceDriver when the device's web UI does not behave as expected."""
+
+
+class DeviceDriver:
+    """
+    Operations the provisioning flow performs on the device's web UI at url.
+    Subclasses implement them either by driving a browser or by issuing HTTP requests.
+    """
+    def __init__(self, url, log_func, waits):
+        self.url = url.rstrip("/")
+        self.log_func = log_func
+        self.waits = waits
+        self._console_offset = 0 # Characters of console output already read back
+
+    def open(self):
+        """Starts the backend and loads the device's start page."""
+        raise NotImplementedError
 
-        log_func(f"Starting script by opening website: {url}")
-        driver.get(url)
+    def open_files(self):
+        """Shows the device's file list."""
+        raise NotImplementedError
 
-        # --- Step 1: Click the "Files" link ---
+    def delete_ecache_files(self, mode):
+        """Deletes every ECache file from the device (mode is one of ECACHE_DELETE_MODES)."""
+        raise NotImplementedError
+
+    def save_wifi(self, ssid, password):
+        """Saves Wi-Fi credentials on the device, which then reboots to join that network."""
+        raise NotImplementedError
+
+    def reload(self):
+        """Reloads the device UI after the PC has reconnected to the device."""
+        raise NotImplementedError
+
+    def send_console_command(self, command):
+        """Runs command in the device's console."""
+        raise NotImplementedError
+
+    def read_console_output(self):
+        """Returns the console output printed since the command was sent or the previous call ("" if none)."""
+        raise NotImplementedError
+
+    def capture_artifact(self, name):
+        """Captures the page for diagnostics (see capture_artifact) if the backend can render one. Returns the paths."""
+        return []
+
+    def abort(self):
+        """
+        Stops the backend at once from another thread when the run is cancelled, so a blocked
+        operation fails instead of running out its timeout. close() still runs afterwards.
+        """
+
+    def close(self):
+        """Releases the backend's resources."""
+
+
+class SeleniumDeviceDriver(DeviceDriver):
+    """
+    Drives the device's web UI in Microsoft Edge through msedgedriver.
+    With a SeleniumDriverPool the browser is borrowed from the pool instead of launched and quit.
+    """
+    def __init__(self, url, log_func, waits, webdriver_path, driver_pool=None):
+        super().__init__(url, log_func, waits)
+        load_selenium()
+        self.webdriver_path = webdriver_path
+        self.driver_pool = driver_pool
+        self.driver = None
+        self.page = None # PageIntrospector of the open driver
+
+    def open(self):
+        if self.driver_pool:
+            self.driver = self.driver_pool.acquire()
+        else:
+            service = Service(self.webdriver_path)
+            self.driver = webdriver.Edge(service=service)
+            self.driver.maximize_window()
+        self.page = PageIntrospector(self.driver)
+        self.log_func(f"Starting script by opening website: {self.url}")
+        self.driver.get(self.url)
+
+    def open_files(self):
+        driver, log_func = self.driver, self.log_func
         log_func("Waiting for the 'Files' link to appear...")
         files_link = WebDriverWait(driver, 20).until(
-            EC.element_to_be_clickable((By.XPATH, "//a[contains(.,'Files')]"))
+            EC.element_to_be_clickable((By.XPATH, FILES_LINK_XPATH))
         )
         log_func("'Files' link found. Clicking it...")
         files_link.click()
         log_func("Clicked the 'Files' link.")
-        time.sleep(2)
+        self.waits.wait("files_list", _file_list_settled(self.page))
+
+    def delete_ecache_files(self, mode):
+        driver, log_func, waits = self.driver, self.log_func, self.waits
+        if mode == "legacy":
+            _delete_ecache_files_one_by_one(driver, log_func, waits)
+        else:
+            try:
+                remaining_ids = _bulk_delete_ecache_files(driver, mode, log_func, waits)
+            except Exception as e:
+                log_func(f"Bulk ECache deletion failed: {e}. Falling back to one-by-one deletion.")
+                remaining_ids = None
+            if remaining_ids:
+                log_func(f"{len(remaining_ids)} ECache file(s) remain after the bulk pass. Falling back to one-by-one deletion.")
+            if remaining_ids is None or remaining_ids:
+                record_retry("ecache_delete")
+                _delete_ecache_files_one_by_one(driver, log_func, waits)
+
+        waits.wait("connect_page", lambda: self.page.snapshot().has_link("Connect"))
+
+    def _wait_for(self, step, condition, what, legacy_delay=None):
+        """Polls condition(snapshot) on fresh page snapshots; raises TimeoutException if the step's budget runs out."""
+        if not self.waits.wait(step, lambda: condition(self.page.snapshot()), legacy_delay):
+            raise TimeoutException(f"{what} did not appear within {self.waits.budgets[step]}s.")
+
+    def save_wifi(self, ssid, password):
+        driver, log_func = self.driver, self.log_func
+        log_func("\nWaiting for the 'Connect' link to appear...")
+        self._wait_for("connect_page", lambda snapshot: snapshot.has_link("Connect"), "The 'Connect' link", 0)
+        log_func("'Connect' link found. Clicking it...")
+        driver.find_element(By.LINK_TEXT, "Connect").click()
+        log_func("Clicked the 'Connect' link.")
+
+        log_func("\n--- Automating Wi-Fi connection on the device's web interface ---")
+        log_func(f"Waiting for target Wi-Fi network '{ssid}' in the network list...")
+        self._wait_for("network_list", lambda snapshot: ssid in (snapshot.networks or ()), f"Network '{ssid}'", 0)
+        log_func(f"Found target network '{ssid}'. Clicking it...")
+        driver.find_element(By.XPATH, f"//div[@class='network']/div[@class='ssid'][text()={_xpath_literal(ssid)}]"
+                                      "/ancestor::div[@class='network']").click()
+        log_func(f"Clicked on network '{ssid}'.")
+
+        log_func("Waiting for password input field to appear...")
+        self._wait_for("password_field", lambda snapshot: snapshot.password_visible, "The password field")
+        password_input_field = next(e for e in driver.find_elements(By.CSS_SELECTOR, "input[name='password'][type='password']")
+                                    if e.is_displayed())
+        password_input_field.clear()
+        password_input_field.send_keys(password)
+        log_func("Typed password into the field.")
+
+        # Click the "Connect" button that saves the credentials (class="btn btn-lg save")
+        log_func("Attempting to click the 'Connect' button (save button)...")
+        driver.find_element(By.CSS_SELECTOR, "button.btn.btn-lg.save").click()
+        log_func("Clicked the 'Connect' button to save credentials.")
+
+    def reload(self):
+        self.log_func("Refreshing browser to ensure connection...")
+        self.driver.refresh()
+        self._wait_for("page_refresh", lambda snapshot: snapshot.ready and snapshot.has_link("Console"), "The 'Console' link")
+
+    def send_console_command(self, command):
+        driver, log_func = self.driver, self.log_func
+        log_func("\nWaiting for the 'Console' link to appear...")
+        self._wait_for("page_refresh", lambda snapshot: snapshot.has_link("Console"), "The 'Console' link", 0)
+        log_func("'Console' link found. Clicking it...")
+        driver.find_element(By.LINK_TEXT, "Console").click()
+        log_func("Clicked the 'Console' link.")
+
+        log_func("Waiting for the console input field to appear in the modal...")
+        self._wait_for("console_open", lambda snapshot: snapshot.console_visible, "The console input field")
+        snapshot = self.page.snapshot()
+        self._console_offset = snapshot.console_output_length # Only output printed from here on is read back
+        console_input_field = next(e for e in driver.find_elements(By.CLASS_NAME, "cmdline") if e.is_displayed())
+        log_func(f"Console input field found. Typing command: '{command}'")
+        console_input_field.send_keys(command + webdriver.Keys.ENTER)
+        log_func("Typed command and pressed ENTER.")
+        self.waits.wait("command_sent", lambda: self.page.snapshot().console_value == "")
+
+    def _console_text(self):
+        return self.driver.execute_script(_CONSOLE_TEXT_JS, CONSOLE_OUTPUT_SELECTOR) or ""
+
+    def read_console_output(self):
+        text = self._console_text()
+        if len(text) < self._console_offset: # The console was cleared
+            self._console_offset = 0
+        new_output, self._console_offset = text[self._console_offset:], len(text)
+        return new_output
+
+    def capture_artifact(self, name):
+        return capture_artifact(self.driver, name)
+
+    def abort(self):
+        driver, self.driver = self.driver, None
+        if driver:
+            self.log_func("Run cancelled: closing the browser.")
+            if self.driver_pool:
+                self.driver_pool.discard(driver)
+            else:
+                driver.quit()
+
+    def close(self):
+        if self.driver:
+            if self.driver_pool:
+                self.log_func("Returning the browser to the driver pool.")
+                self.driver_pool.release(self.driver)
+            else:
+                self.log_func("Closing the browser.")
+                self.driver.quit()
+            self.driver = None
+
+
+class SeleniumDriverPool:
+    """
+    Keeps pre-launched Edge WebDriver sessions warm so provisioning runs skip browser start-up.
+    Drivers are reset (cookies, storage, about:blank) between devices and recycled after max_uses
+    runs or when they stop responding. Up to `size` idle drivers are kept.
+    """
+    def __init__(self, webdriver_path, size, max_uses, log_func):
+        self.webdriver_path = webdriver_path
+        self.size = size
+        self.max_uses = max_uses
+        self.log_func = log_func
+        self._idle = queue.Queue()
+        self._uses = {} # id(driver) -> number of runs served
+        self._lock = threading.Lock()
+        self._closed = False
+        self._launching = 0 # prewarm launches in progress
+
+    def _launch(self):
+        load_selenium()
+        driver = webdriver.Edge(service=Service(self.webdriver_path))
+        driver.maximize_window()
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def _replenish(self):
+        """Launches one driver into the idle queue (runs on a background thread)."""
+        try:
+            driver = self._launch()
+        except Exception as e:
+            self.log_func(f"Driver pool: could not launch a browser: {e}")
+            return
+        if self._closed:
+            self._quit(driver)
+        else:
+            self._idle.put(driver)
+
+    def warm_up(self):
+        """Pre-launches the pool's drivers in the background."""
+        for _ in range(self.size):
+            threading.Thread(target=self._replenish, daemon=True).start()
+
+    @staticmethod
+    def _is_alive(driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Returns a warm driver, or launches one if none is idle."""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                self.log_func("Driver pool: no warm browser available, launching one...")
+                return self._launch()
+            if self._is_alive(driver):
+                self.log_func("Driver pool: reusing a warm browser.")
+                return driver
+            self.log_func("Driver pool: discarding a browser that stopped responding.")
+            self._quit(driver)
+            threading.Thread(target=self._replenish, daemon=True).start()
+
+    def prewarm(self):
+        """Launches one driver in the background unless one is idle or launching, so the next acquire finds it warm."""
+        with self._lock:
+            if self._closed or self._idle.qsize() + self._launching > 0:
+                return
+            self._launching += 1
+        threading.Thread(target=self._prewarm_launch, daemon=True).start()
+
+    def _prewarm_launch(self):
+        try:
+            self._replenish()
+        finally:
+            with self._lock:
+                self._launching -= 1
+
+    def discard(self, driver):
+        """Quits a driver that must not be reused (e.g. torn down by a cancelled run) and launches a replacement."""
+        self._quit(driver)
+        if not self._closed:
+            threading.Thread(target=self._replenish, daemon=True).start()
+
+    def release(self, driver):
+        """Resets driver and returns it to the pool, or quits it if it crashed or reached max_uses."""
+        with self._lock:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+            uses = self._uses[id(driver)]
+        recycle = self._closed or uses >= self.max_uses or not self._is_alive(driver)
+        if not recycle:
+            try:
+                # Storage is per origin, so clear it before leaving the device's page.
+                driver.delete_all_cookies()
+                driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+                driver.get("about:blank")
+            except Exception:
+                recycle = True
+        if recycle or self._idle.qsize() >= self.size:
+            self._quit(driver)
+            if recycle and not self._closed:
+                self.log_func(f"Driver pool: recycling browser after {uses} run(s).")
+                threading.Thread(target=self._replenish, daemon=True).start()
+        else:
+            self._idle.put(driver)
+
+    def close(self):
+        """Quits every idle driver; drivers still in use are quit when released."""
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+class _FilesPageParser(HTMLParser):
+    """Collects the data-id of every ECache file div (class 'file fs-file deletable') on the Files page."""
+    def __init__(self):
+        super().__init__()
+        self.ecache_ids = []
+        self._open_file_divs = [] # Stack of [div_depth, data_id, is_ecache] for the deletable file divs being parsed
+        self._div_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "div":
+            self._div_depth += 1
+            classes = (attrs.get("class") or "").split()
+            if {"file", "fs-file", "deletable"} <= set(classes):
+                self._open_file_divs.append([self._div_depth, attrs.get("data-id"), False])
+        elif tag == "a" and self._open_file_divs:
+            if (attrs.get("href") or "").startswith("http://setup.com/ECache_"):
+                self._open_file_divs[-1][2] = True
+
+    def handle_data(self, data):
+        if self._open_file_divs and data.strip().startswith("ECache_"):
+            self._open_file_divs[-1][2] = True
+
+    def handle_endtag(self, tag):
+        if tag != "div":
+            return
+        if self._open_file_divs and self._open_file_divs[-1][0] == self._div_depth:
+            _, data_id, is_ecache = self._open_file_divs.pop()
+            if is_ecache and data_id:
+                self.ecache_ids.append(data_id)
+        self._div_depth -= 1
+
+
+class _NetworksPageParser(HTMLParser):
+    """Collects the SSIDs listed as <div class="network"><div class="ssid">...</div></div>."""
+    def __init__(self):
+        super().__init__()
+        self.ssids = []
+        self._in_ssid = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "div" and dict(attrs).get("class") == "ssid":
+            self._in_ssid = True
+            self.ssids.append("")
+
+    def handle_data(self, data):
+        if self._in_ssid:
+            self.ssids[-1] += data
+
+    def handle_endtag(self, tag):
+        if tag == "div":
+            self._in_ssid = False
+
+
+class HttpDeviceDriver(DeviceDriver):
+    """
+    Performs the provisioning operations with plain HTTP requests against the same pages and
+    form endpoints the web UI uses, without starting a browser.
+    """
+    FILES_PATH = "/files"
+    CONNECT_PATH = "/connect"
+    WIFI_SAVE_PATH = "/connect"
+    CONSOLE_PATH = "/console"
+    CONSOLE_OUTPUT_PATH = "/console/output?offset={offset}" # Console text from character offset on
+    REQUEST_TIMEOUT = 10
+
+    def _request(self, path, data=None, method=None):
+        """Sends a request to the device and returns the decoded response body."""
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.url + path, data=body, method=method)
+        try:
+            with _direct_url_opener.open(request, timeout=self.REQUEST_TIMEOUT) as response:
+                return response.read().decode("utf-8", errors="replace")
+        except urllib.error.HTTPError as e:
+            raise DeviceDriverError(f"{method or ('POST' if body else 'GET')} {path} failed with HTTP {e.code}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise DeviceDriverError(f"Could not reach {self.url}{path}: {e}") from e
+
+    def _list_ecache_ids(self):
+        parser = _FilesPageParser()
+        parser.feed(self._request(self.FILES_PATH))
+        return parser.ecache_ids
+
+    def open(self):
+        self.log_func(f"Starting script by requesting: {self.url}")
+        self._request("/")
+
+    def open_files(self):
+        ecache_ids = self._list_ecache_ids()
+        self.log_func(f"Files page loaded: {len(ecache_ids)} ECache file(s) listed.")
+
+    def delete_ecache_files(self, mode):
+        # Without a browser there is no page UI to drive, so every mode uses the delete endpoint.
+        ecache_ids = self._list_ecache_ids()
+        if ecache_ids and not ECACHE_DELETE_PATH:
+            raise DeviceDriverError("The http backend deletes ECache files through the device's file-delete endpoint, "
+                                    "which is not configured (see set_ecache_delete_endpoint).")
+        self.log_func(f"Deleting {len(ecache_ids)} ECache file(s) via {ECACHE_DELETE_METHOD} {ECACHE_DELETE_PATH}...")
+        deleted = 0
+        for data_id in ecache_ids:
+            path = ECACHE_DELETE_PATH.format(data_id=urllib.parse.quote(data_id))
+            try:
+                self._request(path, data={}, method=ECACHE_DELETE_METHOD)
+                deleted += 1
+            except DeviceDriverError as e:
+                self.log_func(f"Could not delete ECache file data-id='{data_id}': {e}")
+                if not deleted:
+                    # The very first request failed: most likely the endpoint is wrong for this firmware
+                    raise DeviceDriverError(f"The device rejected the configured ECache delete endpoint: {e}") from e
+
+        remaining_ids = self._list_ecache_ids()
+        self.log_func(f"\nFinished ECache deletion. Total deleted: {len(ecache_ids) - len(remaining_ids)}")
+        if remaining_ids:
+            self.log_func(f"Warning: {len(remaining_ids)} ECache file(s) remain on the device.")
+
+    def save_wifi(self, ssid, password):
+        self.log_func(f"Searching for target Wi-Fi network: '{ssid}'...")
+        parser = _NetworksPageParser()
+        parser.feed(self._request(self.CONNECT_PATH))
+        if ssid not in (s.strip() for s in parser.ssids):
+            raise DeviceDriverError(f"Target network '{ssid}' is not in the device's network list ({len(parser.ssids)} visible).")
+        self._request(self.WIFI_SAVE_PATH, data={"ssid": ssid, "password": password})
+        self.log_func("Saved Wi-Fi credentials on the device.")
+
+    def reload(self):
+        self.log_func("Reloading device UI to ensure connection...")
+        self._request("/")
+
+    def send_console_command(self, command):
+        self._console_offset = 0
+        self._console_offset = len(self.read_console_output()) # Only output printed from here on is read back
+        self.log_func(f"Sending console command: '{command}'")
+        self._request(self.CONSOLE_PATH, data={"cmd": command})
+        self.log_func("Console command sent.")
+
+    def read_console_output(self):
+        output = self._request(self.CONSOLE_OUTPUT_PATH.format(offset=self._console_offset))
+        self._console_offset += len(output)
+        return output
+
+
+def create_device_driver(backend, url, log_func, waits, webdriver_path=None, driver_pool=None):
+    """Returns the DeviceDriver for backend (one of DEVICE_DRIVER_BACKENDS)."""
+    if backend == "selenium":
+        return SeleniumDeviceDriver(url, log_func, waits, webdriver_path, driver_pool)
+    if backend == "http":
+        return HttpDeviceDriver(url, log_func, waits)
+    raise ValueError(f"Unknown device driver backend '{backend}'. Expected one of {DEVICE_DRIVER_BACKENDS}.")
+
+
+# --- Provisioning checkpoints ---
+# Steps of a provisioning run in order. Each is recorded on disk as soon as it completes, so a run
+# restarted after a crash continues at the first incomplete step instead of repeating the reboot cycle.
+PROVISIONING_STATES = ("files_cleaned", "wifi_pushed", "reconnected", "static_ip_set", "command_sent", "done")
+
+
+class ProvisioningCheckpoint:
+    """
+    The completed steps of one device's provisioning, persisted as <directory>/<device>.json.
+    A checkpoint only applies to the same target network: loading it for a different target_ssid,
+    or after the run reached "done", starts the device over.
+    """
+    def __init__(self, directory, device, target_ssid):
+        self.device = device
+        self.target_ssid = target_ssid
+        self.path = os.path.join(directory, re.sub(r"[^\w.-]", "_", device) + ".json")
+        self.state = None # Last completed state
+        self.history = [] # {"state", "at"}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, directory, device, target_ssid):
+        """Returns the device's checkpoint, or a fresh one if none applies."""
+        checkpoint = cls(directory, device, target_ssid)
+        try:
+            with open(checkpoint.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return checkpoint
+        if data.get("target_ssid") == target_ssid and data.get("state") in PROVISIONING_STATES and data["state"] != "done":
+            checkpoint.state = data["state"]
+            checkpoint.history = data.get("history", [])
+        return checkpoint
+
+    def completed(self, state):
+        """True if state (one of PROVISIONING_STATES) was completed."""
+        return self.state is not None and PROVISIONING_STATES.index(self.state) >= PROVISIONING_STATES.index(state)
+
+    def advance(self, state):
+        """Records state as completed and writes the checkpoint (atomically, so a crash never leaves half a file)."""
+        with self._lock:
+            self.state = state
+            self.history.append({"state": state, "at": datetime.datetime.now().isoformat(timespec="seconds")})
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"device": self.device, "target_ssid": self.target_ssid, "state": state,
+                           "history": self.history}, f, indent=2)
+            os.replace(temp_path, self.path)
+
+
+# --- Helper function for web automation ---
+def follow_console_output(device, waits, log_func, progress_func):
+    """
+    Reads the device console after a dfuu command until it reports success or failure, or the
+    "command_complete" budget runs out. Returns the ConsoleOutputMonitor; its result goes to the RunReport.
+    """
+    monitor = ConsoleOutputMonitor(log_func, progress_func)
+    log_func("Following the device console for the firmware update result...")
+    if not waits.wait("command_complete", lambda: monitor.feed(device.read_console_output()), legacy_delay=0):
+        monitor.flush()
+    record_command_result(monitor.result())
+    if monitor.outcome == "succeeded":
+        log_func(f"Firmware update reported success: {monitor.outcome_line}")
+    elif monitor.outcome == "failed":
+        log_func(f"ERROR: Firmware update failed: {monitor.outcome_line}")
+    else:
+        log_func(f"WARNING: The device reported neither success nor failure within {waits.budgets['command_complete']}s"
+                 f"{f' (last progress {monitor.percent}%)' if monitor.percent is not None else ''}. Check this unit.")
+    return monitor
+
+
+def automate_web_actions(url, webdriver_path, command_to_type, log_func, set_static_ip_func,
+                         target_wifi_ssid_web, target_wifi_password_web, resume_event, app_instance,
+                         wait_budgets=None, ecache_delete_mode="script", driver_backend="selenium",
+                         progress_func=None, driver_pool=None, run_report=None, checkpoint=None, cancel_token=None,
+                         artifact_writer=None):
+    """
+    Automates web actions. Output is sent via log_func.
+    set_static_ip_func is a callback to set the static IP.
+    target_wifi_ssid_web and target_wifi_password_web are for the device's web UI.
+    resume_event: A threading.Event to signal when to resume script.
+    app_instance: Reference to the Application instance to update GUI elements (through its gui_bridge),
+                  or None when the run is driven by a ProvisioningScheduler.
+    wait_budgets: Optional dict overriding DEFAULT_WAIT_BUDGETS (seconds per wait step).
+    ecache_delete_mode: One of ECACHE_DELETE_MODES.
+    driver_backend: One of DEVICE_DRIVER_BACKENDS.
+    progress_func: Optional callback receiving a short status string as each step starts.
+    driver_pool: Optional SeleniumDriverPool to borrow a warm browser from (selenium backend only).
+    run_report: Optional RunReport receiving the run's step spans; it is finished before returning.
+    checkpoint: Optional ProvisioningCheckpoint. Completed steps are recorded in it, and steps it already
+                holds are skipped, after a cheap check where one exists (device answering = still reconnected).
+    cancel_token: Optional CancellationToken. Cancelling it stops every wait, network command and the
+                  browser within a second; the run then returns False.
+    artifact_writer: Optional ArtifactWriter receiving the run's diagnostic screenshots/DOM snapshots
+                     in a directory of its own; without one none are captured.
+    Returns True if the run completed and, for a dfuu command, the console reported the update's success.
+    """
+    if progress_func is None:
+        progress_func = lambda status: None
+    if run_report is None:
+        run_report = RunReport()
+    if cancel_token is None:
+        cancel_token = CancellationToken()
+    if artifact_writer is not None and run_report.artifacts is None:
+        run_report.artifacts = artifact_writer.start_run(run_report.device)
+    waits = WaitTracker(log_func, wait_budgets)
+    device = create_device_driver(driver_backend, url, log_func, waits, webdriver_path, driver_pool)
+    succeeded = False
+    opened = False
+
+    def completed(state):
+        return checkpoint is not None and checkpoint.completed(state)
+
+    def mark(state):
+        if checkpoint is None:
+            return
+        try:
+            checkpoint.advance(state)
+        except OSError as e:
+            log_func(f"WARNING: Could not save the '{state}' checkpoint: {e}")
+
+    with run_report.activate(), cancel_token.activate():
+        unregister_abort = cancel_token.on_cancel(device.abort)
+        try:
+            log_func("\n--- Starting Web Automation ---")
+            if checkpoint is not None and checkpoint.state:
+                log_func(f"Checkpoint found: '{checkpoint.state}' already completed. Resuming at the next step.")
+
+            check_cancelled()
+            if not completed("wifi_pushed"):
+                progress_func("Opening device UI")
+                with step_span("open_ui"):
+                    device.open()
+                opened = True
+
+            check_cancelled()
+            if not completed("files_cleaned"):
+                # --- Step 1: Open the "Files" page ---
+                progress_func("Loading files")
+                with step_span("files_load"):
+                    device.open_files()
+
+                # --- Step 2: Delete all "ECache" files ---
+                log_func("\n--- Deleting ECache files ---")
+                progress_func("Deleting ECache files")
+                for path in device.capture_artifact("before_ecache_deletion"):
+                    log_func(f"Diagnostic artifact '{os.path.basename(path)}' queued.")
+                with step_span("ecache_delete"):
+                    device.delete_ecache_files(ecache_delete_mode)
+                mark("files_cleaned")
+
+            # --- Step 3: Save the target Wi-Fi on the device's "Connect" page ---
+            check_cancelled()
+            wifi_pushed = completed("wifi_pushed")
+            if not wifi_pushed:
+                try:
+                    progress_func("Saving Wi-Fi")
+                    with step_span("wifi_save"):
+                        device.save_wifi(target_wifi_ssid_web, target_wifi_password_web)
+                    wifi_pushed = True
+                    mark("wifi_pushed")
+
+                    progress_func("Waiting for reboot")
+                    log_func(f"Waiting for the device to apply the connection and start rebooting (up to {waits.budgets['device_reboot']}s)...")
+                    with step_span("reboot_wait"):
+                        if waits.wait("device_reboot", lambda: not is_url_reachable(url)):
+                            log_func("Device stopped answering; reboot/reconnect is in progress.")
+
+                except TimeoutException as te:
+                    log_func(f"TimeoutException caught during web Wi-Fi connection: {te}")
+                    log_func("Could not find Wi-Fi network, password input, or connect button on web page within time. The page structure might have changed or network not found.")
+                    log_func(f"Ensure target Wi-Fi '{target_wifi_ssid_web}' is visible on the scan page.")
+                except NoSuchElementException as nse:
+                    log_func(f"NoSuchElementException caught during web Wi-Fi connection: {nse}")
+                    log_func("A required element was not found. Check the provided HTML and locators.")
+                except DeviceDriverError as dde:
+                    log_func(f"Device rejected the web Wi-Fi connection: {dde}")
+                    log_func(f"Ensure target Wi-Fi '{target_wifi_ssid_web}' is visible on the scan page.")
+                except Exception as e:
+                    log_func(f"An unexpected error occurred during web Wi-Fi connection: {e}")
+                    import traceback
+                    log_func(traceback.format_exc())
+
+            check_cancelled() # The browser errors above may come from a cancellation tearing it down
+            if not wifi_pushed:
+                # Carrying on would checkpoint the later steps, and with them a Wi-Fi push that never happened
+                log_func("ERROR: The target Wi-Fi was not saved on the device; stopping this run.")
+                return succeeded
+            # A checkpointed reconnect still holds if the device answers; otherwise the PC has to rejoin it again
+            still_connected = completed("reconnected") and is_url_reachable(url)
+            if still_connected:
+                log_func(f"{url} answers; the PC is still connected to the device.")
+            else:
+                # --- PAUSE POINT: Wait for user to manually reconnect PC to JuiceNet ---
+                log_func("\n--- DEVICE CONFIGURATION COMPLETE. ---")
+                log_func("Please MANUALLY RECONNECT your PC to the JuiceNet network (e.g., JuiceNet-BC9) through your system's Wi-Fi settings.")
+                log_func("Once reconnected, click the 'Resume Script (Connected to JuiceNet)' button in the GUI.")
+
+                progress_func("Waiting for reconnect")
+                if app_instance:
+                    # Enable the resume button and disable others on the GUI thread
+                    app_instance.gui_bridge.post(lambda: app_instance.get_page(Page3_Automation).enable_resume_button())
+                    app_instance.gui_bridge.post(app_instance.get_and_display_current_ip_threaded_wrapper, True) # Refresh PC IP display
+
+                with step_span("reconnect"):
+                    cancel_token.wait_for(resume_event) # Blocks the automation thread until the event is set (or the run is cancelled)
+                log_func("Resume signal received. Script continuing...")
+                mark("reconnected")
+
+                if app_instance:
+                    # Disable resume button and re-enable others after resuming
+                    app_instance.gui_bridge.post(lambda: app_instance.get_page(Page3_Automation).disable_resume_button())
+
+            # --- Set static IP after reconnection and before refreshing browser ---
+            # This call is intentionally here, as it's part of the automation flow.
+            # The set_static_ip_func now has internal checks to only apply to JuiceNet.
+            if not (still_connected and completed("static_ip_set")):
+                progress_func("Setting static IP")
+                log_func("Attempting to set PC static IP now (conditional on JuiceNet connection)...")
+                with step_span("static_ip"):
+                    set_static_ip_func() # Call the function to set static IP
+                mark("static_ip_set")
+            log_func(f"Waiting for {url} to answer after the IP change...")
+            with step_span("device_reachable"):
+                waits.wait("device_reachable", lambda: is_url_reachable(url))
+
+            with step_span("page_reload"):
+                if opened:
+                    device.reload()
+                else:
+                    device.open() # Skipped earlier because the checkpoint was past the Wi-Fi push
+                    opened = True
+
+            # --- Steps 4 & 5: Open the "Console" and run the command ---
+            if not completed("command_sent"):
+                progress_func("Running console command")
+                with step_span("console_command"):
+                    device.send_console_command(command_to_type)
+                outcome = "succeeded"
+                if command_to_type.strip().startswith("dfuu"):
+                    progress_func("Updating firmware")
+                    with step_span("command_output"):
+                        outcome = follow_console_output(device, waits, log_func, progress_func).outcome
+                if outcome == "succeeded":
+                    mark("command_sent")
+                elif outcome == "failed" and app_instance:
+                    app_instance.gui_bridge.post(lambda: messagebox.showerror(
+                        "Firmware Update Failed", "The device reported a failed firmware update. Check the log for its console output."))
+            else:
+                outcome = "succeeded"
+            if outcome == "succeeded":
+                mark("done")
+                succeeded = True
+
+        except OperationCancelled as e:
+            log_func(f"\n--- Web automation cancelled: {e} ---")
+        except Exception as e:
+            if cancel_token.cancelled: # The error comes from the browser being torn down
+                log_func(f"\n--- Web automation cancelled: {cancel_token.reason} ---")
+            else:
+                log_func(f"\n--- An unhandled error occurred during web automation: {e} ---")
+                import traceback
+                log_func(traceback.format_exc())
+                if app_instance:
+                    app_instance.gui_bridge.post(lambda error=e: messagebox.showerror("Error", f"An error occurred: {error}\nCheck the log within the GUI for details."))
+        finally:
+            unregister_abort()
+            device.close()
+            waits.log_report()
+            run_report.finish(succeeded, waits.records)
+            log_func("\n--- Web Automation Process Finished. ---")
+    return succeeded
+
+
+# --- Persistent shell for PC network commands ---
+class PersistentShell:
+    """
+    A long-lived command interpreter (cmd.exe on Windows, /bin/sh elsewhere) that runs command lines
+    for any thread without starting a new shell per command.
+    Requests are queued to a single worker thread that owns the process. Each command's output is
+    framed by unique marker lines echoed around it (the end marker carries the exit code), so
+    requests from different threads never mix. If the shell exits or a command times out, the
+    process is killed and a fresh one is started for the next request.
+    """
+    IS_WINDOWS = sys.platform == "win32"
+
+    def __init__(self, log_func=None, timeout=30, startup_commands=()):
+        self.log_func = log_func or (lambda message: None)
+        self.timeout = timeout
+        self.startup_commands = tuple(startup_commands) # Run once after every (re)start, e.g. "chcp 65001 >nul"
+        self.restarts = 0
+        self._requests = queue.Queue()
+        self._process = None
+        self._lines = None
+        self._sequence = 0
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def run(self, command, timeout=None, check=True):
+        """
+        Runs command in the shell and returns a CompletedProcess whose stdout holds the merged
+        stdout/stderr. Raises CalledProcessError on a non-zero exit code when check is set (its
+        stderr also holds the merged output) and TimeoutExpired if no answer came within timeout.
+        If the current thread's run is cancelled, a queued command is dropped and a running one is
+        stopped by killing the shell (a fresh one serves the next request); OperationCancelled is raised.
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            if not self._worker or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._serve, daemon=True)
+                self._worker.start()
+        self._requests.put((command, timeout or self.timeout, future))
+        token = current_cancel_token()
+        if token:
+            while True:
+                try:
+                    future.result(timeout=CancellationToken.POLL_INTERVAL)
+                    break
+                except concurrent.futures.TimeoutError:
+                    if token.cancelled:
+                        if not future.cancel(): # Already running: end it with the shell
+                            self._kill_running()
+                        raise OperationCancelled(token.reason)
+        returncode, output = future.result()
+        if check and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command, output=output, stderr=output)
+        return subprocess.CompletedProcess(command, returncode, stdout=output, stderr="")
+
+    def close(self):
+        self._requests.put(None)
+
+    def _serve(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                self._kill()
+                return
+            command, timeout, future = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._execute(command, timeout))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _start(self):
+        if self.IS_WINDOWS:
+            args, creationflags = ["cmd.exe", "/Q", "/D"], subprocess.CREATE_NO_WINDOW
+        else:
+            args, creationflags = ["/bin/sh"], 0
+        self._process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                         text=True, encoding="utf-8", errors="replace", bufsize=1,
+                                         creationflags=creationflags)
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_lines, args=(self._process.stdout, self._lines), daemon=True).start()
+        for command in self.startup_commands:
+            self._exchange(command, self.timeout)
+
+    @staticmethod
+    def _read_lines(stream, lines):
+        for line in stream:
+            lines.put(line)
+        lines.put(None) # EOF: the shell exited
+
+    def _kill_running(self):
+        """Kills the shell from another thread; the worker sees it exit and fails the running command."""
+        process = self._process
+        if process:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    def _kill(self):
+        if self._process:
+            try:
+                self._process.kill()
+            except OSError:
+                pass
+            self._process = None
+
+    def _execute(self, command, timeout):
+        """Runs command on the worker thread, restarting the shell once if it had died before the command was sent."""
+        for attempt in range(2):
+            if self._process is None or self._process.poll() is not None:
+                if self._process is not None:
+                    self.restarts += 1
+                    self.log_func("Command shell exited; starting a new one.")
+                self._start()
+            try:
+                return self._exchange(command, timeout)
+            except (BrokenPipeError, OSError):
+                self._kill()
+                if attempt:
+                    raise
+            except (subprocess.TimeoutExpired, EOFError) as e:
+                self._kill()
+                self.restarts += 1
+                reason = "exited" if isinstance(e, EOFError) else "stopped answering"
+                self.log_func(f"Command shell {reason} while running '{command}'; it will be restarted.")
+                raise
+
+    def _exchange(self, command, timeout):
+        """Writes one framed command and reads its output up to the end marker. Returns (returncode, output)."""
+        self._sequence += 1
+        begin, end = f"__SHELL_{self._sequence}_BEGIN__", f"__SHELL_{self._sequence}_END__"
+        if self.IS_WINDOWS:
+            script = f"echo {begin}\n({command}) <nul 2>&1\necho {end} %ERRORLEVEL%\n"
+        else:
+            script = f"echo {begin}\n{{ {command}\n}} </dev/null 2>&1\necho {end} $?\n"
+        self._process.stdin.write(script)
+        self._process.stdin.flush()
+
+        deadline = time.monotonic() + timeout
+        output = []
+        started = False
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise subprocess.TimeoutExpired(command, timeout)
+            if line is None:
+                raise EOFError(f"Command shell exited while running '{command}'.")
+            if not started:
+                started = begin in line # Anything before the begin marker is prompt noise
+                continue
+            if end in line:
+                before, _, status = line.partition(end)
+                if before:
+                    output.append(before)
+                try:
+                    returncode = int(status.strip())
+                except ValueError:
+                    returncode = -1
+                return returncode, "".join(output)
+            output.append(line)
+
+
+NETSH_UTF8_PREFIX = "chcp 65001 && "
+
+
+def run_netsh(step, command, shell=None):
+    """
+    Runs a netsh command line (through the shell, without a console window) and returns the
+    CompletedProcess; CalledProcessError is raised on a non-zero exit. Timed as step in the current RunReport.
+    With a PersistentShell the command runs there instead of in a new cmd.exe; that shell switched
+    to UTF-8 at start-up, so NETSH_UTF8_PREFIX is dropped.
+    """
+    with step_span(step):
+        if shell:
+            if command.startswith(NETSH_UTF8_PREFIX):
+                command = command[len(NETSH_UTF8_PREFIX):]
+            return shell.run(command)
+        return run_cancellable(command, creationflags=subprocess.CREATE_NO_WINDOW, shell=True)
+
+
+# --- Multi-device provisioning ---
+FINAL_JOB_STATUSES = ("Done", "Failed", "Cancelled")
+MANIFEST_COLUMNS = ("device_ssid", "device_password", "target_ssid", "target_password", "adapter", "url", "command")
+
+
+@dataclass
+class DeviceJob:
+    """One device to provision in a batch, with the PC network adapter that talks to it."""
+    device_ssid: str              # The device's own access point, e.g. JuiceNet-BC9
+    target_ssid: str              # Network the device is configured to join
+    target_password: str = ""
+    device_password: str = ""     # Password of the device's access point, if any
+    adapter: str = ""             # PC Wi-Fi adapter (or Linux network namespace) reserved for this device
+    url: str = ""                 # Device UI URL; defaults to Application.TARGET_URL
+    command: str = ""             # Console command; defaults to Application.COMMAND_TO_EXECUTE
+
+
+def load_device_manifest(path):
+    """
+    Reads a CSV manifest with a header row using the MANIFEST_COLUMNS names.
+    device_ssid and target_ssid are required; the other columns are optional.
+    Returns a list of DeviceJob.
+    """
+    jobs = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        unknown_columns = set(reader.fieldnames or ()) - set(MANIFEST_COLUMNS)
+        if unknown_columns:
+            raise ValueError(f"Unknown manifest column(s): {', '.join(sorted(unknown_columns))}")
+        for line_number, row in enumerate(reader, start=2):
+            values = {column: (row.get(column) or "").strip() for column in MANIFEST_COLUMNS}
+            if not values["device_ssid"] or not values["target_ssid"]:
+                raise ValueError(f"Manifest line {line_number}: device_ssid and target_ssid are required.")
+            if any(job.device_ssid == values["device_ssid"] for job in jobs):
+                raise ValueError(f"Manifest line {line_number}: device '{values['device_ssid']}' is listed twice.")
+            jobs.append(DeviceJob(**values))
+    return jobs
+
+
+def validate_device_job(job, device_ssid_pattern="JuiceNet"):
+    """Checks a manifest entry ahead of its run. Returns a list of problems (empty if it looks runnable)."""
+    problems = []
+    if not job.device_ssid.startswith(device_ssid_pattern):
+        problems.append(f"device SSID '{job.device_ssid}' does not start with '{device_ssid_pattern}'")
+    # WPA2-Personal passphrases are 8-63 characters; an empty password means an open network
+    for name, password in (("device_password", job.device_password), ("target_password", job.target_password)):
+        if password and not 8 <= len(password) <= 63:
+            problems.append(f"{name} must be 8-63 characters for WPA2 (it has {len(password)})")
+    if job.url:
+        url = urllib.parse.urlsplit(job.url)
+        if url.scheme not in ("http", "https") or not url.netloc:
+            problems.append(f"url '{job.url}' is not an http(s) URL")
+    return problems
+
+
+# Job statuses during which the device is rebooting or waiting for the PC to rejoin it, so its station is idle
+PIPELINE_WAIT_STATUSES = ("Waiting for reboot", "Waiting for reconnect")
+
+
+class ProvisioningScheduler:
+    """
+    Runs DeviceJobs on a bounded worker pool.
+    Jobs that share a network adapter run one after another on that adapter's lane; lanes for
+    different adapters run in parallel, up to max_workers (at most MAX_LANES) at a time.
+
+    run_job(job, progress) performs one job and returns True on success; progress(status) reports
+    its current step; it raises OperationCancelled for a cancelled job. progress_func(job, status) receives
+    every status change, including the final one (FINAL_JOB_STATUSES), and is called from worker threads.
+
+    pipelined: while a lane's job waits out its device's reboot (PIPELINE_WAIT_STATUSES), prepare_func(job)
+    is run in the background for the next queued job (the lane's own, else the next lane's). Jobs never
+    move between adapters: a takeover would put a second lane on a device network (see MAX_LANES).
+    """
+    # Every device answers at the same address (setup.com, 10.10.10.1) and every adapter gets the same
+    # static IP, and nothing binds a lane's HTTP/WebDriver traffic to its own adapter: with two lanes
+    # talking to devices at once the OS routes both through whichever interface wins, so one lane's
+    # steps can reach the other lane's charger. Lanes therefore run one at a time until they are isolated.
+    MAX_LANES = 1
+
+    def __init__(self, run_job, max_workers, progress_func, prepare_func=None, pipelined=False):
+        if int(max_workers) > self.MAX_LANES:
+            raise ValueError(f"At most {self.MAX_LANES} device(s) can be provisioned at a time: lanes are not "
+                             f"isolated to their adapters, so parallel lanes could reach each other's device.")
+        self.run_job = run_job
+        self.max_workers = max(1, int(max_workers))
+        self.progress_func = progress_func
+        self.prepare_func = prepare_func
+        self.pipelined = pipelined
+        self.results = {} # device_ssid -> True/False
+        self._executor = None
+        self._futures = []
+        self._queues = {} # adapter -> deque of jobs not started yet
+        self._prepared = set() # device_ssids handed to prepare_func
+        self._lock = threading.Lock()
+
+    def start(self, jobs):
+        """Queues jobs and starts the worker pool. Returns immediately."""
+        for job in jobs:
+            self._queues.setdefault(job.adapter, collections.deque()).append(job)
+            self.progress_func(job, "Queued")
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                               thread_name_prefix="provisioning")
+        self._futures = [self._executor.submit(self._run_lane, adapter) for adapter in list(self._queues)]
+        self._executor.shutdown(wait=False)
+
+    def is_running(self):
+        return any(not future.done() for future in self._futures)
+
+    def wait(self, timeout=None):
+        """Blocks until every queued job has finished (or timeout seconds passed). Returns the results dict."""
+        concurrent.futures.wait(self._futures, timeout)
+        return self.results
+
+    def _next_job(self, adapter):
+        """Returns the lane's next job, or None when the lane is done."""
+        with self._lock:
+            queue_ = self._queues[adapter]
+            return queue_.popleft() if queue_ else None
+
+    def _upcoming_job(self, adapter):
+        """The job that runs after adapter's current one: the lane's next, else the next lane's first. Needs _lock."""
+        if self._queues[adapter]:
+            return self._queues[adapter][0]
+        return next((queue_[0] for queue_ in self._queues.values() if queue_), None)
+
+    def _on_status(self, adapter, job, status):
+        self.progress_func(job, status)
+        if not self.pipelined:
+            return
+        prepare_job = None
+        with self._lock:
+            if status in PIPELINE_WAIT_STATUSES:
+                upcoming = self._upcoming_job(adapter)
+                if upcoming and upcoming.device_ssid not in self._prepared:
+                    prepare_job = upcoming
+                    self._prepared.add(prepare_job.device_ssid)
+        if prepare_job and self.prepare_func:
+            threading.Thread(target=self._prepare, args=(prepare_job,), daemon=True).start()
+
+    def _prepare(self, job):
+        try:
+            self.prepare_func(job)
+        except Exception as e:
+            self.progress_func(job, f"Preparation error: {e}")
+
+    def _run_lane(self, adapter):
+        while True:
+            job = self._next_job(adapter)
+            if job is None:
+                return
+            try:
+                succeeded = bool(self.run_job(job, lambda status, job=job: self._on_status(adapter, job, status)))
+                final_status = "Done" if succeeded else "Failed"
+            except OperationCancelled:
+                succeeded, final_status = False, "Cancelled"
+            except Exception as e:
+                self.progress_func(job, f"Error: {e}")
+                succeeded, final_status = False, "Failed"
+            self.results[job.device_ssid] = succeeded
+            self.progress_func(job, final_status)
+
+
+@dataclass
+class ProvisioningSettings:
+    """Defaults a DeviceJob falls back to, and how its device is driven. Mirrors the Application's settings."""
+    url: str = "http://setup.com"
+    command: str = "dfuu -i wlan --multi"
+    adapter: str = "Wi-Fi"        # PC Wi-Fi adapter for jobs that do not name one
+    webdriver_path: str = None    # msedgedriver path (selenium driver backend)
+    wait_budgets: dict = None     # Overrides of DEFAULT_WAIT_BUDGETS
+    ecache_delete_mode: str = "script"
+    driver_backend: str = "selenium"
+    checkpoint_dir: str = None    # Per-device ProvisioningCheckpoint files (None disables resuming)
+    firmware_command: object = None # Callable(command) -> command pointing dfuu at the firmware mirror, applied to every job's command
+
+
+def provision_device(job, settings, log_func, progress, resume_event, connect_func, status_func,
+                     set_static_ip_func, revert_ip_func, auto_resume_func=None, driver_pool=None, run_report=None,
+                     cancel_token=None, artifact_writer=None):
+    """
+    Provisions one DeviceJob on its adapter without any GUI: connects the adapter to the device's
+    access point, runs automate_web_actions, then reverts the adapter to DHCP for the next device.
+
+    connect_func(ssid, password, adapter) -> (success_message, error_message)
+    status_func(adapter) -> (ip_address, connected_ssid, error_message), read fresh
+    set_static_ip_func(adapter) / revert_ip_func(adapter) change the adapter's IP settings.
+    auto_resume_func(job, adapter, resume_event) is called when the run waits for the PC to rejoin
+    the device after its reboot and returns the AutoReconnectWatcher it started (stopped when the run
+    ends); without it resume_event must be set by someone else.
+    cancel_token: Optional CancellationToken; a cancelled run still reverts the adapter, then raises OperationCancelled.
+    artifact_writer: Optional ArtifactWriter for the run's diagnostic captures.
+    Returns True on success.
+    """
+    adapter = job.adapter or settings.adapter
+    if cancel_token is None:
+        cancel_token = CancellationToken()
+    watchers = []
+
+    def job_progress(status):
+        progress(status)
+        if status == "Waiting for reconnect" and auto_resume_func:
+            watcher = auto_resume_func(job, adapter, resume_event)
+            if watcher:
+                watchers.append(watcher)
+
+    checkpoint = None
+    if settings.checkpoint_dir:
+        checkpoint = ProvisioningCheckpoint.load(settings.checkpoint_dir, job.device_ssid, job.target_ssid)
+
+    with cancel_token.activate():
+        progress("Connecting to device")
+        success_message, error_message = connect_func(job.device_ssid, job.device_password, adapter)
+        if error_message:
+            log_func(error_message)
+            return False
+        log_func(success_message)
+        waits = WaitTracker(log_func, settings.wait_budgets)
+        if not waits.wait("adapter_connect", lambda: status_func(adapter)[1] == job.device_ssid):
+            log_func(f"Adapter '{adapter}' did not associate with '{job.device_ssid}'. Skipping this device.")
+            return False
+
+        command = job.command or settings.command
+        if settings.firmware_command:
+            command = settings.firmware_command(command)
+        try:
+            succeeded = automate_web_actions(
+                job.url or settings.url,
+                settings.webdriver_path,
+                command,
+                log_func,
+                lambda: set_static_ip_func(adapter),
+                job.target_ssid,
+                job.target_password,
+                resume_event,
+                None,
+                settings.wait_budgets,
+                settings.ecache_delete_mode,
+                settings.driver_backend,
+                job_progress,
+                driver_pool,
+                run_report,
+                checkpoint,
+                cancel_token,
+                artifact_writer
+            )
+        finally:
+            for watcher in watchers:
+                watcher.stop()
+
+    # Outside the token, so a cancelled run still frees the adapter for the next device
+    progress("Reverting adapter to DHCP")
+    revert_ip_func(adapter)
+    cancel_token.raise_if_cancelled()
+    return succeeded
+
+
+# --- Automatic reconnect after the device reboots ---
+class AutoReconnectWatcher:
+    """
+    Resumes a paused automation without operator input. Once started it rescans until the
+    device's SSID reappears after its reboot, joins it with connect_func (the regular profile
+    logic), checks that the device UI at url answers, and sets resume_event.
+    The manual Resume button stays usable: whichever sets the event first wins, and the watcher
+    gives up (leaving the manual path) when its "auto_resume" budget runs out.
+    Each scan runs as a task on workers (BackgroundWorkers), re-armed every SCAN_INTERVAL seconds.
+
+    scan_func(adapter) -> (ssids, error_message)
+    connect_func(ssid, password, adapter) -> (success_message, error_message)
+    status_func(adapter) -> (ip_address, connected_ssid, error_message), read fresh
+    give_up_func() is called, if given, when the budget runs out (e.g. when no operator can click Resume).
+    """
+    SCAN_INTERVAL = 3
+
+    def __init__(self, device_ssid, device_password, adapter, url, resume_event,
+                 scan_func, connect_func, status_func, log_func, workers, wait_budgets=None, give_up_func=None):
+        self.device_ssid = device_ssid
+        self.device_password = device_password
+        self.adapter = adapter
+        self.url = url
+        self.resume_event = resume_event
+        self.scan_func = scan_func
+        self.connect_func = connect_func
+        self.status_func = status_func
+        self.log_func = log_func
+        self.waits = WaitTracker(log_func, wait_budgets)
+        self.give_up_func = give_up_func
+        self.workers = workers
+        self._deadline = None
+        self._next_scan = None # ScheduledCall of the next scan
+        self._stopped = threading.Event()
+
+    def start(self):
+        self.log_func(f"Auto-resume: watching for '{self.device_ssid}' to reappear (the Resume button still works).")
+        self._deadline = time.monotonic() + self.waits.budgets["auto_resume"]
+        self.workers.submit(self._scan_once)
+
+    def stop(self):
+        self._stopped.set()
+        if self._next_scan:
+            self._next_scan.cancel()
+
+    def _done(self):
+        return self._stopped.is_set() or self.resume_event.is_set()
+
+    def _scan_once(self):
+        """One scan (and join, once the SSID is back). Re-arms itself until done or out of budget."""
+        if self._done():
+            return
+        if time.monotonic() > self._deadline:
+            self.log_func(f"Auto-resume: '{self.device_ssid}' did not come back within "
+                          f"{self.waits.budgets['auto_resume']}s. Reconnect manually and click Resume.")
+            if self.give_up_func:
+                self.give_up_func()
+            return
+        ssids, error_message = self.scan_func(self.adapter)
+        if error_message:
+            self.log_func(f"Auto-resume: scan failed: {error_message}")
+        elif self.device_ssid in ssids and self._join_and_probe():
+            if not self._done():
+                self.resume_event.set()
+            return
+        if not self._done():
+            self._next_scan = self.workers.call_later(self.SCAN_INTERVAL, self._scan_once)
+
+    def _join_and_probe(self):
+        """Joins the device SSID and probes its UI. Returns True when the run can resume."""
+        self.log_func(f"Auto-resume: '{self.device_ssid}' is visible again. Connecting...")
+        _, error_message = self.connect_func(self.device_ssid, self.device_password, self.adapter)
+        if error_message:
+            self.log_func(f"Auto-resume: connect failed, will retry: {error_message}")
+            return False
+        if not self.waits.wait("adapter_connect", lambda: self._done() or self.status_func(self.adapter)[1] == self.device_ssid):
+            self.log_func(f"Auto-resume: not associated with '{self.device_ssid}' yet, will retry.")
+            return False
+        if self.waits.wait("device_probe", lambda: self._done() or is_url_reachable(self.url)):
+            self.log_func(f"Auto-resume: {self.url} answers. Resuming automatically.")
+        else:
+            # The device may only answer once the static IP (the next automation step) is applied.
+            self.log_func(f"Auto-resume: connected to '{self.device_ssid}' but {self.url} is not answering yet. "
+                          f"Resuming so the static IP step can run.")
+        return True
+
+
+# --- PC network backends ---
+NETWORK_BACKENDS = ("netsh", "linux", "fake")
+
+
+class NetworkBackendError(Exception):
+    """A PC network operation failed. The message is ready to be shown to the user."""
+
+
+class NetworkBackend:
+    """
+    PC-side Wi-Fi scan/connect and adapter IP control, the only place OS network commands run.
+    adapter is the OS name of the Wi-Fi adapter (None lets the OS pick, where supported).
+    Every method raises NetworkBackendError on failure.
+    """
+    name = None
+
+    def __init__(self, log_func):
+        self.log_func = log_func
+        self.profiles = None # WifiProfileRegistry of backends that install Wi-Fi profiles
+
+    def scan_networks(self, adapter=None):
+        """Returns a netsh_parser.WifiNetwork (SSID, BSSIDs, signal, security) per network visible to the PC (or to adapter only)."""
+        raise NotImplementedError
+
+    def scan(self, adapter=None):
+        """Returns the SSIDs visible to the PC (or to adapter only), hidden networks left out."""
+        ssids = []
+        for network in self.scan_networks(adapter):
+            if network.ssid and network.ssid not in ssids:
+                ssids.append(network.ssid)
+        return ssids
+
+    def connect(self, ssid, password, adapter=None):
+        """Connects to ssid, installing a WPA2-PSK profile first if password is given. Returns a status message."""
+        raise NotImplementedError
+
+    def get_status(self, adapter):
+        """Returns (ip_address, connected_ssid); "N/A" stands for an unknown value."""
+        raise NotImplementedError
+
+    def set_static_ip(self, adapter, ip_address, subnet_mask, gateway, dns=None):
+        """Sets a static IPv4 address on adapter, and a static DNS server if dns is given."""
+        raise NotImplementedError
+
+    def set_dhcp(self, adapter):
+        """Reverts adapter's address and DNS server to DHCP."""
+        raise NotImplementedError
+
+    def close(self):
+        """Releases long-lived resources (e.g. a PersistentShell)."""
+
+    def _install_profile(self, ssid, password):
+        """Installs (or updates) the WPA2-PSK profile for ssid and records it in self.profiles."""
+        raise NotImplementedError
+
+    def preinstall_profiles(self, credentials):
+        """
+        Installs the Wi-Fi profiles of (ssid, password) pairs ahead of their first connect, skipping
+        profiles already installed with the same password. Returns how many were installed.
+        """
+        if self.profiles is None:
+            return 0
+        installed = 0
+        for ssid, password in credentials:
+            if password and self.profiles.needs_install(ssid, password):
+                try:
+                    self._install_profile(ssid, password)
+                    installed += 1
+                except NetworkBackendError as e:
+                    self.log_func(f"Could not pre-install the PC Wi-Fi profile for '{ssid}': {e}")
+        return installed
+
+
+class WifiProfileRegistry:
+    """
+    Wi-Fi profiles installed on the PC, with a hash of the password each was installed with by this app.
+    list_func() enumerates the installed profile names once, on first use; afterwards the registry is
+    kept up to date as profiles are installed, so an unchanged profile is never re-added.
+    Profiles found on the PC but not installed by this app have unknown credentials and are re-installed once.
+    """
+    def __init__(self, list_func):
+        self.list_func = list_func
+        self._profiles = None # ssid -> credential hash, or None if unknown
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _credential_hash(ssid, password):
+        return hashlib.sha256(f"{ssid}\0{password}".encode("utf-8")).hexdigest()
+
+    def _loaded(self):
+        if self._profiles is None:
+            try:
+                self._profiles = {name: None for name in self.list_func()}
+            except NetworkBackendError:
+                self._profiles = {} # Unknown: profiles are (re)installed as they are used
+        return self._profiles
+
+    def is_installed(self, ssid):
+        with self._lock:
+            return ssid in self._loaded()
+
+    def needs_install(self, ssid, password):
+        """True unless ssid's profile is known to be installed with password."""
+        with self._lock:
+            return self._loaded().get(ssid) != self._credential_hash(ssid, password)
+
+    def mark_installed(self, ssid, password):
+        with self._lock:
+            self._loaded()[ssid] = self._credential_hash(ssid, password)
+
+    def forget(self, ssid):
+        with self._lock:
+            self._loaded().pop(ssid, None)
+
+    def refresh(self):
+        """Drops everything known, so the installed profiles are enumerated again on next use."""
+        with self._lock:
+            self._profiles = None
+
+
+def create_wifi_profile_xml(ssid, password):
+    """Generates an XML string for a WPA2-PSK Wi-Fi profile."""
+    xml_template = """<?xml version="1.0"?>
+<WLANProfile xmlns="http://www.microsoft.com/networking/WLAN/profile/v1">
+    <name>{ssid}</name>
+    <SSIDConfig>
+        <SSID>
+            <name>{ssid}</name>
+        </SSID>
+    </SSIDConfig>
+    <connectionMode>auto</connectionMode>
+    <MSM>
+        <security>
+            <authAndCiphers>
+                <authentication>WPA2PSK</authentication>
+                <encryption>AES</encryption>
+                <useOneX>false</useOneX>
+            </authAndCiphers>
+            <sharedKey>
+                <keyType>passPhrase</keyType>
+                <protected>false</protected>
+                <keyMaterial>{password}</keyMaterial>
+            </sharedKey>
+        </security>
+    </MSM>
+</WLANProfile>"""
+    return xml_template.format(ssid=ssid, password=password)
+
+
+class NetshNetworkBackend(NetworkBackend):
+    """Windows backend driving `netsh wlan` and `netsh interface ip`. adapter is the interface name, e.g. "Wi-Fi"."""
+    name = "netsh"
+    NOT_FOUND_MESSAGE = "Error: 'netsh' command not found. This command is specific to Windows."
+    ADMIN_HINT = "\n--- Please ensure the script is run as ADMINISTRATOR! ---"
+
+    def __init__(self, log_func, persistent_shell=True):
+        """
+        persistent_shell runs the quick read-only netsh queries (status, profile list) in one long-lived
+        cmd.exe instead of a new shell each. Scans and commands that change adapter state always run
+        in their own process, so a slow connect or scan never holds up those reads and its timeout
+        kills only that process.
+        """
+        super().__init__(log_func)
+        self.shell = PersistentShell(log_func, startup_commands=("chcp 65001 >nul",)) if persistent_shell else None
+        self.profiles = WifiProfileRegistry(self._list_profiles)
+
+    def close(self):
+        if self.shell:
+            self.shell.close()
+
+    def _run(self, step, command, describe_error, read_only=False):
+        """
+        run_netsh, with failures turned into NetworkBackendError(describe_error(CalledProcessError)).
+        read_only queries go through the persistent shell (when enabled); everything else runs as a one-off process.
+        """
+        try:
+            return run_netsh(step, command, self.shell if read_only else None)
+        except subprocess.CalledProcessError as e:
+            raise NetworkBackendError(describe_error(e)) from e
+        except subprocess.TimeoutExpired as e:
+            raise NetworkBackendError(f"Error: netsh did not answer within {e.timeout}s: {command}") from e
+        except FileNotFoundError as e:
+            raise NetworkBackendError(self.NOT_FOUND_MESSAGE) from e
+
+    def _command_error(self, action):
+        def describe(e):
+            message = (f"Error {action}: {e}\n  Command: {e.cmd}\n  Return Code: {e.returncode}\n  "
+                       f"Stderr: {e.stderr.strip()}")
+            if "Access is denied" in e.stderr:
+                message += self.ADMIN_HINT
+            return message
+        return describe
+
+    def _log_output(self, label, result):
+        self.log_func(f"{label} stdout: {result.stdout.strip()}")
+        if result.stderr:
+            self.log_func(f"{label} stderr: {result.stderr.strip()}")
+
+    def scan_networks(self, adapter=None):
+        command = "chcp 65001 && netsh wlan show networks mode=bssid"
+        if adapter:
+            command += f' interface="{adapter}"'
+        result = self._run("netsh_scan", command,
+                           lambda e: f"Error running netsh command for PC Wi-Fi scan: {e}\n  Stderr: {e.stderr.strip()}")
+        return netsh_parser.parse_networks(result.stdout)
+
+    @staticmethod
+    def _connect_error(password):
+        def describe(e):
+            message = (f"Error during PC Wi-Fi connection attempt: {e}\n  Command: {e.cmd}\n  "
+                       f"Return Code: {e.returncode}\n  Stderr: {e.stderr.strip()}")
+            if "Access is denied" in e.stderr:
+                message += NetshNetworkBackend.ADMIN_HINT
+            elif "The specified network is not found" in e.stderr and password:
+                message += "\n--- Ensure the password is correct or the network supports WPA2-PSK/AES. ---"
+            return message
+        return describe
+
+    def _list_profiles(self):
+        result = self._run("netsh_list_profiles", "chcp 65001 && netsh wlan show profiles",
+                           lambda e: f"Error listing PC Wi-Fi profiles: {e}\n  Stderr: {e.stderr.strip()}", read_only=True)
+        return netsh_parser.parse_profiles(result.stdout)
+
+    def _install_profile(self, ssid, password):
+        # 1. Create XML profile
+        profile_temp_path = os.path.join(os.environ.get("TEMP", "."), f"{ssid}.xml")
+        try:
+            with open(profile_temp_path, "w") as f:
+                f.write(create_wifi_profile_xml(ssid, password))
+        except OSError as e:
+            raise NetworkBackendError(f"Error writing temporary PC Wi-Fi profile XML '{profile_temp_path}': {e}") from e
+        self.log_func(f"Created temporary PC Wi-Fi profile XML: {profile_temp_path}")
+
+        # 2. Add the profile
+        try:
+            result_add = self._run("netsh_add_profile", f'netsh wlan add profile filename="{profile_temp_path}" user=current',
+                                   self._connect_error(password))
+        finally:
+            # Clean up the temporary XML file
+            if os.path.exists(profile_temp_path):
+                os.remove(profile_temp_path)
+                self.log_func(f"Removed temporary PC Wi-Fi profile XML: {profile_temp_path}")
+        self.log_func(f"PC Profile added output:\n{result_add.stdout.strip()}")
+        self.log_func(f"Successfully added PC Wi-Fi profile for '{ssid}'.")
+        self.profiles.mark_installed(ssid, password)
+
+    def connect(self, ssid, password, adapter=None):
+        interface_arg = f' interface="{adapter}"' if adapter else ""
+        connect_command = f'netsh wlan connect name="{ssid}"{interface_arg}'
+        describe = self._connect_error(password)
+
+        profile_reused = bool(password) and not self.profiles.needs_install(ssid, password)
+        if password and not profile_reused:
+            self._install_profile(ssid, password)
+        elif profile_reused:
+            self.log_func(f"PC Wi-Fi profile for '{ssid}' is already installed with this password; connecting directly.")
+
+        # 3. Connect to the profile (open networks and pre-existing profiles connect directly)
+        try:
+            result_connect = self._run("netsh_connect", connect_command, describe)
+        except NetworkBackendError:
+            if not profile_reused:
+                raise
+            # The profile may have been removed outside this app: install it again and retry once
+            self.profiles.forget(ssid)
+            self._install_profile(ssid, password)
+            result_connect = self._run("netsh_connect", connect_command, describe)
+        return f"Successfully sent connect command for PC to '{ssid}'. Check your system's Wi-Fi status.\n{result_connect.stdout.strip()}"
+
+    def get_status(self, adapter):
+        def describe(e):
+            message = f"Error running netsh command for current IP/SSID: {e}\n  Stderr: {e.stderr.strip()}"
+            if "No such interface is supported" in e.stderr or "The specified file was not found" in e.stderr:
+                message += "\n--- Ensure your Wi-Fi Adapter Name is correct and exists on your system. ---"
+            elif "Access is denied" in e.stderr:
+                message += self.ADMIN_HINT
+            return message
+
+        result = self._run("netsh_status_ip", f"chcp 65001 && netsh interface ip show config name=\"{adapter}\"", describe,
+                           read_only=True)
+        configs = netsh_parser.parse_ip_config(result.stdout)
+        ip_address = (configs[0].ip_address if configs else None) or "N/A"
+
+        result_wlan = self._run("netsh_status_wlan", "chcp 65001 && netsh wlan show interfaces", describe, read_only=True)
+        # With several adapters the SSID is taken from adapter's block; a single one is used whatever its name
+        interface = netsh_parser.find_interface(netsh_parser.parse_interfaces(result_wlan.stdout), adapter)
+        return ip_address, (interface.ssid if interface else None) or "N/A"
+
+    def set_static_ip(self, adapter, ip_address, subnet_mask, gateway, dns=None):
+        describe = self._command_error("setting PC static IP")
+        command = f'netsh interface ip set address name="{adapter}" static {ip_address} {subnet_mask} {gateway}'
+        self.log_func(f"Running command: {command}")
+        self._log_output("IP set command", self._run("netsh_static_ip", command, describe))
+        if dns:
+            dns_command = f'netsh interface ip set dns name="{adapter}" static {dns} primary'
+            self.log_func(f"Running DNS command: {dns_command}")
+            self._log_output("DNS set command", self._run("netsh_static_dns", dns_command, describe))
+
+    def set_dhcp(self, adapter):
+        describe = self._command_error("reverting PC IP to DHCP")
+        command_ip = f'netsh interface ip set address name="{adapter}" dhcp'
+        self.log_func(f"Running command: {command_ip}")
+        self._log_output("IP DHCP command", self._run("netsh_dhcp_ip", command_ip, describe))
+        command_dns = f'netsh interface ip set dns name="{adapter}" dhcp'
+        self.log_func(f"Running DNS command: {command_dns}")
+        self._log_output("DNS DHCP command", self._run("netsh_dhcp_dns", command_dns, describe))
+
+
+def _split_nmcli_fields(line):
+    """Splits a line of `nmcli -t` output on its unescaped ':' separators."""
+    return [field.replace("\\:", ":").replace("\\\\", "\\") for field in re.split(r"(?<!\\):", line)]
+
+
+class LinuxNetworkBackend(NetworkBackend):
+    """
+    Linux backend: NetworkManager (nmcli) for Wi-Fi and connection settings, iproute2 (ip) for
+    address reads. adapter is the interface name, e.g. "wlan0".
+    """
+    name = "linux"
+
+    def __init__(self, log_func, persistent_shell=True):
+        """
+        persistent_shell runs the quick read-only queries (addresses, connection names, profile list) in one
+        long-lived /bin/sh instead of forking it from Python each time. Scans and commands that change
+        adapter state always run in their own process (see NetshNetworkBackend).
+        """
+        super().__init__(log_func)
+        self.shell = PersistentShell(log_func) if persistent_shell else None
+        self.profiles = WifiProfileRegistry(self._list_profiles)
+
+    def close(self):
+        if self.shell:
+            self.shell.close()
+
+    def _run(self, step, args, secret=None, read_only=False):
+        command = " ".join("****" if secret and arg == secret else arg for arg in args)
+        with step_span(step):
+            try:
+                if self.shell and read_only:
+                    return self.shell.run(shlex.join(args))
+                return run_cancellable(args)
+            except subprocess.CalledProcessError as e:
+                if self.shell and read_only and e.returncode == 127: # The shell's "command not found"
+                    raise NetworkBackendError(f"Error: '{args[0]}' command not found. NetworkManager (nmcli) and iproute2 (ip) are required.") from e
+                message = f"Error running '{command}': return code {e.returncode}\n  Stderr: {e.stderr.strip()}"
+                if "Not authorized" in e.stderr or "Insufficient privileges" in e.stderr:
+                    message += "\n--- Please run as root or allow this user to control NetworkManager. ---"
+                raise NetworkBackendError(message) from e
+            except subprocess.TimeoutExpired as e:
+                raise NetworkBackendError(f"Error: '{command}' did not answer within {e.timeout}s.") from e
+            except FileNotFoundError as e:
+                raise NetworkBackendError(f"Error: '{args[0]}' command not found. NetworkManager (nmcli) and iproute2 (ip) are required.") from e
+
+    def _connection_name(self, adapter):
+        result = self._run("nmcli_connection", ["nmcli", "-t", "-f", "GENERAL.CONNECTION", "device", "show", adapter],
+                           read_only=True)
+        name = result.stdout.strip().partition(":")[2]
+        if not name or name == "--":
+            raise NetworkBackendError(f"Adapter '{adapter}' has no active connection to configure.")
+        return name
+
+    def scan_networks(self, adapter=None):
+        args = ["nmcli", "-t", "-f", "SSID,BSSID,SIGNAL,CHAN,SECURITY,DEVICE", "device", "wifi", "list"]
+        if adapter:
+            args += ["ifname", adapter]
+        networks = {}
+        for line in self._run("nmcli_scan", args).stdout.splitlines():
+            fields = _split_nmcli_fields(line)
+            if len(fields) < 6:
+                continue
+            ssid, bssid, signal, channel, security, device = fields[:6]
+            network = networks.get((device, ssid))
+            if network is None:
+                network = networks[(device, ssid)] = netsh_parser.WifiNetwork(
+                    ssid=ssid, interface=device, authentication=security or "Open")
+            network.bssids.append(netsh_parser.BssidInfo(bssid=bssid, signal=int(signal) if signal.isdigit() else None,
+                                                         channel=int(channel) if channel.isdigit() else None))
+        return list(networks.values())
+
+    def _list_profiles(self):
+        result = self._run("nmcli_list_profiles", ["nmcli", "-t", "-f", "NAME,TYPE", "connection", "show"], read_only=True)
+        return [fields[0] for fields in map(_split_nmcli_fields, result.stdout.splitlines())
+                if len(fields) >= 2 and fields[1] == "802-11-wireless"]
+
+    def _install_profile(self, ssid, password):
+        # Profiles are NetworkManager connections named after their SSID
+        if self.profiles.is_installed(ssid):
+            args = ["nmcli", "connection", "modify", ssid, "wifi-sec.key-mgmt", "wpa-psk", "wifi-sec.psk", password]
+        else:
+            args = ["nmcli", "connection", "add", "type", "wifi", "con-name", ssid, "ifname", "*", "ssid", ssid,
+                    "wifi-sec.key-mgmt", "wpa-psk", "wifi-sec.psk", password, "connection.autoconnect", "no"]
+        self._run("nmcli_add_profile", args, secret=password)
+        self.log_func(f"Successfully added PC Wi-Fi profile for '{ssid}'.")
+        self.profiles.mark_installed(ssid, password)
+
+    def connect(self, ssid, password, adapter=None):
+        if password and self.profiles.needs_install(ssid, password):
+            self._install_profile(ssid, password)
+        if self.profiles.is_installed(ssid):
+            args = ["nmcli", "connection", "up", "id", ssid]
+        else:
+            args = ["nmcli", "device", "wifi", "connect", ssid] # Open network without a profile yet
+        if adapter:
+            args += ["ifname", adapter]
+        result = self._run("nmcli_connect", args)
+        return f"Successfully connected PC to '{ssid}'.\n{result.stdout.strip()}"
+
+    def get_status(self, adapter):
+        ip_address = "N/A"
+        result = self._run("ip_status", ["ip", "-4", "-o", "addr", "show", "dev", adapter], read_only=True)
+        ip_match = re.search(r"inet ((?:\d{1,3}\.){3}\d{1,3})/", result.stdout)
+        if ip_match:
+            ip_address = ip_match.group(1)
+
+        connected_ssid = "N/A"
+        result_wifi = self._run("nmcli_status", ["nmcli", "-t", "-f", "ACTIVE,SSID", "device", "wifi", "list", "ifname", adapter],
+                                 read_only=True)
+        for line in result_wifi.stdout.splitlines():
+            fields = _split_nmcli_fields(line)
+            if len(fields) >= 2 and fields[0] == "yes" and fields[1]:
+                connected_ssid = fields[1]
+                break
+        return ip_address, connected_ssid
+
+    def set_static_ip(self, adapter, ip_address, subnet_mask, gateway, dns=None):
+        connection = self._connection_name(adapter)
+        prefix = ipaddress.IPv4Network(f"0.0.0.0/{subnet_mask}").prefixlen
+        args = ["nmcli", "connection", "modify", connection, "ipv4.method", "manual",
+                "ipv4.addresses", f"{ip_address}/{prefix}", "ipv4.gateway", gateway]
+        if dns:
+            args += ["ipv4.dns", dns]
+        self.log_func(f"Running command: {' '.join(args)}")
+        self._run("nmcli_static_ip", args)
+        self._run("nmcli_reactivate", ["nmcli", "connection", "up", connection, "ifname", adapter])
+
+    def set_dhcp(self, adapter):
+        connection = self._connection_name(adapter)
+        args = ["nmcli", "connection", "modify", connection, "ipv4.method", "auto",
+                "ipv4.addresses", "", "ipv4.gateway", "", "ipv4.dns", ""]
+        self.log_func(f"Running command: {' '.join(args)}")
+        self._run("nmcli_dhcp", args)
+        self._run("nmcli_reactivate", ["nmcli", "connection", "up", connection, "ifname", adapter])
+
+
+class FakeNetworkBackend(NetworkBackend):
+    """
+    Scriptable in-memory backend for tests and benchmarks; no real adapter is touched.
+    networks: {ssid: password} the PC can see (None for an open network).
+    latency: simulated seconds per operation, or {operation: seconds} ("scan", "connect", ...).
+    dhcp_ip: address an adapter gets from DHCP after connecting.
+    signals: {ssid: signal percent} reported by scans (100 if missing).
+    Connecting with a password installs a profile ("add_profile" call) unless one with that password exists.
+    fail_next(operation, message) makes the next call of an operation raise NetworkBackendError.
+    """
+    name = "fake"
+
+    def __init__(self, log_func=None, networks=None, latency=0.0, dhcp_ip="192.168.1.50", signals=None):
+        super().__init__(log_func or (lambda message: None))
+        self.networks = dict(networks or {})
+        self.signals = dict(signals or {}) # ssid -> signal percent reported by scans (default 100)
+        self.latency = latency
+        self.dhcp_ip = dhcp_ip
+        self.adapters = {} # adapter -> {"ssid", "ip", "static"}
+        self.calls = [] # (operation, args) in call order
+        self.profiles = WifiProfileRegistry(lambda: [])
+        self._failures = {} # operation -> [message, ...]
+        self._lock = threading.Lock()
+
+    def set_visible(self, ssid, visible=True, password=None):
+        """Shows or hides a network, e.g. to simulate a device rebooting. Hiding it drops adapters on it."""
+        with self._lock:
+            if visible:
+                self.networks[ssid] = password
+            else:
+                self.networks.pop(ssid, None)
+                for state in self.adapters.values():
+                    if state["ssid"] == ssid:
+                        state.update(ssid="N/A", ip="N/A")
+
+    def fail_next(self, operation, message="Injected failure"):
+        with self._lock:
+            self._failures.setdefault(operation, []).append(message)
+
+    def _operation(self, operation, *args):
+        delay = self.latency.get(operation, 0.0) if isinstance(self.latency, dict) else self.latency
+        with step_span(f"fake_{operation}"):
+            if delay:
+                cancellable_sleep(delay)
+        with self._lock:
+            self.calls.append((operation, args))
+            failures = self._failures.get(operation)
+            if failures:
+                raise NetworkBackendError(failures.pop(0))
+
+    def _adapter(self, adapter):
+        return self.adapters.setdefault(adapter or "Wi-Fi", {"ssid": "N/A", "ip": "N/A", "static": False})
+
+    def scan_networks(self, adapter=None):
+        self._operation("scan", adapter)
+        with self._lock:
+            return [netsh_parser.WifiNetwork(
+                        ssid=ssid, interface=adapter or "Wi-Fi", authentication="Open" if password is None else "WPA2-Personal",
+                        bssids=[netsh_parser.BssidInfo(bssid=f"02:00:00:00:00:{index:02x}", signal=self.signals.get(ssid, 100))])
+                    for index, (ssid, password) in enumerate(self.networks.items())]
+
+    def _install_profile(self, ssid, password):
+        self._operation("add_profile", ssid)
+        self.profiles.mark_installed(ssid, password)
+
+    def connect(self, ssid, password, adapter=None):
+        if password and self.profiles.needs_install(ssid, password):
+            self._install_profile(ssid, password)
+        self._operation("connect", ssid, adapter)
+        with self._lock:
+            if ssid not in self.networks:
+                raise NetworkBackendError(f"Error during PC Wi-Fi connection attempt: The specified network '{ssid}' is not found.")
+            expected = self.networks[ssid]
+            if expected is not None and password and password != expected:
+                raise NetworkBackendError(f"Error during PC Wi-Fi connection attempt: wrong password for '{ssid}'.")
+            state = self._adapter(adapter)
+            state["ssid"] = ssid
+            if not state["static"]:
+                state["ip"] = self.dhcp_ip
+        return f"Successfully connected PC to '{ssid}'."
+
+    def get_status(self, adapter):
+        self._operation("status", adapter)
+        with self._lock:
+            state = self._adapter(adapter)
+            return state["ip"], state["ssid"]
+
+    def set_static_ip(self, adapter, ip_address, subnet_mask, gateway, dns=None):
+        self._operation("static_ip", adapter, ip_address)
+        with self._lock:
+            self._adapter(adapter).update(ip=ip_address, static=True)
+
+    def set_dhcp(self, adapter):
+        self._operation("dhcp", adapter)
+        with self._lock:
+            state = self._adapter(adapter)
+            state.update(ip=self.dhcp_ip if state["ssid"] != "N/A" else "N/A", static=False)
+
+
+def create_network_backend(name, log_func, **options):
+    """
+    Returns the NetworkBackend named name (one of NETWORK_BACKENDS); options go to its constructor
+    (e.g. persistent_shell for "netsh"/"linux", networks/latency for "fake").
+    """
+    if name == "netsh":
+        return NetshNetworkBackend(log_func, **options)
+    if name == "linux":
+        return LinuxNetworkBackend(log_func, **options)
+    if name == "fake":
+        return FakeNetworkBackend(log_func, **options)
+    raise ValueError(f"Unknown network backend '{name}'. Expected one of {NETWORK_BACKENDS}.")
+
+
+# --- PC network status monitor ---
+@dataclass
+class NetworkSnapshot:
+    """IP/SSID state of one PC adapter as last read by the NetworkMonitor."""
+    ip_address: str
+    connected_ssid: str
+    error_message: str = None
+    timestamp: float = 0.0 # time.monotonic() when the read started
+
+    def as_tuple(self):
+        return self.ip_address, self.connected_ssid, self.error_message
+
+
+class NetworkMonitor:
+    """
+    Long-lived owner of PC network status reads.
+    Keeps one cached NetworkSnapshot per adapter, valid for ttl seconds. Tracked adapters are
+    refreshed in the background every poll_interval seconds and, on Windows, within
+    NOTIFY_CHECK_INTERVAL seconds of the OS reporting an IP address change. Subscribers are
+    called whenever an adapter's snapshot changes. All background reads run on workers (BackgroundWorkers).
+    read_func(adapter) -> (ip_address, connected_ssid, error_message) performs the actual read.
+    """
+    NOTIFY_CHECK_INTERVAL = 1.0
+
+    def __init__(self, read_func, workers, ttl=5.0, poll_interval=15.0):
+        self.read_func = read_func
+        self.workers = workers
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._snapshots = {} # adapter -> NetworkSnapshot
+        self._read_locks = {} # adapter -> Lock serializing reads of that adapter
+        self._tracked = set()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._timers = {} # "poll"/"notify" -> ScheduledCall of the next tick
+        self._address_change = None # (notify_addr_change, overlapped) while armed
+        self._stopped = threading.Event()
+
+    def subscribe(self, callback):
+        """callback(adapter, snapshot) is called from a worker (or get_snapshot's caller) whenever a snapshot changes."""
+        self._subscribers.append(callback)
+
+    def start(self, adapters=()):
+        with self._lock:
+            self._tracked.update(adapters)
+        self._rearm("poll", self.poll_interval, self._poll)
+        if sys.platform == "win32" and self._arm_address_change():
+            self._rearm("notify", self.NOTIFY_CHECK_INTERVAL, self._check_address_change)
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            timers = list(self._timers.values())
+        for timer in timers:
+            timer.cancel()
+        self._disarm_address_change()
+
+    def cached(self, adapter):
+        """Returns adapter's last snapshot (however old), or None. Never blocks on a read."""
+        with self._lock:
+            return self._snapshots.get(adapter)
+
+    def get_snapshot(self, adapter, max_age=None):
+        """
+        Returns adapter's snapshot, reading it on the calling thread if the cached one is older than
+        max_age seconds (default ttl). Concurrent callers share a single read.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        requested_at = time.monotonic()
+        with self._lock:
+            read_lock = self._read_locks.setdefault(adapter, threading.Lock())
+        with read_lock:
+            snapshot = self.cached(adapter)
+            if snapshot and (requested_at - snapshot.timestamp <= max_age or snapshot.timestamp >= requested_at):
+                return snapshot
+            read_started = time.monotonic()
+            snapshot = NetworkSnapshot(*self.read_func(adapter), timestamp=read_started)
+            with self._lock:
+                previous = self._snapshots.get(adapter)
+                self._snapshots[adapter] = snapshot
+        if previous is None or previous.as_tuple() != snapshot.as_tuple():
+            for callback in list(self._subscribers):
+                callback(adapter, snapshot)
+        return snapshot
+
+    def request_refresh(self, adapter, max_age=None, callback=None):
+        """
+        Refreshes adapter on a worker if its snapshot is older than max_age, and keeps
+        tracking it afterwards. callback(snapshot), if given, is called from that worker.
+        """
+        self.workers.submit(self._refresh, adapter, max_age, callback)
 
-        # --- Step 2: Loop to delete all "ECache" files ---
-        log_func("\n--- Deleting ECache files ---")
-        delete_count = 0
-        max_attempts_overall = 100
+    def _refresh(self, adapter, max_age, callback):
+        if self._stopped.is_set():
+            return
+        with self._lock:
+            self._tracked.add(adapter)
+        snapshot = self.get_snapshot(adapter, max_age)
+        if callback:
+            callback(snapshot)
+
+    def _rearm(self, name, delay, func):
+        with self._lock:
+            if not self._stopped.is_set():
+                self._timers[name] = self.workers.call_later(delay, func)
+
+    def _poll(self):
+        if self._stopped.is_set():
+            return
+        with self._lock:
+            adapters = list(self._tracked)
+        for adapter in adapters:
+            self.get_snapshot(adapter)
+        self._rearm("poll", self.poll_interval, self._poll)
 
+    def _arm_address_change(self):
+        """
+        Asks iphlpapi's NotifyAddrChange to signal an event on the next IP address change, without
+        blocking a thread in the call. Returns False where it is unavailable.
+        """
         try:
-            driver.save_screenshot("before_ecache_deletion.png")
-            log_func("Screenshot 'before_ecache_deletion.png' saved.")
-        except Exception as e:
-            log_func(f"Could not save screenshot before ECache deletion: {e}")
+            import ctypes
+            from ctypes import wintypes
+            notify_addr_change = ctypes.windll.iphlpapi.NotifyAddrChange
+            create_event = ctypes.windll.kernel32.CreateEventW
+        except (ImportError, AttributeError, OSError):
+            return False
+
+        class Overlapped(ctypes.Structure):
+            _fields_ = [("Internal", ctypes.c_void_p), ("InternalHigh", ctypes.c_void_p),
+                        ("Offset", wintypes.DWORD), ("OffsetHigh", wintypes.DWORD), ("hEvent", wintypes.HANDLE)]
+
+        create_event.restype = wintypes.HANDLE
+        overlapped = Overlapped(hEvent=create_event(None, False, False, None))
+        if not overlapped.hEvent:
+            return False
+        self._address_change = (notify_addr_change, overlapped)
+        return self._request_address_change()
+
+    def _request_address_change(self):
+        import ctypes
+        armed = self._address_change
+        if armed is None:
+            return False # Stopped meanwhile
+        notify_addr_change, overlapped = armed
+        handle = ctypes.c_void_p()
+        if notify_addr_change(ctypes.byref(handle), ctypes.byref(overlapped)) != 997: # ERROR_IO_PENDING
+            self._disarm_address_change()
+            return False
+        return True
+
+    def _disarm_address_change(self):
+        armed, self._address_change = self._address_change, None
+        if armed is None:
+            return
+        import ctypes
+        _, overlapped = armed
+        ctypes.windll.iphlpapi.CancelIPChangeNotify(ctypes.byref(overlapped))
+        ctypes.windll.kernel32.CloseHandle(ctypes.c_void_p(overlapped.hEvent))
+
+    def _check_address_change(self):
+        """Refreshes every tracked adapter if the OS signalled an IP address change since the last check."""
+        armed = self._address_change
+        if self._stopped.is_set() or armed is None:
+            return
+        import ctypes
+        _, overlapped = armed
+        if ctypes.windll.kernel32.WaitForSingleObject(ctypes.c_void_p(overlapped.hEvent), 0) == 0: # WAIT_OBJECT_0
+            with self._lock:
+                adapters = list(self._tracked)
+            for adapter in adapters:
+                self.request_refresh(adapter, max_age=0)
+            if not self._request_address_change():
+                return
+        self._rearm("notify", self.NOTIFY_CHECK_INTERVAL, self._check_address_change)
+
+
+# --- Background Wi-Fi scanner ---
+@dataclass
+class VisibleNetwork:
+    """A network in the WifiScanner's live table."""
+    ssid: str
+    signal: int = None          # Strongest signal (percent) over the PC's adapters, None if unknown
+    authentication: str = None
+    is_device: bool = False     # SSID matches the scanner's device pattern (a JuiceNet charger)
+    first_seen: float = 0.0     # time.monotonic() of the scan that first listed it
+    last_seen: float = 0.0
+
+
+class WifiScanner:
+    """
+    Scans for Wi-Fi networks on workers (BackgroundWorkers) every interval seconds (or right away on
+    scan_now()) and keeps a live table of the visible networks, ranked by signal.
+    SSIDs starting with device_pattern are flagged as devices. A network only counts as gone after
+    missing_scans consecutive scans without it, so one flaky scan does not drop it.
+    scan_func(adapter) -> [netsh_parser.WifiNetwork] performs the scan (NetworkBackend.scan_networks).
+    """
+    def __init__(self, scan_func, workers, interval=10.0, device_pattern="JuiceNet", missing_scans=2, adapter=None):
+        self.scan_func = scan_func
+        self.workers = workers
+        self.interval = interval
+        self.device_pattern = device_pattern
+        self.missing_scans = missing_scans
+        self.adapter = adapter
+        self.last_error = None
+        self._table = {} # ssid -> VisibleNetwork
+        self._missed = {} # ssid -> consecutive scans without it
+        self._event_subscribers = []
+        self._scan_subscribers = []
+        self._lock = threading.Lock()
+        self._schedule_lock = threading.Lock()
+        self._next_scan = None # ScheduledCall of the next scan, None before start()
+        self._rescan = False # scan_now() was called while a scan was running
+        self._stopped = threading.Event()
+
+    def subscribe(self, callback):
+        """callback(event, network) is called from a worker with "appeared" or "disappeared" and a VisibleNetwork."""
+        self._event_subscribers.append(callback)
+
+    def subscribe_scans(self, callback):
+        """callback(networks, error_message) is called from a worker after every scan with ranked()."""
+        self._scan_subscribers.append(callback)
+
+    def start(self):
+        self._schedule(0)
+
+    def stop(self):
+        self._stopped.set()
+        with self._schedule_lock:
+            if self._next_scan:
+                self._next_scan.cancel()
+
+    def scan_now(self):
+        """Runs the next scan immediately instead of at the end of the interval."""
+        with self._schedule_lock:
+            if self._next_scan is None:
+                return # Not started; start() scans right away
+            if self._next_scan.cancel():
+                self._next_scan = self.workers.call_later(0, self._tick)
+            else:
+                self._rescan = True # A scan is running; the next one follows it right away
 
-        for attempt in range(1, max_attempts_overall + 1):
-            log_func(f"\n--- ECache Deletion Attempt {attempt} ---")
-            time.sleep(0.5)
+    def ranked(self, devices_only=False):
+        """Returns the visible networks, devices first, each group by descending signal."""
+        with self._lock:
+            networks = [n for n in self._table.values() if n.is_device or not devices_only]
+        return sorted(networks, key=lambda n: (not n.is_device, -(n.signal if n.signal is not None else -1), n.ssid))
 
-            try:
-                ecache_file_elements = driver.find_elements(By.XPATH,
-                    "//div[contains(@class, 'file') and contains(@class, 'fs-file') and contains(@class, 'deletable') and .//a[starts-with(@href, 'http://setup.com/ECache_') or starts-with(text(), 'ECache_')]]")
+    def devices(self):
+        """Returns the visible devices by descending signal."""
+        return self.ranked(devices_only=True)
 
-                num_ecache_files_found = len(ecache_file_elements)
-                log_func(f"Found {num_ecache_files_found} ECache file(s) on page.")
+    def _schedule(self, delay):
+        with self._schedule_lock:
+            if not self._stopped.is_set():
+                self._next_scan = self.workers.call_later(delay, self._tick)
 
-                if not ecache_file_elements:
-                    log_func("No more ECache files found. Exiting deletion loop.")
-                    break
+    def _tick(self):
+        if self._stopped.is_set():
+            return
+        try:
+            self._scan_once()
+        finally:
+            with self._schedule_lock:
+                delay = 0 if self._rescan else self.interval
+                self._rescan = False
+            self._schedule(delay)
 
-                log_func(f"Found {len(ecache_file_elements)} ECache file(s) to delete in this pass.")
-                target_ecache_file_element = ecache_file_elements[0]
-                parent_data_id = target_ecache_file_element.get_attribute("data-id")
-                log_func(f"Targeting ECache file with data-id='{parent_data_id}'.")
+    def _scan_once(self):
+        try:
+            networks = self.scan_func(self.adapter)
+            error_message = None
+        except NetworkBackendError as e:
+            networks, error_message = None, str(e)
+        except Exception as e:
+            networks, error_message = None, f"An unexpected error occurred during PC Wi-Fi scan: {e}"
+        self.last_error = error_message
+
+        events = []
+        if networks is not None:
+            events = self._update_table(networks)
+        for event, network in events:
+            for callback in list(self._event_subscribers):
+                callback(event, network)
+        ranked = self.ranked()
+        for callback in list(self._scan_subscribers):
+            callback(ranked, error_message)
+
+    def _update_table(self, networks):
+        """Merges one scan into the table. Returns the (event, VisibleNetwork) pairs it caused."""
+        now = time.monotonic()
+        seen = {}
+        for network in networks:
+            if not network.ssid:
+                continue # Hidden networks cannot be joined by name
+            entry = seen.get(network.ssid)
+            if entry is None or (network.signal or -1) > (entry.signal or -1):
+                seen[network.ssid] = network
+
+        events = []
+        with self._lock:
+            for ssid, network in seen.items():
+                visible = self._table.get(ssid)
+                if visible is None:
+                    visible = self._table[ssid] = VisibleNetwork(ssid, is_device=ssid.startswith(self.device_pattern),
+                                                                 first_seen=now)
+                    events.append(("appeared", visible))
+                visible.signal = network.signal
+                visible.authentication = network.authentication
+                visible.last_seen = now
+                self._missed.pop(ssid, None)
+            for ssid in list(self._table):
+                if ssid in seen:
+                    continue
+                self._missed[ssid] = self._missed.get(ssid, 0) + 1
+                if self._missed[ssid] >= self.missing_scans:
+                    events.append(("disappeared", self._table.pop(ssid)))
+                    del self._missed[ssid]
+        return events
+
+
+# --- Background work and the Tk bridge ---
+class TkBridge:
+    """
+    Hands results from other threads to the Tk thread: post() queues a call from any thread and
+    the Tk thread runs the queued calls in order every interval_ms.
+    """
+    def __init__(self, root, log_func, interval_ms=25):
+        self.root = root
+        self.log_func = log_func
+        self.interval_ms = interval_ms
+        self._calls = queue.Queue()
 
-                delete_button_locator = (By.XPATH, f".//div[@class='status' and @data-id='{parent_data_id}']")
+    def post(self, func, *args):
+        """Runs func(*args) on the Tk thread. Safe to call from any thread."""
+        self._calls.put((func, args))
 
-                log_func(f"Attempting to click delete for ECache file data-id='{parent_data_id}'...")
-                individual_delete_button = WebDriverWait(target_ecache_file_element, 5).until(
-                    EC.element_to_be_clickable(delete_button_locator)
-                )
-                individual_delete_button.click()
-                log_func("Successfully clicked individual ECache delete button.")
-                time.sleep(1)
+    def start(self):
+        self._drain()
 
-                log_func("Waiting for delete confirmation modal to appear...")
-                confirm_delete_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'modal-primary') and contains(text(), 'Delete')]"))
-                )
-                log_func("Delete confirmation button found. Attempting to click to confirm...")
-                confirm_delete_button.click()
-                log_func("Successfully clicked delete confirmation button.")
-                delete_count += 1
-                time.sleep(3)
-
-            except StaleElementReferenceException:
-                log_func("StaleElementReferenceException caught. Element reference is no longer valid, likely due to DOM change. Retrying this deletion attempt.")
-                try:
-                    driver.save_screenshot(f"stale_element_error_attempt_{attempt}.png")
-                except Exception as e:
-                    log_func(f"Could not save screenshot for stale element error: {e}")
-                time.sleep(1)
-                continue
-            except TimeoutException as te:
-                log_func(f"TimeoutException caught during ECache deletion: {te}")
-                log_func("Could not find element within specified time. This might mean all ECache files are already deleted, or the locator is wrong, or elements are not becoming clickable.")
-                try:
-                    driver.save_screenshot(f"timeout_error_attempt_{attempt}.png")
-                except Exception as e:
-                    log_func(f"Could not save screenshot for timeout error: {e}")
+    def _drain(self):
+        while True:
+            try:
+                func, args = self._calls.get_nowait()
+            except queue.Empty:
                 break
+            try:
+                func(*args)
             except Exception as e:
-                log_func(f"An unexpected error occurred during ECache deletion (Attempt {attempt}): {e}")
                 import traceback
-                log_func(traceback.format_exc())
-                try:
-                    driver.save_screenshot(f"general_error_attempt_{attempt}.png")
-                except Exception as e_ss:
-                    log_func(f"Could not save screenshot for general error: {e_ss}")
-                time.sleep(2)
+                self.log_func(f"ERROR: GUI update failed: {e}\n{traceback.format_exc()}")
+        self.root.after(self.interval_ms, self._drain)
 
-        log_func(f"\nFinished ECache deletion loop. Total deleted: {delete_count}")
-        if attempt >= max_attempts_overall and num_ecache_files_found > 0:
-            log_func(f"Warning: Reached maximum ECache deletion attempts ({max_attempts_overall}). Some ECache files might remain.")
 
-        time.sleep(2)
+class ScheduledCall:
+    """A BackgroundWorkers.call_later() call that has not been handed to a worker yet."""
+    def __init__(self, due, func, args, lock):
+        self.due = due
+        self.func = func
+        self.args = args
+        self.state = "pending" # "pending", "cancelled" or "submitted"
+        self._lock = lock # The owning pool's timer lock, guarding state
 
-        # --- Step 3: Click the "Connect" link ---
-        log_func("\nWaiting for the 'Connect' link to appear...")
-        connect_link = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.LINK_TEXT, "Connect"))
-        )
-        log_func("'Connect' link found. Clicking it...")
-        connect_link.click()
-        log_func("Clicked the 'Connect' link.")
+    def __lt__(self, other):
+        return self.due < other.due
 
-        # --- NEW: Automate Wi-Fi connection on the device's web interface ---
-        log_func("\n--- Automating Wi-Fi connection on the device's web interface ---")
-        try:
-            # Wait for the network list to appear (the 'networks' div)
-            log_func("Waiting for the Wi-Fi network list to appear...")
-            networks_container = WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "networks"))
-            )
-            log_func("Wi-Fi network list found.")
+    def cancel(self):
+        """Drops the call. Returns False if it was already handed to a worker."""
+        with self._lock:
+            if self.state == "pending":
+                self.state = "cancelled"
+            return self.state == "cancelled"
 
-            # Find the specific network by its SSID text
-            log_func(f"Searching for target Wi-Fi network: '{target_wifi_ssid_web}'...")
-            target_network_element = WebDriverWait(driver, 20).until(
-                EC.element_to_be_clickable((By.XPATH, f"//div[@class='network']/div[@class='ssid'][text()='{target_wifi_ssid_web}']/ancestor::div[@class='network']"))
-            )
-            log_func(f"Found target network '{target_wifi_ssid_web}'. Clicking it...")
-            target_network_element.click()
-            log_func(f"Clicked on network '{target_wifi_ssid_web}'.")
-            time.sleep(2) # Give time for the password input to appear
-
-            # Now, the password input field should appear
-            log_func("Waiting for password input field to appear...")
-            password_input_field = WebDriverWait(driver, 10).until(
-                EC.visibility_of_element_located((By.CSS_SELECTOR, "input[name='password'][type='password']"))
-            )
-            password_input_field.clear()
-            password_input_field.send_keys(target_wifi_password_web)
-            log_func("Typed password into the field.")
-
-            # Click the "Connect" button that saves the credentials (class="btn btn-lg save")
-            log_func("Attempting to click the 'Connect' button (save button)...")
-            web_connect_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, "button.btn.btn-lg.save"))
-            )
-            web_connect_button.click()
-            log_func("Clicked the 'Connect' button to save credentials.")
 
-            log_func("Giving device time to process connection and reboot/reconnect (60-90 seconds recommended for network change and potential reboot).")
-            time.sleep(90) # Increased sleep time for network changes and potential device reboot
+class BackgroundWorkers:
+    """
+    Bounded pool of worker threads for the application's background actions (connect, static IP,
+    revert, profile pre-install, the single-device automation) and its periodic work (the
+    NetworkMonitor poll, the WifiScanner, AutoReconnectWatchers), replacing a thread per action or loop.
+    Periodic work re-arms itself with call_later(), which a single timer thread hands to the pool when due.
+    Completion callbacks are delivered with deliver_func (TkBridge.post), so they run on the Tk thread.
+    """
+    def __init__(self, deliver_func, log_func, max_workers=8):
+        self.deliver_func = deliver_func
+        self.log_func = log_func
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="background")
+        self._timer_calls = [] # heap of pending ScheduledCalls
+        self._timer_condition = threading.Condition(threading.RLock())
+        self._timer_thread = None
+        self._stopped = False
+
+    def submit(self, func, *args, on_done=None):
+        """
+        Runs the blocking func(*args) on a worker. Returns its concurrent.futures.Future.
+        on_done(result) is delivered to the Tk thread when it succeeds; failures are logged.
+        """
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda done: self._deliver(done, on_done))
+        return future
 
-        except TimeoutException as te:
-            log_func(f"TimeoutException caught during web Wi-Fi connection: {te}")
-            log_func("Could not find Wi-Fi network, password input, or connect button on web page within time. The page structure might have changed or network not found.")
-            log_func(f"Ensure target Wi-Fi '{target_wifi_ssid_web}' is visible on the scan page.")
-        except NoSuchElementException as nse:
-            log_func(f"NoSuchElementException caught during web Wi-Fi connection: {nse}")
-            log_func("A required element was not found. Check the provided HTML and locators.")
-        except Exception as e:
-            log_func(f"An unexpected error occurred during web Wi-Fi connection: {e}")
-            import traceback
-            log_func(traceback.format_exc())
+    def call_later(self, delay, func, *args):
+        """
+        Runs func(*args) on a worker after delay seconds. Returns a ScheduledCall whose cancel()
+        drops it if it is still waiting. After stop() the call is dropped right away.
+        """
+        call = ScheduledCall(time.monotonic() + delay, func, args, self._timer_condition)
+        with self._timer_condition:
+            if self._stopped:
+                call.state = "cancelled"
+                return call
+            heapq.heappush(self._timer_calls, call)
+            if self._timer_thread is None:
+                self._timer_thread = threading.Thread(target=self._run_timer, name="background-timer", daemon=True)
+                self._timer_thread.start()
+            self._timer_condition.notify()
+        return call
+
+    def stop(self):
+        with self._timer_condition:
+            self._stopped = True
+            for call in self._timer_calls:
+                call.cancel()
+            self._timer_calls.clear()
+            self._timer_condition.notify()
+        self._executor.shutdown(wait=False)
+
+    def _run_timer(self):
+        while True:
+            with self._timer_condition:
+                while not self._stopped and (not self._timer_calls or self._timer_calls[0].due > time.monotonic()):
+                    timeout = self._timer_calls[0].due - time.monotonic() if self._timer_calls else None
+                    self._timer_condition.wait(timeout)
+                if self._stopped:
+                    return
+                call = heapq.heappop(self._timer_calls)
+                if call.state != "pending":
+                    continue
+                call.state = "submitted"
+            try:
+                self.submit(call.func, *call.args)
+            except RuntimeError:
+                return # The executor was shut down
 
-        # --- PAUSE POINT: Wait for user to manually reconnect PC to JuiceNet ---
-        log_func("\n--- DEVICE CONFIGURATION COMPLETE. ---")
-        log_func("Please MANUALLY RECONNECT your PC to the JuiceNet network (e.g., JuiceNet-BC9) through your system's Wi-Fi settings.")
-        log_func("Once reconnected, click the 'Resume Script (Connected to JuiceNet)' button in the GUI.")
+    def _deliver(self, future, on_done):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.log_func(f"ERROR: Background task failed: {error}")
+        elif on_done:
+            self.deliver_func(on_done, future.result())
+
+
+# --- Structured log file ---
+class _JsonLineFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line: timestamp, level, device, step, message."""
+    def format(self, record):
+        return json.dumps({
+            "timestamp": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "device": getattr(record, "device", None),
+            "step": getattr(record, "step", None),
+            "message": record.getMessage(),
+        }, ensure_ascii=False)
+
+
+def create_file_logger(path, max_bytes=5 * 1024 * 1024, backup_count=5):
+    """
+    Returns (logger, listener) writing JSON-line records to a rotating file at path.
+    Records are handed over through a queue, so callers never block on disk I/O;
+    call listener.stop() at exit to flush.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(_JsonLineFormatter())
+    record_queue = queue.Queue()
+    listener = logging.handlers.QueueListener(record_queue, file_handler)
+    listener.start()
 
-        # Enable the resume button and disable others on the GUI thread
-        app_instance.after(0, app_instance.pages["Page3_Automation"].enable_resume_button)
-        app_instance.after(0, app_instance.get_and_display_current_ip_threaded_wrapper) # Refresh PC IP display
+    logger = logging.getLogger("juicenet_provisioning")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers[:] = [logging.handlers.QueueHandler(record_queue)]
+    return logger, listener
 
-        resume_event.wait() # This will block the automation thread until the event is set
-        log_func("Resume signal received. Script continuing...")
 
-        # Disable resume button and re-enable others after resuming
-        app_instance.after(0, app_instance.pages["Page3_Automation"].disable_resume_button)
+# --- Local firmware mirror ---
+# Console command pointing dfuu at the mirror; {command} is the configured console command,
+# {url} the image's mirror URL and {sha256} its digest.
+FIRMWARE_COMMAND_TEMPLATE = "{command} --url {url}"
 
-        # --- Set static IP after reconnection and before refreshing browser ---
-        # This call is intentionally here, as it's part of the automation flow.
-        # The set_static_ip_func now has internal checks to only apply to JuiceNet.
-        log_func("Attempting to set PC static IP now (conditional on JuiceNet connection)...")
-        set_static_ip_func() # Call the function to set static IP
-        time.sleep(5) # Give a moment for IP change to propagate
 
-        log_func("Refreshing browser to ensure connection...")
-        driver.refresh()
-        time.sleep(5)
+class FirmwareCache:
+    """
+    Content-addressed store of firmware images: each image is kept once as <directory>/<sha256>,
+    and index.json maps the names and source URLs it was added under to its digest.
+    Filling is serialized, so concurrent requests for the same source download it only once.
+    """
+    CHUNK_SIZE = 1024 * 1024
 
-        # --- Step 4: Click "Console" link ---
-        log_func("\nWaiting for the 'Console' link to appear...")
-        console_link = WebDriverWait(driver, 30).until(
-            EC.element_to_be_clickable((By.LINK_TEXT, "Console"))
-        )
-        log_func("'Console' link found. Clicking it...")
-        console_link.click()
-        log_func("Clicked the 'Console' link.")
-        time.sleep(2)
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f) # name or source URL -> {"sha256", "size", "name"}
+        except (OSError, ValueError):
+            self.index = {}
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, digest)
+
+    def lookup(self, key):
+        """Returns the index entry for a name, source URL or digest whose image is cached, else None."""
+        entry = self.index.get(key) or next((e for e in self.index.values() if e["sha256"] == key), None)
+        return entry if entry and os.path.exists(self.path_for(entry["sha256"])) else None
+
+    def _store(self, source, keys, name, expected_sha256=None):
+        """Copies the readable source into the cache under its digest and indexes it under keys."""
+        digest = hashlib.sha256()
+        size = 0
+        safe_name = re.sub(r"[^\w.-]", "_", name)
+        part_path = os.path.join(self.directory, f".{safe_name}.{threading.get_ident()}.part")
+        try:
+            with open(part_path, "wb") as f:
+                while True:
+                    chunk = source.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    check_cancelled()
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+            if expected_sha256 and sha256 != expected_sha256.lower():
+                raise ValueError(f"Firmware '{name}' has SHA-256 {sha256}, expected {expected_sha256}.")
+            os.replace(part_path, self.path_for(sha256))
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        entry = {"sha256": sha256, "size": size, "name": name}
+        for key in keys:
+            self.index[key] = entry
+        part_index = self.index_path + ".part"
+        with open(part_index, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(part_index, self.index_path)
+        return entry
+
+    def add_file(self, path, name=None):
+        """Caches a local image (e.g. a stub for offline tests). Returns its index entry."""
+        name = name or os.path.basename(path)
+        with self._lock, open(path, "rb") as f:
+            return self._store(f, [name], name)
+
+    def fetch(self, url, name=None, expected_sha256=None, timeout=30):
+        """Returns the index entry of the image at url, downloading it only if it is not cached yet."""
+        name = name or os.path.basename(urllib.parse.urlsplit(url).path) or "firmware.bin"
+        with self._lock:
+            entry = self.lookup(url)
+            if entry and (not expected_sha256 or entry["sha256"] == expected_sha256.lower()):
+                return entry
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                return self._store(response, [url, name], name, expected_sha256)
+
+    def add(self, source, name=None, expected_sha256=None):
+        """Caches source, an http(s) URL or a local file path. Returns its index entry."""
+        if urllib.parse.urlsplit(source).scheme in ("http", "https"):
+            return self.fetch(source, name, expected_sha256)
+        entry = self.add_file(source, name)
+        if expected_sha256 and entry["sha256"] != expected_sha256.lower():
+            raise ValueError(f"Firmware '{source}' has SHA-256 {entry['sha256']}, expected {expected_sha256}.")
+        return entry
+
+
+class _FirmwareRequestHandler(BaseHTTPRequestHandler):
+    """Serves GET/HEAD /firmware/<sha256 or name> from the server's `cache` attribute."""
+
+    def log_message(self, format, *args):
+        self.server.log_func(f"Firmware mirror: {self.address_string()} {format % args}")
+
+    def _entry(self):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        if not path.startswith("/firmware/"):
+            return None
+        return self.server.cache.lookup(path[len("/firmware/"):])
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        entry = self._entry()
+        if entry is None:
+            self.send_error(404, "No such firmware image")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(entry["size"]))
+        self.send_header("ETag", f'"{entry["sha256"]}"')
+        self.end_headers()
+        if send_body:
+            with open(self.server.cache.path_for(entry["sha256"]), "rb") as f:
+                shutil.copyfileobj(f, self.wfile, FirmwareCache.CHUNK_SIZE)
+
+
+def local_ip_address(probe_host="10.255.255.255"):
+    """Best guess at this PC's LAN address: the source address of a route towards probe_host (no packet is sent)."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        try:
+            probe.connect((probe_host, 1))
+            return probe.getsockname()[0]
+        except OSError:
+            return "127.0.0.1"
 
-        # --- Step 5: Type into the console input ---
-        log_func("Waiting for the console input field to appear in the modal...")
-        console_input_field = WebDriverWait(driver, 10).until(
-            EC.visibility_of_element_located((By.CLASS_NAME, "cmdline"))
-        )
-        log_func(f"Console input field found. Typing command: '{command_to_type}'")
-        console_input_field.send_keys(command_to_type)
-        console_input_field.send_keys(webdriver.Keys.ENTER)
-        log_func("Typed command and pressed ENTER.")
-        time.sleep(5)
 
-    except Exception as e:
-        log_func(f"\n--- An unhandled error occurred during web automation: {e} ---")
-        import traceback
-        log_func(traceback.format_exc())
-        app_instance.after(0, lambda: messagebox.showerror("Error", f"An error occurred: {e}\nCheck the log within the GUI for details."))
+class FirmwareMirror:
+    """
+    Serves a FirmwareCache over HTTP on the provisioning PC, so every device on the bench network
+    pulls its image from the LAN instead of the internet. Each request is handled on its own thread.
+    advertised_host: address the devices reach this PC at (defaults to local_ip_address()).
+    """
+    def __init__(self, cache, log_func, port=8070, bind_host="0.0.0.0", advertised_host=None):
+        self.cache = cache
+        self.log_func = log_func
+        self.port = port
+        self.bind_host = bind_host
+        self.advertised_host = advertised_host
+        self.server = None
+
+    def start(self):
+        """Starts serving on a background thread. Returns the mirror's base URL."""
+        self.server = ThreadingHTTPServer((self.bind_host, self.port), _FirmwareRequestHandler)
+        self.server.daemon_threads = True
+        self.server.cache = self.cache
+        self.server.log_func = self.log_func
+        self.port = self.server.server_address[1] # The actual port when 0 was requested
+        self.advertised_host = self.advertised_host or local_ip_address()
+        threading.Thread(target=self.server.serve_forever, name="firmware-mirror", daemon=True).start()
+        self.log_func(f"Firmware mirror serving {self.cache.directory} at {self.base_url}")
+        return self.base_url
+
+    @property
+    def base_url(self):
+        return f"http://{self.advertised_host}:{self.port}"
+
+    def url_for(self, entry):
+        return f"{self.base_url}/firmware/{entry['sha256']}"
+
+    def console_command(self, command, entry, template=FIRMWARE_COMMAND_TEMPLATE):
+        """Renders the console command that makes dfuu fetch entry from this mirror."""
+        return template.format(command=command, url=self.url_for(entry), sha256=entry["sha256"])
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+# --- Headless batch mode ---
+class HeadlessBatchRunner:
+    """
+    Provisions DeviceJobs unattended, without Tk: the PC network is driven directly through a
+    NetworkBackend, the PC rejoins each device after its reboot through an AutoReconnectWatcher,
+    and every device's statuses and timings are collected for a machine-readable results file.
+    static_ip: (ip, mask, gateway, dns) set on an adapter while it is on a device.
+    report_dir: where each device's RunReport is saved (None keeps them in memory only).
+    artifact_writer: ArtifactWriter for diagnostic captures (None captures none).
+    Its AutoReconnectWatchers run on a BackgroundWorkers pool; call close() when done.
+    """
+    def __init__(self, settings, network_backend, log_func, static_ip=("10.10.10.2", "255.255.255.0", "10.10.10.1", "10.10.10.1"),
+                 device_ssid_pattern="JuiceNet", report_dir=None, driver_pool=None, artifact_writer=None):
+        self.settings = settings
+        self.network_backend = network_backend
+        self.log_func = log_func # log_func(message, device)
+        self.static_ip = static_ip
+        self.device_ssid_pattern = device_ssid_pattern
+        self.report_dir = report_dir
+        self.driver_pool = driver_pool
+        self.artifact_writer = artifact_writer
+        self.timing_summary = SessionTimingSummary()
+        self.results = {} # device_ssid -> result dict (see run_job)
+        self.cancel_tokens = {} # device_ssid -> CancellationToken
+        # Without Tk, completion callbacks simply run on the worker
+        self.workers = BackgroundWorkers(lambda func, *args: func(*args), log_func, max_workers=2)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.workers.stop()
+
+    def _connect(self, ssid, password, adapter):
+        try:
+            return self.network_backend.connect(ssid, password, adapter), None
+        except NetworkBackendError as e:
+            return None, str(e)
+
+    def _status(self, adapter):
+        try:
+            ip_address, connected_ssid = self.network_backend.get_status(adapter)
+            return ip_address, connected_ssid, None
+        except NetworkBackendError as e:
+            return "N/A", "N/A", str(e)
+
+    def _scan(self, adapter):
+        try:
+            return self.network_backend.scan(adapter), None
+        except NetworkBackendError as e:
+            return [], str(e)
+
+    def _on_device(self, adapter, log_func, action):
+        """True if adapter is on a device network; IP changes are refused on any other network."""
+        connected_ssid = self._status(adapter)[1]
+        if connected_ssid.startswith(self.device_ssid_pattern):
+            return True
+        log_func(f"Warning: '{adapter}' is connected to '{connected_ssid}', not a device network. Not {action}.")
+        return False
+
+    def _set_static_ip(self, adapter, log_func):
+        if not self._on_device(adapter, log_func, "setting a static IP"):
+            return
+        try:
+            self.network_backend.set_static_ip(adapter, *self.static_ip)
+            log_func(f"Set '{adapter}' to static IP {self.static_ip[0]}.")
+        except NetworkBackendError as e:
+            log_func(f"ERROR: {e}")
+
+    def _revert_ip(self, adapter, log_func):
+        if not self._on_device(adapter, log_func, "reverting to DHCP"):
+            return
+        try:
+            self.network_backend.set_dhcp(adapter)
+            log_func(f"Reverted '{adapter}' to DHCP.")
+        except NetworkBackendError as e:
+            log_func(f"ERROR: {e}")
+
+    def _start_auto_resume(self, job, adapter, resume_event, log_func):
+        def give_up():
+            # Nobody can click Resume here: let the run continue so it fails instead of waiting forever
+            log_func("Auto-resume gave up; continuing so the run can finish as failed.")
+            resume_event.set()
+
+        watcher = AutoReconnectWatcher(job.device_ssid, job.device_password, adapter, job.url or self.settings.url, resume_event,
+                                       scan_func=self._scan, connect_func=self._connect, status_func=self._status,
+                                       log_func=log_func, workers=self.workers, wait_budgets=self.settings.wait_budgets,
+                                       give_up_func=give_up)
+        watcher.start()
+        return watcher
+
+    def _progress(self, job, status):
+        """ProvisioningScheduler progress callback: records and logs every status change."""
+        with self._lock:
+            result = self.results.setdefault(job.device_ssid, {
+                "device_ssid": job.device_ssid, "target_ssid": job.target_ssid,
+                "adapter": job.adapter or self.settings.adapter, "succeeded": None, "duration": None,
+                "statuses": [], "step_totals": {}, "retries": {}, "exceptions": [], "report": None,
+                "_start": time.monotonic()})
+            result["statuses"].append({"at": round(time.monotonic() - result["_start"], 3), "status": status})
+            if status in FINAL_JOB_STATUSES:
+                result["succeeded"] = status == "Done"
+                result["duration"] = round(time.monotonic() - result["_start"], 3)
+        self.log_func(f"Status: {status}", job.device_ssid)
+
+    def prepare_job(self, job):
+        """
+        Readies a queued job while the device ahead of it reboots (prepare_func of a pipelined
+        ProvisioningScheduler): validates its manifest entry, installs its PC Wi-Fi profile and warms a browser.
+        """
+        for problem in validate_device_job(job, self.device_ssid_pattern):
+            self.log_func(f"WARNING: Manifest entry: {problem}", job.device_ssid)
+        if job.device_password:
+            self.network_backend.preinstall_profiles([(job.device_ssid, job.device_password)])
+        if self.driver_pool and self.settings.driver_backend == "selenium":
+            self.driver_pool.prewarm()
+        self.log_func("Prepared during the previous device's reboot.", job.device_ssid)
+
+    def run_job(self, job, progress):
+        """Provisions one job (run_job of the ProvisioningScheduler). Returns True on success."""
+        log_func = lambda message: self.log_func(message, job.device_ssid)
+        report = RunReport(job.device_ssid)
+        self.cancel_tokens[job.device_ssid].raise_if_cancelled() # Cancelled while queued
+        with report.activate():
+            succeeded = provision_device(
+                job, self.settings, log_func, progress, threading.Event(),
+                connect_func=self._connect,
+                status_func=self._status,
+                set_static_ip_func=lambda adapter: self._set_static_ip(adapter, log_func),
+                revert_ip_func=lambda adapter: self._revert_ip(adapter, log_func),
+                auto_resume_func=lambda job, adapter, resume_event: self._start_auto_resume(job, adapter, resume_event, log_func),
+                driver_pool=self.driver_pool,
+                run_report=report,
+                cancel_token=self.cancel_tokens[job.device_ssid],
+                artifact_writer=self.artifact_writer)
+        if report.succeeded is None: # Skipped before automate_web_actions ran
+            report.finish(False)
+        self.timing_summary.add(report)
+        report_path = None
+        if self.report_dir:
+            try:
+                report_path = report.save(self.report_dir)
+            except OSError as e:
+                log_func(f"WARNING: Could not save the run report: {e}")
+        with self._lock:
+            result = self.results[job.device_ssid]
+            result.update(step_totals={step: round(total, 3) for step, total in report.step_totals().items()},
+                          retries=report.retries, exceptions=report.exceptions, report=report_path)
+        return succeeded
+
+    def cancel_all(self, reason="Cancelled"):
+        """Cancels every queued and running job; they finish with status "Cancelled"."""
+        for token in list(self.cancel_tokens.values()):
+            token.cancel(reason)
+
+    def run(self, jobs, max_workers=1, pipelined=False):
+        """
+        Provisions jobs (in parallel across adapters) and blocks until all finished. Returns the results document.
+        pipelined: overlap each device's reboot wait with preparing the next one (see ProvisioningScheduler).
+        """
+        started = time.time()
+        start = time.monotonic()
+        self.cancel_tokens = {job.device_ssid: CancellationToken() for job in jobs}
+        scheduler = ProvisioningScheduler(self.run_job, max_workers, self._progress,
+                                          prepare_func=self.prepare_job, pipelined=pipelined)
+        scheduler.start(jobs)
+        try:
+            scheduler.wait()
+        except KeyboardInterrupt: # Ctrl+C: stop every device, let each revert its adapter, then report
+            self.log_func("Interrupted, cancelling the remaining devices...")
+            self.cancel_all("Interrupted")
+            scheduler.wait()
+        with self._lock:
+            devices = [{key: value for key, value in self.results[job.device_ssid].items() if not key.startswith("_")}
+                       for job in jobs]
+        return {
+            "started": datetime.datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+            "duration": round(time.monotonic() - start, 3),
+            "devices": len(jobs),
+            "pipelined": pipelined,
+            "succeeded": sum(1 for device in devices if device["succeeded"]),
+            "steps": self.timing_summary.summary(),
+            "results": devices,
+        }
+
+
+def run_headless_batch(args):
+    """Runs the --batch command line mode. Returns the process exit code (0 when every device succeeded)."""
+    if args.workers > ProvisioningScheduler.MAX_LANES:
+        print(f"--workers {args.workers}: at most {ProvisioningScheduler.MAX_LANES} device(s) can be provisioned "
+              f"at a time until lanes are isolated to their adapters.", file=sys.stderr)
+        return 2
+    print_lock = threading.Lock()
+    file_logger, listener = create_file_logger(os.path.join(os.path.abspath("logs"), "provisioning.log"))
+
+    def log_func(message, device=None):
+        prefix = message.lstrip().upper()
+        level = logging.ERROR if prefix.startswith("ERROR") else logging.WARNING if prefix.startswith("WARNING") else logging.INFO
+        file_logger.log(level, message, extra={"device": device, "step": None})
+        with print_lock:
+            print(f"[{device}] {message}" if device else message, flush=True)
+
+    try:
+        jobs = load_device_manifest(args.batch)
+    except (OSError, ValueError) as e:
+        print(f"Could not read manifest '{args.batch}': {e}", file=sys.stderr)
+        listener.stop()
+        return 2
+
+    webdriver_path = args.webdriver
+    if webdriver_path is None and getattr(sys, 'frozen', False):
+        webdriver_path = os.path.join(sys._MEIPASS, "msedgedriver.exe")
+    settings = ProvisioningSettings(adapter=args.adapter, webdriver_path=webdriver_path, driver_backend=args.driver_backend,
+                                    checkpoint_dir=os.path.abspath("checkpoints"))
+    try:
+        set_ecache_delete_endpoint(args.ecache_delete_endpoint, args.ecache_delete_method)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        listener.stop()
+        return 2
+    firmware_mirror = None
+    if args.firmware:
+        try:
+            cache = FirmwareCache(os.path.abspath(args.firmware_cache))
+            entry = cache.add(args.firmware, expected_sha256=args.firmware_sha256)
+            firmware_mirror = FirmwareMirror(cache, log_func, args.mirror_port, advertised_host=args.mirror_host)
+            firmware_mirror.start()
+        except (OSError, ValueError) as e:
+            print(f"Could not set up the firmware mirror for '{args.firmware}': {e}", file=sys.stderr)
+            listener.stop()
+            return 2
+        # Applied to each job's final command, so a manifest row's own command is mirrored too
+        settings.firmware_command = lambda command: firmware_mirror.console_command(command, entry, args.firmware_command)
+        log_func(f"Firmware '{entry['name']}' ({entry['size']} bytes) cached. "
+                 f"Console command: {settings.firmware_command(settings.command)}")
+
+    network_backend = create_network_backend(args.network_backend, log_func)
+    driver_pool = None
+    if args.pipeline and args.driver_backend == "selenium" and webdriver_path and os.path.exists(webdriver_path):
+        # Lets prepare_job warm the next device's browser during the current device's reboot
+        driver_pool = SeleniumDriverPool(webdriver_path, 1, 20, log_func)
+    artifact_writer = ArtifactWriter(os.path.abspath("artifacts"), log_func, mode=args.artifacts,
+                                     max_bytes=args.artifact_quota_mb * 1024 * 1024)
+    runner = HeadlessBatchRunner(settings, network_backend, log_func, report_dir=os.path.abspath("reports"),
+                                 driver_pool=driver_pool, artifact_writer=artifact_writer)
+    try:
+        log_func(f"--- Headless batch: {len(jobs)} device(s) from {args.batch}, up to {args.workers} in parallel"
+                 f"{', pipelined' if args.pipeline else ''} ---")
+        network_backend.preinstall_profiles([(job.device_ssid, job.device_password) for job in jobs if job.device_password])
+        results = runner.run(jobs, args.workers, pipelined=args.pipeline)
+        results["manifest"] = os.path.abspath(args.batch)
+        with open(args.results, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        log_func(f"--- Headless batch finished: {results['succeeded']}/{results['devices']} device(s) succeeded. "
+                 f"Results written to {args.results} ---")
+        runner.timing_summary.log_summary(log_func)
+        return 0 if results["succeeded"] == results["devices"] else 1
     finally:
-        if driver:
-            log_func("Closing the browser.")
-            driver.quit()
-        log_func("\n--- Web Automation Process Finished. ---")
-        app_instance.after(0, app_instance.automation_finished_callback)
+        runner.close()
+        if driver_pool:
+            driver_pool.close()
+        if firmware_mirror:
+            firmware_mirror.stop()
+        artifact_writer.close()
+        network_backend.close()
+        listener.stop()
 
 
 # --- Page Frame Definitions ---
@@ -300,6 +3871,7 @@ class Page1_PCCheck(BasePage):
                                           highlightbackground='#505050', highlightcolor='#7289DA', bd=0, relief='flat',
                                           font=self.controller.default_font) # Manual styling for tk.Listbox, added font
         self.pc_wifi_listbox.pack(pady=(0, 5))
+        self.listed_ssids = [] # SSID of each listbox row, kept by the controller's scan updates
 
         self.pc_wifi_refresh_button = ttk.Button(page_frame, text="Refresh PC Wi-Fi List",
                                                 command=self.controller.populate_pc_wifi_list_threaded_wrapper, style='TButton') # Apply style
@@ -330,12 +3902,7 @@ class Page1_PCCheck(BasePage):
             messagebox.showwarning("No Selection", "Please select a Wi-Fi network from the PC's list.")
             return
 
-        ssid_line = self.pc_wifi_listbox.get(selected_index[0])
-        ssid_match = re.match(r"^\d+\.\s*(.*)", ssid_line)
-        if ssid_match:
-            selected_ssid = ssid_match.group(1).strip()
-        else:
-            selected_ssid = ssid_line.strip()
+        selected_ssid = self.listed_ssids[selected_index[0]]
 
         password = self.pc_wifi_password_entry.get()
         self.controller.connect_pc_to_wifi(selected_ssid, password)
@@ -397,6 +3964,16 @@ class Page3_Automation(BasePage):
                                               style='Resume.TButton') # Custom style for resume button
         self.resume_script_button.pack(pady=10)
 
+        # Stops a running automation within about a second; the device is left at its last completed step
+        self.cancel_button = ttk.Button(page_frame, text="Cancel Run", command=self.controller.cancel_automation,
+                                        width=30, state=tk.DISABLED, style='Warning.TButton') # Custom style for warning button
+        self.cancel_button.pack(pady=(0, 10))
+
+        # Auto-resume: rejoin the device's Wi-Fi by itself after the reboot instead of waiting for the button
+        self.auto_resume_var = tk.BooleanVar(value=self.controller.AUTO_RESUME_ENABLED)
+        ttk.Checkbutton(page_frame, text="Auto-resume when the JuiceNet network reappears", variable=self.auto_resume_var,
+                        command=lambda: setattr(self.controller, "AUTO_RESUME_ENABLED", self.auto_resume_var.get())).pack(pady=(0, 10))
+
         self.connect_wifi_button = ttk.Button(
             page_frame,
             text="Connect PC to Wi-Fi",
@@ -406,6 +3983,11 @@ class Page3_Automation(BasePage):
         )
         self.connect_wifi_button.pack(pady=10)
 
+        # Batch mode: provision several devices in parallel from a manifest
+        self.batch_button = ttk.Button(page_frame, text="Batch Provisioning...", command=self.controller.open_batch_window,
+                                       width=30, style='TButton') # Apply style
+        self.batch_button.pack(pady=10)
+
         # Use the standard navigation setup, pointing "Next" to Page 4
         self.setup_navigation_buttons(prev_page_class=Page2_DeviceSetup, next_page_class=Page4_Cleanup)
         # Initially disable the 'Next' button until automation is complete
@@ -414,7 +3996,7 @@ class Page3_Automation(BasePage):
 
     def _start_automation_wrapper(self):
         # Get values from Page 2's entries
-        page2 = self.controller.frames["Page2_DeviceSetup"]
+        page2 = self.controller.get_page(Page2_DeviceSetup)
         target_device_wifi_ssid = page2.target_device_wifi_ssid_entry.get().strip()
         target_device_wifi_password = page2.target_device_wifi_password_entry.get().strip()
 
@@ -426,7 +4008,7 @@ class Page3_Automation(BasePage):
         self.controller.start_automation(target_device_wifi_ssid, target_device_wifi_password)
 
     def _connect_wifi_step3(self):
-        page2 = self.controller.frames["Page2_DeviceSetup"]
+        page2 = self.controller.get_page(Page2_DeviceSetup)
         ssid = page2.target_device_wifi_ssid_entry.get().strip()
         password = page2.target_device_wifi_password_entry.get().strip()
         self.controller.connect_pc_to_wifi(ssid, password)
@@ -448,9 +4030,10 @@ class Page3_Automation(BasePage):
         """Called when this page is displayed."""
         self.controller.get_and_display_current_ip_threaded_wrapper()
         # Reset button states if returning to this page
-        if not (self.controller.automation_thread and self.controller.automation_thread.is_alive()):
+        if not self.controller.automation_running():
             self.start_button.config(state=tk.NORMAL)
             self.resume_script_button.config(state=tk.DISABLED)
+            self.cancel_button.config(state=tk.DISABLED)
             # Re-enable next button if automation is already finished
             if self.next_button:
                 if self.controller.automation_finished_flag:
@@ -515,10 +4098,136 @@ class Page4_Cleanup(BasePage):
         self.controller.get_and_display_current_ip_threaded_wrapper()
 
 
+class BatchProvisioningWindow(tk.Toplevel):
+    """Window for loading a device manifest, running it in parallel and following per-device progress."""
+    def __init__(self, controller):
+        super().__init__(controller)
+        self.controller = controller
+        self.title("Batch Provisioning")
+        self.geometry("760x420")
+        self.configure(bg=controller.bg_color)
+        self.jobs = []
+        self.create_widgets()
+
+    def create_widgets(self):
+        page_frame = ttk.LabelFrame(self, text="Batch: Provision Several Devices", style='Page.TLabelframe') # Apply style
+        page_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        controls = ttk.Frame(page_frame)
+        controls.pack(fill=tk.X, pady=(0, 5))
+        ttk.Button(controls, text="Load Manifest...", command=self._load_manifest, style='TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Parallel devices:", style='Page.TLabel').pack(side=tk.LEFT, padx=(15, 0))
+        self.workers_var = tk.IntVar(value=1)
+        ttk.Spinbox(controls, from_=1, to=ProvisioningScheduler.MAX_LANES, width=4, textvariable=self.workers_var).pack(side=tk.LEFT)
+        self.pipelined_var = tk.BooleanVar(value=self.controller.BATCH_PIPELINED)
+        ttk.Checkbutton(controls, text="Pipeline", variable=self.pipelined_var).pack(side=tk.LEFT, padx=(10, 0))
+        self.start_button = ttk.Button(controls, text="Start Batch", command=self._start_batch, state=tk.DISABLED,
+                                       style='Accent.TButton') # Apply style
+        self.start_button.pack(side=tk.RIGHT, padx=5)
+        self.resume_button = ttk.Button(controls, text="Reconnect && Resume Selected", command=self._resume_selected,
+                                        state=tk.DISABLED, style='Resume.TButton') # Apply style
+        self.resume_button.pack(side=tk.RIGHT, padx=5)
+        self.cancel_button = ttk.Button(controls, text="Cancel Selected", command=self._cancel_selected,
+                                        state=tk.DISABLED, style='Warning.TButton') # Custom style for warning button
+        self.cancel_button.pack(side=tk.RIGHT, padx=5)
+
+        columns = ("adapter", "target", "status")
+        self.tree = ttk.Treeview(page_frame, columns=columns, height=12)
+        self.tree.heading("#0", text="Device")
+        self.tree.heading("adapter", text="Adapter")
+        self.tree.heading("target", text="Target Wi-Fi")
+        self.tree.heading("status", text="Status")
+        self.tree.column("#0", width=180)
+        self.tree.column("adapter", width=120)
+        self.tree.column("target", width=160)
+        self.tree.column("status", width=240)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+
+    def _load_manifest(self):
+        path = filedialog.askopenfilename(parent=self, title="Select device manifest",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            self.jobs = load_device_manifest(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Manifest Error", f"Could not load manifest:\n{e}", parent=self)
+            return
+        self.tree.delete(*self.tree.get_children())
+        for job in self.jobs:
+            self.tree.insert("", tk.END, iid=job.device_ssid, text=job.device_ssid,
+                             values=(job.adapter or self.controller.WIFI_ADAPTER_NAME, job.target_ssid, "Loaded"))
+        self.workers_var.set(min(ProvisioningScheduler.MAX_LANES, len({job.adapter for job in self.jobs})))
+        self.start_button.config(state=tk.NORMAL if self.jobs else tk.DISABLED)
+        self.controller.log_message(f"Loaded {len(self.jobs)} device(s) from manifest: {path}")
+        self.controller.preinstall_wifi_profiles(self.jobs)
+
+    def _start_batch(self):
+        if self.controller.start_batch(self.jobs, self.workers_var.get(), self.pipelined_var.get()):
+            self.start_button.config(state=tk.DISABLED)
+
+    def _selected_device(self):
+        selection = self.tree.selection()
+        return selection[0] if selection else None
+
+    def _on_select(self, event=None):
+        device_ssid = self._selected_device()
+        waiting = device_ssid and self.tree.set(device_ssid, "status") == "Waiting for reconnect"
+        self.resume_button.config(state=tk.NORMAL if waiting else tk.DISABLED)
+        status = self.tree.set(device_ssid, "status") if device_ssid else None
+        cancellable = (self.controller.batch_running() and device_ssid in self.controller.batch_cancel_tokens
+                       and status not in FINAL_JOB_STATUSES and status != "Loaded"
+                       and not self.controller.batch_cancel_tokens[device_ssid].cancelled)
+        self.cancel_button.config(state=tk.NORMAL if cancellable else tk.DISABLED)
+
+    def _resume_selected(self):
+        device_ssid = self._selected_device()
+        if device_ssid:
+            self.resume_button.config(state=tk.DISABLED)
+            self.controller.resume_batch_job(device_ssid)
+
+    def _cancel_selected(self):
+        device_ssid = self._selected_device()
+        if device_ssid:
+            self.cancel_button.config(state=tk.DISABLED)
+            self.controller.cancel_batch_job(device_ssid)
+
+    def update_status(self, job, status):
+        """Shows a job's latest status. Runs on the main Tkinter thread."""
+        if self.tree.exists(job.device_ssid):
+            self.tree.set(job.device_ssid, "adapter", job.adapter or self.controller.WIFI_ADAPTER_NAME)
+            self.tree.set(job.device_ssid, "status", status)
+        self._on_select()
+        if not self.controller.batch_running():
+            self.start_button.config(state=tk.NORMAL if self.jobs else tk.DISABLED)
+
+
 # --- Main GUI Application ---
+_resolved_font_families = {} # candidate families -> first one Tk can render
+
+
+def resolve_font_family(root, *candidates):
+    """
+    Returns the first of candidates that Tk has installed (the last one otherwise).
+    Asks Tk to resolve each name instead of enumerating every installed family; results are cached.
+    """
+    if candidates not in _resolved_font_families:
+        family = candidates[-1]
+        for candidate in candidates:
+            if tkFont.Font(root=root, family=candidate).actual("family").lower() == candidate.lower():
+                family = candidate
+                break
+        _resolved_font_families[candidates] = family
+    return _resolved_font_families[candidates]
+
+
 class Application(tk.Tk):
-    def __init__(self):
+    def __init__(self, startup_timing=False):
         super().__init__()
+        # Start-up milestones (label, seconds since the script started), reported by --startup-timing
+        self.startup_timing = startup_timing
+        self.startup_marks = [("imports", time.perf_counter() - STARTUP_T0)]
         self.title("Web Automation Tool - Step-by-Step")
         self.geometry("800x700") # Adjust geometry for more space
 
@@ -537,9 +4246,21 @@ class Application(tk.Tk):
         # Configure root window background
         self.configure(bg=self.bg_color)
 
+        # --- Log pipeline: any thread queues messages, the Tk thread shows them in batches ---
+        self.LOG_MAX_LINES = 5000 # Lines kept in the log view (older lines are dropped)
+        self.LOG_DRAIN_INTERVAL_MS = 100
+        self.LOG_FILE_PATH = os.path.join(os.path.abspath("logs"), "provisioning.log")
+        self._log_queue = queue.Queue()
+        self._log_steps = {} # device -> latest status, used as the step of its log records
+        self.file_logger, self._log_file_listener = create_file_logger(self.LOG_FILE_PATH)
+
+        # --- Background work: a bounded worker pool runs it, results reach the Tk thread through the bridge ---
+        self.gui_bridge = TkBridge(self, self.log_message)
+        self.gui_bridge.start()
+        self.workers = BackgroundWorkers(self.gui_bridge.post, self.log_message)
+
         # Global Font - Try "Segoe UI" first, then common sans-serif
-        # Corrected: Use tkFont.families()
-        self.default_font_family = "Segoe UI" if "Segoe UI" in tkFont.families() else "Arial"
+        self.default_font_family = resolve_font_family(self, "Segoe UI", "Arial")
         self.default_font = (self.default_font_family, 10)
         self.bold_font = (self.default_font_family, 10, "bold")
         self.log_font = ("Consolas", 9) # Monospace for logs
@@ -593,17 +4314,53 @@ class Application(tk.Tk):
                        background=[('active', '#208535'), ('disabled', '#404040')],
                        foreground=[('active', 'white'), ('disabled', '#A0A0A0')],
                        relief=[('pressed', 'sunken'), ('!pressed', 'flat')])
+        self._mark_startup("styles")
 
 
         # Initialize core attributes *before* creating widgets that might use them
-        self.automation_thread = None
+        self.automation_future = None # Future of the single-device run on the background workers
+        self.automation_cancel_token = None # CancellationToken of the single-device run
         self.TARGET_URL = "http://setup.com"
         self.COMMAND_TO_EXECUTE = "dfuu -i wlan --multi"
 
+        # --- Local firmware mirror: devices pull the dfuu image from this PC instead of the internet ---
+        self.FIRMWARE_SOURCE = None # http(s) URL or local file of the image; None disables the mirror
+        self.FIRMWARE_SHA256 = None # Expected digest of the image, if known
+        self.FIRMWARE_CACHE_DIR = os.path.abspath("firmware_cache")
+        self.FIRMWARE_MIRROR_PORT = 8070
+        self.FIRMWARE_MIRROR_HOST = None # Address the devices reach this PC at; None guesses the LAN address
+        self.FIRMWARE_COMMAND_TEMPLATE = FIRMWARE_COMMAND_TEMPLATE
+        self.firmware_mirror = None
+        self.firmware_entry = None # FirmwareCache index entry of the mirrored image
+
         # --- Wi-Fi Adapter Name for IP checks/settings ---
-        self.WIFI_ADAPTER_NAME = "Wi-Fi"
+        self.WIFI_ADAPTER_NAME = "Wi-Fi" if sys.platform == "win32" else "wlan0"
+        # PC network control, one of NETWORK_BACKENDS ("fake" runs without touching real adapters)
+        self.NETWORK_BACKEND = "netsh" if sys.platform == "win32" else "linux"
+        # Run the read-only network queries in one long-lived shell instead of starting a new one per query
+        self.PERSISTENT_SHELL = True
+        self.network_backend = create_network_backend(
+            self.NETWORK_BACKEND, self.log_message,
+            **({"persistent_shell": self.PERSISTENT_SHELL} if self.NETWORK_BACKEND != "fake" else {}))
         # Pattern to identify JuiceNet device's Wi-Fi.
         self.JUICENET_SSID_PATTERN = "JuiceNet"
+        # Rejoin the device's SSID automatically after its reboot (the Resume button stays as fallback)
+        self.AUTO_RESUME_ENABLED = True
+
+        # --- Upper-bound budgets (seconds) for the automation's condition-driven waits ---
+        self.WAIT_BUDGETS = dict(DEFAULT_WAIT_BUDGETS)
+        # ECache deletion strategy, one of ECACHE_DELETE_MODES
+        self.ECACHE_DELETE_MODE = "script"
+        # Device file-delete request as (path with {data_id}, method); None until confirmed for the firmware
+        self.ECACHE_DELETE_ENDPOINT = None
+        if self.ECACHE_DELETE_ENDPOINT:
+            set_ecache_delete_endpoint(*self.ECACHE_DELETE_ENDPOINT)
+        # How the device's web UI is driven, one of DEVICE_DRIVER_BACKENDS
+        self.DEVICE_DRIVER_BACKEND = "selenium"
+        # Warm browsers kept by the driver pool (0 disables it) and runs served before one is recycled
+        self.DRIVER_POOL_SIZE = 1
+        self.DRIVER_POOL_MAX_USES = 20
+        self.driver_pool = None
 
         # --- Static IP Configuration ---
         self.TARGET_STATIC_IP = "10.10.10.2"
@@ -611,13 +4368,53 @@ class Application(tk.Tk):
         self.TARGET_GATEWAY = "10.10.10.1"
         self.TARGET_DNS = "10.10.10.1"
 
-        # Flag to track if this program instance set a static IP
-        self.ip_was_set_statically = False
+        # Adapters this program instance set to a static IP (and has not reverted yet)
+        self.static_ip_adapters = set()
         self.automation_finished_flag = False # New flag to indicate automation completion
+        self.automation_device_ssid = "N/A" # JuiceNet SSID the PC was on when automation started
+        self.automation_device_password = ""
 
         # Threading Event for pausing/resuming automation
         self.resume_automation_event = threading.Event()
 
+        # Single owner of PC IP/SSID reads: snapshots are cached for NETWORK_STATUS_TTL seconds and
+        # the status labels follow its change notifications instead of re-reading the adapter per page.
+        self.NETWORK_STATUS_TTL = 5
+        self.network_monitor = NetworkMonitor(self._read_network_status, self.workers, ttl=self.NETWORK_STATUS_TTL)
+        self.network_monitor.subscribe(self._on_network_snapshot_changed)
+        self.network_monitor.start([self.WIFI_ADAPTER_NAME])
+
+        # Background Wi-Fi scan feeding Page 1's list; JuiceNet SSIDs are ranked first by signal and
+        # announced as they appear/disappear. Refresh triggers an immediate scan.
+        self.WIFI_SCAN_INTERVAL = 10
+        self._last_wifi_scan_error = None
+        self.wifi_scanner = WifiScanner(self.network_backend.scan_networks, self.workers, interval=self.WIFI_SCAN_INTERVAL,
+                                        device_pattern=self.JUICENET_SSID_PATTERN)
+        self.wifi_scanner.subscribe(lambda event, network: self.gui_bridge.post(self._on_wifi_network_event, event, network))
+        self.wifi_scanner.subscribe_scans(lambda networks, error: self.gui_bridge.post(self._update_pc_wifi_list_gui, networks, error))
+
+        # Per-run JSON timing reports and the session's per-step p50/p95 summary
+        self.RUN_REPORT_DIR = os.path.abspath("reports")
+        # Completed provisioning steps per device, so a run restarted after a crash skips them
+        self.CHECKPOINT_DIR = os.path.abspath("checkpoints")
+        # Diagnostic captures (one of ARTIFACT_MODES), written per run in the background under a disk cap
+        self.ARTIFACT_DIR = os.path.abspath("artifacts")
+        self.ARTIFACT_MODE = "screenshot"
+        self.ARTIFACT_QUOTA_MB = 200
+        self.artifact_writer = ArtifactWriter(self.ARTIFACT_DIR, self.log_message, mode=self.ARTIFACT_MODE,
+                                              max_bytes=self.ARTIFACT_QUOTA_MB * 1024 * 1024)
+        self.timing_summary = SessionTimingSummary()
+        self.current_run_report = None
+
+        # Batch (multi-device) provisioning state
+        self.batch_scheduler = None
+        self.batch_window = None
+        self.batch_jobs = {} # device_ssid -> DeviceJob
+        self.batch_resume_events = {} # device_ssid -> threading.Event
+        self.batch_cancel_tokens = {} # device_ssid -> CancellationToken
+        # Prepare the next device during each reboot wait
+        self.BATCH_PIPELINED = False
+
         # Determine driver path
         if getattr(sys, 'frozen', False):
             bundle_dir = sys._MEIPASS
@@ -627,27 +4424,72 @@ class Application(tk.Tk):
             self.EDGE_DRIVER_PATH = "C:/Users/ruano/Desktop/msedgedriver.exe"
             # In a real deployed app, you'd want a more robust way to find/distribute the driver
 
-        self.frames = {}
+        self.frames = {} # page class name -> page frame, filled on first show
         self.current_frame = None
 
         self.create_global_widgets() # Widgets that persist across pages
-        self.create_pages() # Create the page frames
+        self._drain_log_queue()
+        self._mark_startup("global widgets")
+        self.wifi_scanner.start()
 
         # Set up a protocol for handling window close (X button)
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
         # Show the first page
         self.show_frame(Page1_PCCheck)
+        self._mark_startup("first page")
+
+        # The driver check and browser pre-launch run once the window is on screen
+        self.after(0, self._finish_startup)
+
+    def _mark_startup(self, label):
+        self.startup_marks.append((label, time.perf_counter() - STARTUP_T0))
+
+    def _finish_startup(self):
+        """Start-up work that can wait until the window has been drawn."""
+        self.update_idletasks()
+        self._mark_startup("window shown")
+        if self.startup_timing:
+            self._report_startup_timing()
+            return
 
         self.log_message(f"Running as {'bundled executable' if getattr(sys, 'frozen', False) else 'Python script'}. Driver path: {self.EDGE_DRIVER_PATH}")
-        if not os.path.exists(self.EDGE_DRIVER_PATH):
+        if self.DEVICE_DRIVER_BACKEND == "selenium" and not os.path.exists(self.EDGE_DRIVER_PATH):
             messagebox.showerror("Driver Error", f"""MSEdgeDriver not found at {self.EDGE_DRIVER_PATH}
 Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly.""")
             self.log_message("--- Driver not found, attempting to quit ---")
             self.quit()
         self.log_message("--- Driver path check passed ---")
+        if self.DEVICE_DRIVER_BACKEND == "selenium" and self.DRIVER_POOL_SIZE > 0 and os.path.exists(self.EDGE_DRIVER_PATH):
+            self.driver_pool = SeleniumDriverPool(self.EDGE_DRIVER_PATH, self.DRIVER_POOL_SIZE,
+                                                  self.DRIVER_POOL_MAX_USES, self.log_message)
+            self.driver_pool.warm_up()
+            self.log_message(f"Pre-launching {self.DRIVER_POOL_SIZE} browser(s) for the driver pool in the background.")
+        if self.FIRMWARE_SOURCE:
+            self.workers.submit(self._start_firmware_mirror)
         self.log_message("\n--- REMEMBER TO RUN THIS SCRIPT AS ADMINISTRATOR FOR PC IP CHANGES! ---")
 
+    def _start_firmware_mirror(self):
+        """Fills the firmware cache (once per image) and starts serving it. Runs on a background worker."""
+        try:
+            cache = FirmwareCache(self.FIRMWARE_CACHE_DIR)
+            entry = cache.add(self.FIRMWARE_SOURCE, expected_sha256=self.FIRMWARE_SHA256)
+            mirror = FirmwareMirror(cache, self.log_message, self.FIRMWARE_MIRROR_PORT, advertised_host=self.FIRMWARE_MIRROR_HOST)
+            mirror.start()
+        except (OSError, ValueError) as e:
+            self.log_message(f"Firmware mirror unavailable, devices will download the image themselves: {e}", level="WARNING")
+            return
+        self.firmware_mirror, self.firmware_entry = mirror, entry
+        self.log_message(f"Firmware '{entry['name']}' ({entry['size']} bytes, SHA-256 {entry['sha256'][:12]}) cached. "
+                         f"Console command: {self.console_command()}")
+
+    def console_command(self, command=None):
+        """command (default COMMAND_TO_EXECUTE), pointed at the firmware mirror once it is serving."""
+        command = command or self.COMMAND_TO_EXECUTE
+        if self.firmware_mirror and self.firmware_entry:
+            return self.firmware_mirror.console_command(command, self.firmware_entry, self.FIRMWARE_COMMAND_TEMPLATE)
+        return command
+
     def create_global_widgets(self):
         """Widgets that remain visible regardless of the current page."""
 
@@ -675,116 +4517,119 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
                                                    font=self.log_font, bd=0, relief='flat') # Dark background, light text for log
         self.text_area.pack(padx=10, pady=(0, 10), fill=tk.BOTH, expand=True)
 
-    def create_pages(self):
-        """Instantiates all page frames and stores them."""
-        for F in (Page1_PCCheck, Page2_DeviceSetup, Page3_Automation, Page4_Cleanup):
-            page_name = F.__name__
-            frame = F(parent=self.container, controller=self)
+    def _report_startup_timing(self):
+        """Logs the start-up milestones (--startup-timing), then closes the application."""
+        self.log_message("\n--- Start-up timing (seconds since launch) ---")
+        previous = 0.0
+        for label, elapsed in self.startup_marks:
+            self.log_message(f"{label}: {elapsed:.3f}s (+{elapsed - previous:.3f}s)")
+            print(f"startup {label}: {elapsed:.3f}s (+{elapsed - previous:.3f}s)")
+            previous = elapsed
+        self.after(self.LOG_DRAIN_INTERVAL_MS * 2, self.destroy) # Let the log view show the report first
+
+    def get_page(self, page_class):
+        """Returns the page frame of page_class, building it on first use. Tk thread only."""
+        page_name = page_class.__name__
+        frame = self.frames.get(page_name)
+        if frame is None:
+            frame = page_class(parent=self.container, controller=self)
             self.frames[page_name] = frame
             frame.grid(row=0, column=0, sticky="nsew")
+        return frame
 
     def show_frame(self, page_class):
         """Brings a specific page frame to the front."""
-        frame = self.frames[page_class.__name__]
+        frame = self.get_page(page_class)
         frame.tkraise()
         self.current_frame = frame
         if hasattr(frame, 'on_show'):
             frame.on_show() # Call a method on the page when it's shown for refreshing content
 
-    def log_message(self, message):
-        """Appends a message to the text_area widget."""
+    def log_message(self, message, level=None, device=None, step=None):
+        """
+        Logs a message. Safe to call from any thread: the message is written as a structured
+        record to the rotating log file and queued for the text_area, which _drain_log_queue
+        fills in batches on the Tk thread.
+        level defaults to ERROR/WARNING for messages starting with those words, INFO otherwise.
+        device/step tag records of a specific device (step defaults to its latest status).
+        """
+        if level is None:
+            prefix = message.lstrip().upper()
+            level = "ERROR" if prefix.startswith("ERROR") else "WARNING" if prefix.startswith("WARNING") else "INFO"
+        if step is None and device is not None:
+            step = self._log_steps.get(device)
+        self.file_logger.log(logging.getLevelName(level), message, extra={"device": device, "step": step})
+        self._log_queue.put(f"[{device}] {message}" if device else message)
+
+    def _drain_log_queue(self):
+        """Moves queued log lines into the text_area in one insert and trims it to LOG_MAX_LINES."""
+        lines = []
         try:
-            self.text_area.insert(tk.END, message + "\n")
+            while len(lines) < 1000:
+                lines.append(self._log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if lines:
+            self.text_area.insert(tk.END, "\n".join(lines) + "\n")
+            line_count = int(self.text_area.index("end-1c").split(".")[0])
+            if line_count > self.LOG_MAX_LINES:
+                self.text_area.delete("1.0", f"{line_count - self.LOG_MAX_LINES + 1}.0")
             self.text_area.see(tk.END) # Auto-scroll to the end
-            self.text_area.update_idletasks() # Update GUI immediately
-        except AttributeError:
-            print(f"LOG_ERROR: text_area not ready: {message}")
-
-
-    def _create_wifi_profile_xml(self, ssid, password):
-        """Generates an XML string for a WPA2-PSK Wi-Fi profile."""
-        xml_template = """<?xml version="1.0"?>
-<WLANProfile xmlns="http://www.microsoft.com/networking/WLAN/profile/v1">
-    <name>{ssid}</name>
-    <SSIDConfig>
-        <SSID>
-            <name>{ssid}</name>
-        </SSID>
-    </SSIDConfig>
-    <connectionMode>auto</connectionMode>
-    <MSM>
-        <security>
-            <authAndCiphers>
-                <authentication>WPA2PSK</authentication>
-                <encryption>AES</encryption>
-                <useOneX>false</useOneX>
-            </authAndCiphers>
-            <sharedKey>
-                <keyType>passPhrase</keyType>
-                <protected>false</protected>
-                <keyMaterial>{password}</keyMaterial>
-            </sharedKey>
-        </security>
-    </MSM>
-</WLANProfile>"""
-        return xml_template.format(ssid=ssid, password=password)
+        self.after(self.LOG_DRAIN_INTERVAL_MS, self._drain_log_queue)
 
 
     def populate_pc_wifi_list_threaded_wrapper(self):
-        """Starts the PC's Wi-Fi scan in a separate thread to keep GUI responsive."""
-        page1 = self.frames["Page1_PCCheck"]
-        page1.pc_wifi_refresh_button.config(state=tk.DISABLED)
-        page1.connect_pc_wifi_button.config(state=tk.DISABLED)
-        self.log_message("\n--- Initiating PC Wi-Fi scan in background... ---")
-        page1.pc_wifi_listbox.delete(0, tk.END)
-        threading.Thread(target=self._scan_pc_wifi_networks_threaded, daemon=True).start()
+        """Asks the background Wi-Fi scanner for an immediate scan; the list updates when it completes."""
+        self.get_page(Page1_PCCheck).pc_wifi_refresh_button.config(state=tk.DISABLED)
+        self.wifi_scanner.scan_now()
 
-    def _scan_pc_wifi_networks_threaded(self):
-        """Performs the netsh scan for PC's Wi-Fi in a separate thread."""
-        ssids = []
-        error_message = None
+    def _scan_pc_wifi_networks_sync(self, adapter_name=None):
+        """
+        Lists the Wi-Fi networks visible to the PC (or to adapter_name only) through the network backend.
+        Returns: (ssids, error_message)
+        """
         try:
-            command = "chcp 65001 && netsh wlan show networks"
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=True,
-                creationflags=subprocess.CREATE_NO_WINDOW,
-                shell=True
-            )
-            output = result.stdout
-            ssids = re.findall(r"SSID \d+ : (.*)", output, re.IGNORECASE)
-
-        except subprocess.CalledProcessError as e:
-            error_message = f"Error running netsh command for PC Wi-Fi scan: {e}\n  Stderr: {e.stderr.strip()}"
-        except FileNotFoundError:
-            error_message = "Error: 'netsh' command not found. This command is specific to Windows."
+            return self.network_backend.scan(adapter_name), None
+        except NetworkBackendError as e:
+            return [], str(e)
         except Exception as e:
-            error_message = f"An unexpected error occurred during PC Wi-Fi scan: {e}"
-
-        self.after(0, self._update_pc_wifi_list_gui, ssids, error_message)
-
-    def _update_pc_wifi_list_gui(self, ssids, error_message):
-        """Updates the GUI with PC Wi-Fi scan results. Runs on the main Tkinter thread."""
-        page1 = self.frames["Page1_PCCheck"]
-        page1.pc_wifi_listbox.delete(0, tk.END)
+            return [], f"An unexpected error occurred during PC Wi-Fi scan: {e}"
 
+    def _update_pc_wifi_list_gui(self, networks, error_message):
+        """
+        Shows the scanner's ranked networks (JuiceNet devices first) on Page 1. Runs on the main Tkinter thread.
+        The selected SSID stays selected across scans; page1.listed_ssids holds the SSID of every row.
+        """
+        page1 = self.get_page(Page1_PCCheck)
+        page1.pc_wifi_refresh_button.config(state=tk.NORMAL)
         if error_message:
-            self.log_message(error_message)
-
-        if ssids:
-            self.log_message(f"Found {len(ssids)} PC Wi-Fi networks.")
-            for i, ssid in enumerate(ssids):
-                page1.pc_wifi_listbox.insert(tk.END, f"{i+1}. {ssid.strip()}")
-            page1.connect_pc_wifi_button.config(state=tk.NORMAL)
+            if error_message != self._last_wifi_scan_error:
+                self.log_message(error_message)
+            self._last_wifi_scan_error = error_message
+            return # Keep the last good list on screen
+        self._last_wifi_scan_error = None
+
+        selection = page1.pc_wifi_listbox.curselection()
+        selected_ssid = page1.listed_ssids[selection[0]] if selection else None
+        page1.pc_wifi_listbox.delete(0, tk.END)
+        page1.listed_ssids = [network.ssid for network in networks]
+        for network in networks:
+            signal = f"{network.signal}%" if network.signal is not None else "?"
+            marker = "  [JuiceNet]" if network.is_device else ""
+            page1.pc_wifi_listbox.insert(tk.END, f"{network.ssid}  ({signal}){marker}")
+        if selected_ssid in page1.listed_ssids:
+            page1.pc_wifi_listbox.selection_set(page1.listed_ssids.index(selected_ssid))
+        page1._on_listbox_select()
+
+    def _on_wifi_network_event(self, event, network):
+        """Logs JuiceNet devices coming into or going out of range. Runs on the main Tkinter thread."""
+        if not network.is_device:
+            return
+        if event == "appeared":
+            signal = f" ({network.signal}%)" if network.signal is not None else ""
+            self.log_message(f"JuiceNet device in range: {network.ssid}{signal}")
         else:
-            if not error_message:
-                self.log_message("No PC Wi-Fi networks found.")
-            page1.connect_pc_wifi_button.config(state=tk.DISABLED)
-
-        page1.pc_wifi_refresh_button.config(state=tk.NORMAL)
-        self.log_message("--- PC Wi-Fi scan finished. ---")
+            self.log_message(f"JuiceNet device out of range: {network.ssid}")
 
         self.get_and_display_current_ip_threaded_wrapper()
 
@@ -796,88 +4641,30 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
         self.log_message(f"\n--- Attempting to connect PC to '{ssid}' ---")
         self.log_message("Note: This feature might require administrator privileges.")
 
-        page1 = self.frames["Page1_PCCheck"]
+        page1 = self.get_page(Page1_PCCheck)
         page1.connect_pc_wifi_button.config(state=tk.DISABLED)
         page1.pc_wifi_refresh_button.config(state=tk.DISABLED)
 
-        # Pass the selected SSID to the threaded function
-        threading.Thread(target=self._connect_pc_to_wifi_threaded, args=(ssid, password), daemon=True).start()
-
-    def _connect_pc_to_wifi_threaded(self, ssid, password):
-        """Attempts to connect PC to a Wi-Fi network using netsh in a separate thread."""
-        success_message = None
-        error_message = None
+        self.workers.submit(self._connect_pc_to_wifi_sync, ssid, password,
+                                 on_done=lambda result: self._update_connect_pc_status_gui(*result))
 
+    def _connect_pc_to_wifi_sync(self, ssid, password, adapter_name=None):
+        """
+        Connects a PC Wi-Fi adapter to ssid through the network backend, adding a WPA2-PSK profile first if a password is given.
+        adapter_name selects the adapter (defaults to whichever adapter the OS picks).
+        Returns: (success_message, error_message)
+        """
         try:
-            if password:
-                # 1. Create XML profile
-                profile_xml = self._create_wifi_profile_xml(ssid, password)
-                profile_temp_path = os.path.join(os.environ["TEMP"], f"{ssid}.xml")
-
-                with open(profile_temp_path, "w") as f:
-                    f.write(profile_xml)
-                self.log_message(f"Created temporary PC Wi-Fi profile XML: {profile_temp_path}")
-
-                # 2. Add the profile
-                add_profile_command = f'netsh wlan add profile filename="{profile_temp_path}" user=current'
-                result_add = subprocess.run(
-                    add_profile_command,
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW,
-                    shell=True
-                )
-                self.log_message(f"PC Profile added output:\n{result_add.stdout.strip()}")
-                self.log_message(f"Successfully added PC Wi-Fi profile for '{ssid}'.")
-
-                # Clean up the temporary XML file
-                if os.path.exists(profile_temp_path):
-                    os.remove(profile_temp_path)
-                    self.log_message(f"Removed temporary PC Wi-Fi profile XML: {profile_temp_path}")
-
-                # 3. Connect to the profile
-                connect_command = f'netsh wlan connect name="{ssid}"'
-                result_connect = subprocess.run(
-                    connect_command,
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW,
-                    shell=True
-                )
-                success_message = f"Successfully sent connect command for PC to '{ssid}'. Check your system's Wi-Fi status.\n{result_connect.stdout.strip()}"
-            else:
-                # No password, use direct connect (for open networks or pre-existing profiles)
-                connect_command = f'netsh wlan connect name="{ssid}"'
-                result_connect = subprocess.run(
-                    connect_command,
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW,
-                    shell=True
-                )
-                success_message = f"Successfully sent connect command for PC to '{ssid}'. Check your system's Wi-Fi status.\n{result_connect.stdout.strip()}"
-
-        except subprocess.CalledProcessError as e:
-            error_message = f"Error during PC Wi-Fi connection attempt: {e}\n  Command: {e.cmd}\n  Return Code: {e.returncode}\n  Stderr: {e.stderr.strip()}"
-            if "Access is denied" in e.stderr:
-                error_message += "\n--- Please ensure the script is run as ADMINISTRATOR! ---"
-            elif "The specified network is not found" in e.stderr and password:
-                error_message += "\n--- Ensure the password is correct or the network supports WPA2-PSK/AES. ---"
-        except FileNotFoundError:
-            error_message = "Error: 'netsh' command or temporary file path not found. This command is specific to Windows."
+            return self.network_backend.connect(ssid, password, adapter_name), None
+        except NetworkBackendError as e:
+            return None, str(e)
         except Exception as e:
-            error_message = f"An unexpected error occurred during PC Wi-Fi connection: {e}"
             import traceback
-            error_message += f"\n{traceback.format_exc()}"
-
-        self.after(0, self._update_connect_pc_status_gui, success_message, error_message)
+            return None, f"An unexpected error occurred during PC Wi-Fi connection: {e}\n{traceback.format_exc()}"
 
     def _update_connect_pc_status_gui(self, success_message, error_message):
         """Updates GUI after a PC connection attempt. Runs on main Tkinter thread."""
-        page1 = self.frames["Page1_PCCheck"]
+        page1 = self.get_page(Page1_PCCheck)
         if success_message:
             self.log_message(success_message)
         elif error_message:
@@ -887,70 +4674,24 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
         page1.pc_wifi_refresh_button.config(state=tk.NORMAL)
         self.log_message("--- PC Wi-Fi connection attempt finished. ---")
 
-        self.get_and_display_current_ip_threaded_wrapper()
-
+        self.get_and_display_current_ip_threaded_wrapper(force=True)
 
-    def get_and_display_current_ip_threaded_wrapper(self):
-        """Starts getting current PC IP and SSID in a separate thread."""
-        self.current_ip_label.config(text="Scanning...")
-        self.connected_ssid_label.config(text="Scanning...")
-        threading.Thread(target=self._get_current_ip_threaded, daemon=True).start()
 
-    def _get_current_ip_threaded(self):
+    def get_and_display_current_ip_threaded_wrapper(self, force=False):
         """
-        Gets the current IP address and connected SSID of the specified Wi-Fi adapter.
-        This runs in a background thread and updates GUI via self.after.
+        Asks the network monitor to refresh the PC IP/SSID display in the background.
+        A snapshot younger than NETWORK_STATUS_TTL is reused unless force is set; the labels
+        are updated by _on_network_snapshot_changed whenever the snapshot changes.
         """
-        ip_address = "N/A"
-        connected_ssid = "N/A"
-        error_message = None
-
-        try:
-            # Command to get detailed network adapter information
-            # Using chcp 65001 for UTF-8 encoding in subprocess output
-            command = f"chcp 65001 && netsh interface ip show config name=\"{self.WIFI_ADAPTER_NAME}\""
-            # self.log_message(f"DEBUG SYNC: _get_current_ip_threaded: Running netsh to get IP config for '{self.WIFI_ADAPTER_NAME}'...")
-            result = subprocess.run(command, capture_output=True, text=True, check=True,
-                                    creationflags=subprocess.CREATE_NO_WINDOW, shell=True)
-            ip_output = result.stdout
-            # self.log_message(f"DEBUG SYNC: _get_current_ip_threaded: IP Config Output:\n{ip_output}")
-
-            # Regex to find IP Address (v4)
-            ip_match = re.search(r"IP Address:\s+((?:\d{1,3}\.){3}\d{1,3})", ip_output)
-            if ip_match:
-                ip_address = ip_match.group(1).strip()
-
-            # Command to get WLAN status (for SSID)
-            command_wlan = f"chcp 65001 && netsh wlan show interfaces"
-            # self.log_message(f"DEBUG SYNC: _get_current_ip_threaded: Running netsh to get status for '{self.WIFI_ADAPTER_NAME}'...")
-            result_wlan = subprocess.run(command_wlan, capture_output=True, text=True, check=True,
-                                        creationflags=subprocess.CREATE_NO_WINDOW, shell=True)
-            wlan_output = result_wlan.stdout
-            # self.log_message(f"DEBUG SYNC: _get_current_ip_threaded: WLAN Status Output:\n{wlan_output}")
-
-            # Regex to find SSID
-            ssid_match = re.search(r"SSID\s+:\s+(.*)", wlan_output)
-            if ssid_match:
-                connected_ssid = ssid_match.group(1).strip()
-            # self.log_message(f"DEBUG SYNC: _get_current_ip_threaded: Extracted SSID: '{connected_ssid}'")
-
-        except subprocess.CalledProcessError as e:
-            error_message = f"Error running netsh command for current IP/SSID: {e}\n  Stderr: {e.stderr.strip()}"
-            # self.log_message(f"ERROR: {error_message}")
-            if "No such interface is supported" in e.stderr or "The specified file was not found" in e.stderr:
-                error_message += "\n--- Ensure your Wi-Fi Adapter Name is correct and exists on your system. ---"
-            elif "Access is denied" in e.stderr:
-                error_message += "\n--- Please ensure the script is run as ADMINISTRATOR! ---"
-        except FileNotFoundError:
-            error_message = "Error: 'netsh' command not found. This command is specific to Windows."
-            # self.log_message(f"ERROR: {error_message}")
-        except Exception as e:
-            error_message = f"An unexpected error occurred getting current IP/SSID: {e}"
-            import traceback
-            error_message += f"\n{traceback.format_exc()}"
-            # self.log_message(f"ERROR: {error_message}")
+        if self.network_monitor.cached(self.WIFI_ADAPTER_NAME) is None:
+            self.current_ip_label.config(text="Scanning...")
+            self.connected_ssid_label.config(text="Scanning...")
+        self.network_monitor.request_refresh(self.WIFI_ADAPTER_NAME, max_age=0 if force else None)
 
-        self.after(0, self._update_ip_display_gui, ip_address, connected_ssid, error_message)
+    def _on_network_snapshot_changed(self, adapter_name, snapshot):
+        """NetworkMonitor subscriber: pushes changes of the main adapter to the status labels."""
+        if adapter_name == self.WIFI_ADAPTER_NAME:
+            self.gui_bridge.post(self._update_ip_display_gui, *snapshot.as_tuple())
 
 
     def _update_ip_display_gui(self, ip_address, connected_ssid, error_message):
@@ -967,121 +4708,93 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
 
 
     def set_static_ip_threaded_wrapper(self):
-        """Starts the static IP setting process in a new thread."""
-        threading.Thread(target=self._set_static_ip_threaded, daemon=True).start()
+        """Sets the static IP in the background."""
+        self.workers.submit(self._set_static_ip_threaded)
 
-    def _set_static_ip_threaded(self):
+    def _set_static_ip_threaded(self, adapter_name=None, show_dialogs=True):
         """
-        Sets a static IP address for the PC's Wi-Fi adapter.
+        Sets a static IP address for the PC's Wi-Fi adapter (adapter_name, default WIFI_ADAPTER_NAME).
         Includes a check for JUICENET_SSID_PATTERN.
+        show_dialogs=False only logs the outcome (used for unattended batch runs).
         """
-        current_ip, connected_ssid, _ = self._get_current_ip_sync() # Get current status synchronously
+        adapter_name = adapter_name or self.WIFI_ADAPTER_NAME
+        def dialog(show):
+            if show_dialogs:
+                self.gui_bridge.post(show)
+        current_ip, connected_ssid, _ = self._get_current_ip_sync(adapter_name, max_age=0) # Get current status synchronously
 
         if not connected_ssid.startswith(self.JUICENET_SSID_PATTERN):
             warning_msg = (f"Warning: PC is currently connected to '{connected_ssid}'. "
                            f"Static IP changes are only allowed for JuiceNet devices (SSIDs starting with '{self.JUICENET_SSID_PATTERN}'). "
                            f"Aborting IP change.")
             self.log_message(warning_msg)
-            self.after(0, lambda: messagebox.showwarning("IP Change Aborted", warning_msg))
-            self.after(0, self.get_and_display_current_ip_threaded_wrapper) # Refresh display
+            dialog(lambda: messagebox.showwarning("IP Change Aborted", warning_msg))
             return
         else:
             self.log_message(f"DEBUG: Condition met: PC is connected to a JuiceNet device ('{connected_ssid}'). Proceeding with static IP change.")
 
-        self.log_message(f"\n--- Attempting to set static IP for PC ({self.WIFI_ADAPTER_NAME})... ---")
+        self.log_message(f"\n--- Attempting to set static IP for PC ({adapter_name})... ---")
         try:
-            command = (
-                f'netsh interface ip set address name="{self.WIFI_ADAPTER_NAME}" static '
-                f'{self.TARGET_STATIC_IP} {self.TARGET_SUBNET_MASK} {self.TARGET_GATEWAY}'
-            )
-            self.log_message(f"Running command: {command}")
-            result = subprocess.run(command, capture_output=True, text=True, check=True,
-                                    creationflags=subprocess.CREATE_NO_WINDOW, shell=True)
-            self.log_message(result.stdout.strip())
-            if result.stderr:
-                self.log_message(f"Stderr from IP set command: {result.stderr.strip()}")
-
-            if self.TARGET_DNS:
-                dns_command = (
-                    f'netsh interface ip set dns name="{self.WIFI_ADAPTER_NAME}" static {self.TARGET_DNS} primary'
-                )
-                self.log_message(f"Running DNS command: {dns_command}")
-                result_dns = subprocess.run(dns_command, capture_output=True, text=True, check=True,
-                                            creationflags=subprocess.CREATE_NO_WINDOW, shell=True)
-                self.log_message(result_dns.stdout.strip())
-                if result_dns.stderr:
-                    self.log_message(f"Stderr from DNS set command: {result_dns.stderr.strip()}")
-
+            self.network_backend.set_static_ip(adapter_name, self.TARGET_STATIC_IP, self.TARGET_SUBNET_MASK,
+                                               self.TARGET_GATEWAY, self.TARGET_DNS)
             self.log_message(f"Successfully set PC's IP to static: {self.TARGET_STATIC_IP}")
-            self.after(0, lambda: messagebox.showinfo("IP Set", f"PC IP successfully set to static {self.TARGET_STATIC_IP}"))
-            self.ip_was_set_statically = True # Set the flag here!
+            dialog(lambda: messagebox.showinfo("IP Set", f"PC IP successfully set to static {self.TARGET_STATIC_IP}"))
+            self.static_ip_adapters.add(adapter_name)
 
-        except subprocess.CalledProcessError as e:
-            error_message = (f"Error setting PC static IP: {e}\n  Command: {e.cmd}\n  Return Code: {e.returncode}\n  "
-                             f"Stderr: {e.stderr.strip()}")
+        except NetworkBackendError as e:
+            error_message = str(e)
             self.log_message(f"ERROR: {error_message}")
-            if "Access is denied" in e.stderr:
-                error_message += "\n--- Please ensure the script is run as ADMINISTRATOR! ---"
-            self.after(0, lambda: messagebox.showerror("IP Set Error", error_message))
-        except FileNotFoundError:
-            error_message = "Error: 'netsh' command not found. This command is specific to Windows."
-            self.log_message(f"ERROR: {error_message}")
-            self.after(0, lambda: messagebox.showerror("IP Set Error", error_message))
+            dialog(lambda: messagebox.showerror("IP Set Error", error_message))
         except Exception as e:
             error_message = f"An unexpected error occurred setting PC static IP: {e}"
             import traceback
             error_message += f"\n{traceback.format_exc()}"
             self.log_message(f"ERROR: {error_message}")
-            self.after(0, lambda: messagebox.showerror("IP Set Error", error_message))
+            dialog(lambda: messagebox.showerror("IP Set Error", error_message))
         finally:
-            self.after(0, self.get_and_display_current_ip_threaded_wrapper) # Always refresh IP display
+            self.network_monitor.request_refresh(adapter_name, max_age=0) # Always refresh IP display
 
     def revert_ip_to_dhcp_threaded_wrapper(self):
-        """Starts the DHCP IP reverting process in a new thread."""
-        threading.Thread(target=self._revert_ip_to_dhcp_threaded, daemon=True).start()
+        """Reverts the IP to DHCP in the background."""
+        self.workers.submit(self._revert_ip_to_dhcp_threaded)
 
-    def _revert_ip_to_dhcp_threaded(self):
+    def _revert_ip_to_dhcp_threaded(self, adapter_name=None, show_dialogs=True, cancel_token=None):
         """
-        Reverts the PC's Wi-Fi adapter IP settings to DHCP.
+        Reverts the PC's Wi-Fi adapter (adapter_name, default WIFI_ADAPTER_NAME) IP settings to DHCP.
         Includes a check for JUICENET_SSID_PATTERN.
+        show_dialogs=False only logs the outcome (used for unattended batch runs).
+        cancel_token (the run's CancellationToken) skips the post-revert verification once cancelled.
         """
-        current_ip, connected_ssid, _ = self._get_current_ip_sync() # Get current status synchronously
+        adapter_name = adapter_name or self.WIFI_ADAPTER_NAME
+        def dialog(show):
+            if show_dialogs:
+                self.gui_bridge.post(show)
+        current_ip, connected_ssid, _ = self._get_current_ip_sync(adapter_name, max_age=0) # Get current status synchronously
 
         if not connected_ssid.startswith(self.JUICENET_SSID_PATTERN):
             warning_msg = (f"Warning: PC is currently connected to '{connected_ssid}'. "
                            f"IP settings can only be reverted for JuiceNet devices (SSIDs starting with '{self.JUICENET_SSID_PATTERN}'). "
                            f"Aborting IP change.")
             self.log_message(warning_msg)
-            self.after(0, lambda: messagebox.showwarning("IP Revert Aborted", warning_msg))
-            self.after(0, self.get_and_display_current_ip_threaded_wrapper) # Refresh display
+            dialog(lambda: messagebox.showwarning("IP Revert Aborted", warning_msg))
             return
 
         self.log_message(f"DEBUG: Condition met: PC is connected to a JuiceNet device ('{connected_ssid}'). Proceeding to revert IP to DHCP.")
 
-        self.log_message(f"\n--- Attempting to revert PC IP to DHCP ({self.WIFI_ADAPTER_NAME})... ---")
+        self.log_message(f"\n--- Attempting to revert PC IP to DHCP ({adapter_name})... ---")
         try:
-            command_ip = f'netsh interface ip set address name="{self.WIFI_ADAPTER_NAME}" dhcp'
-            self.log_message(f"Running command: {command_ip}")
-            result_ip = subprocess.run(command_ip, capture_output=True, text=True, check=True,
-                                       creationflags=subprocess.CREATE_NO_WINDOW, shell=True)
-            self.log_message(f"IP DHCP command stdout: {result_ip.stdout.strip()}")
-            if result_ip.stderr:
-                self.log_message(f"IP DHCP command stderr: {result_ip.stderr.strip()}")
-
-            command_dns = f'netsh interface ip set dns name="{self.WIFI_ADAPTER_NAME}" dhcp'
-            self.log_message(f"Running DNS command: {command_dns}")
-            result_dns = subprocess.run(command_dns, capture_output=True, text=True, check=True,
-                                        creationflags=subprocess.CREATE_NO_WINDOW, shell=True)
-            self.log_message(f"DNS DHCP command stdout: {result_dns.stdout.strip()}")
-            if result_dns.stderr:
-                self.log_message(f"DNS DHCP command stderr: {result_dns.stderr.strip()}")
-
+            self.network_backend.set_dhcp(adapter_name)
             self.log_message("Successfully sent commands to revert PC IP to DHCP.")
 
             # --- VERIFY REVERSION ---
             # Give a moment for the system to process the change
-            time.sleep(2)
-            final_ip, final_ssid, verify_error = self._get_current_ip_sync()
+            if cancel_token and cancel_token.wait(2):
+                self.log_message("Run cancelled; skipping the post-revert IP verification.")
+                self.static_ip_adapters.discard(adapter_name)
+                return
+            if not cancel_token:
+                time.sleep(2)
+            final_ip, final_ssid, verify_error = self._get_current_ip_sync(adapter_name, max_age=0)
             if verify_error:
                 self.log_message(f"ERROR during post-revert IP verification: {verify_error}")
             else:
@@ -1089,83 +4802,65 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
                 # Basic check: if IP is still the static one, it likely failed.
                 if final_ip == self.TARGET_STATIC_IP:
                     self.log_message("WARNING: PC IP still appears to be static after reversion attempt. Reversion likely failed.")
-                    self.after(0, lambda: messagebox.showerror("IP Revert Warning", "PC IP still appears static. Reversion might have failed. Check logs."))
+                    dialog(lambda: messagebox.showerror("IP Revert Warning", "PC IP still appears static. Reversion might have failed. Check logs."))
                 else:
                     self.log_message("PC IP appears to have reverted from static, or was already DHCP.")
-                    self.after(0, lambda: messagebox.showinfo("IP Reverted", "PC IP successfully reverted to DHCP."))
+                    dialog(lambda: messagebox.showinfo("IP Reverted", "PC IP successfully reverted to DHCP."))
 
-            self.ip_was_set_statically = False # Reset the flag
+            self.static_ip_adapters.discard(adapter_name)
 
-        except subprocess.CalledProcessError as e:
-            error_message = (f"Error reverting PC IP to DHCP: {e}\n  Command: {e.cmd}\n  Return Code: {e.returncode}\n  "
-                             f"Stderr: {e.stderr.strip()}")
-            self.log_message(f"ERROR: {error_message}")
-            if "Access is denied" in e.stderr:
-                error_message += "\n--- Please ensure the script is run as ADMINISTRATOR! ---"
-            self.after(0, lambda: messagebox.showerror("IP Revert Error", error_message))
-        except FileNotFoundError:
-            error_message = "Error: 'netsh' command not found. This command is specific to Windows."
+        except NetworkBackendError as e:
+            error_message = str(e)
             self.log_message(f"ERROR: {error_message}")
-            self.after(0, lambda: messagebox.showerror("IP Revert Error", error_message))
+            dialog(lambda: messagebox.showerror("IP Revert Error", error_message))
         except Exception as e:
             error_message = f"An unexpected error occurred reverting PC IP to DHCP: {e}"
             import traceback
             error_message += f"\n{traceback.format_exc()}"
             self.log_message(f"ERROR: {error_message}")
-            self.after(0, lambda: messagebox.showerror("IP Revert Error", error_message))
+            dialog(lambda: messagebox.showerror("IP Revert Error", error_message))
         finally:
-            self.after(0, self.get_and_display_current_ip_threaded_wrapper)
+            self.network_monitor.request_refresh(adapter_name, max_age=0)
 
 
-    def _get_current_ip_sync(self):
+    def _get_current_ip_sync(self, adapter_name=None, max_age=None):
         """
-        Synchronously gets the current IP address and connected SSID of the specified Wi-Fi adapter.
-        Used internally by IP setting functions.
+        Synchronously gets the current IP address and connected SSID of the specified Wi-Fi adapter
+        (adapter_name, default WIFI_ADAPTER_NAME) through the network monitor.
+        A cached snapshot is returned if it is younger than max_age seconds (default NETWORK_STATUS_TTL);
+        pass max_age=0 to force a fresh read.
         Returns: (ip_address, connected_ssid, error_message)
         """
-        ip_address = "N/A"
-        connected_ssid = "N/A"
-        error_message = None
+        adapter_name = adapter_name or self.WIFI_ADAPTER_NAME
+        return self.network_monitor.get_snapshot(adapter_name, max_age).as_tuple()
 
+    def _read_network_status(self, adapter_name):
+        """
+        Reads the IP address and connected SSID of a Wi-Fi adapter through the network backend.
+        Only called by the NetworkMonitor; use _get_current_ip_sync or the monitor elsewhere.
+        Returns: (ip_address, connected_ssid, error_message)
+        """
         try:
-            # Command to get detailed network adapter information
-            command = f"chcp 65001 && netsh interface ip show config name=\"{self.WIFI_ADAPTER_NAME}\""
-            result = subprocess.run(command, capture_output=True, text=True, check=True,
-                                    creationflags=subprocess.CREATE_NO_WINDOW, shell=True)
-            ip_output = result.stdout
-
-            ip_match = re.search(r"IP Address:\s+((?:\d{1,3}\.){3}\d{1,3})", ip_output)
-            if ip_match:
-                ip_address = ip_match.group(1).strip()
-
-            # Command to get WLAN status (for SSID)
-            command_wlan = f"chcp 65001 && netsh wlan show interfaces"
-            result_wlan = subprocess.run(command_wlan, capture_output=True, text=True, check=True,
-                                        creationflags=subprocess.CREATE_NO_WINDOW, shell=True)
-            wlan_output = result_wlan.stdout
-
-            ssid_match = re.search(r"SSID\s+:\s+(.*)", wlan_output)
-            if ssid_match:
-                connected_ssid = ssid_match.group(1).strip()
-
-        except subprocess.CalledProcessError as e:
-            error_message = f"Error running netsh command synchronously for IP/SSID: {e}\n  Stderr: {e.stderr.strip()}"
-        except FileNotFoundError:
-            error_message = "Error: 'netsh' command not found. This command is specific to Windows."
+            ip_address, connected_ssid = self.network_backend.get_status(adapter_name)
+            return ip_address, connected_ssid, None
+        except NetworkBackendError as e:
+            return "N/A", "N/A", str(e)
         except Exception as e:
-            error_message = f"An unexpected error occurred getting current IP/SSID synchronously: {e}"
-
-        return ip_address, connected_ssid, error_message
+            return "N/A", "N/A", f"An unexpected error occurred getting current IP/SSID: {e}"
 
 
     def start_automation(self, target_device_wifi_ssid, target_device_wifi_password):
         """Starts the web automation process in a separate thread."""
-        if self.automation_thread and self.automation_thread.is_alive():
+        if self.automation_running():
             messagebox.showwarning("Automation Running", "Automation is already in progress.")
             return
+        if self.batch_running():
+            messagebox.showwarning("Batch Running", "A batch provisioning run is in progress.")
+            return
 
-        page3 = self.frames["Page3_Automation"]
+        page3 = self.get_page(Page3_Automation)
         page3.start_button.config(state=tk.DISABLED)
+        page3.cancel_button.config(state=tk.NORMAL)
         # Disable all navigation buttons during automation
         for page_name in self.frames:
             page = self.frames[page_name]
@@ -1179,31 +4874,88 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
         self.resume_automation_event.clear() # Clear any previous resume signal
         self.automation_finished_flag = False # Reset automation completion flag
 
-        # Pass the instance method set_static_ip_threaded_wrapper as a callback
-        self.automation_thread = threading.Thread(
-            target=automate_web_actions,
-            args=(
-                self.TARGET_URL,
-                self.EDGE_DRIVER_PATH,
-                self.COMMAND_TO_EXECUTE,
-                self.log_message,
-                self.set_static_ip_threaded_wrapper, # Pass the callback here
-                target_device_wifi_ssid,
-                target_device_wifi_password,
-                self.resume_automation_event, # Pass the threading.Event
-                self # Pass the app instance to update GUI from thread
-            ),
-            daemon=True
+        # Remember which JuiceNet device the PC is on, so auto-resume knows which SSID to wait for
+        snapshot = self.network_monitor.cached(self.WIFI_ADAPTER_NAME)
+        self.automation_device_ssid = snapshot.connected_ssid if snapshot else "N/A"
+        self.automation_device_password = self.get_page(Page1_PCCheck).pc_wifi_password_entry.get()
+        self.current_run_report = RunReport(self.automation_device_ssid)
+        self.automation_cancel_token = CancellationToken()
+        # Only a known device can be checkpointed; an unknown SSID always runs the whole flow
+        checkpoint = None
+        if self.automation_device_ssid.startswith(self.JUICENET_SSID_PATTERN):
+            checkpoint = ProvisioningCheckpoint.load(self.CHECKPOINT_DIR, self.automation_device_ssid, target_device_wifi_ssid)
+
+        # The static IP is set on the automation's own worker so its network commands land in the run report.
+        # automation_finished_callback is delivered to the Tk thread as soon as the run returns.
+        self.automation_future = self.workers.submit(
+            automate_web_actions,
+            self.TARGET_URL,
+            self.EDGE_DRIVER_PATH,
+            self.console_command(),
+            self.log_message,
+            self._set_static_ip_threaded, # Pass the callback here
+            target_device_wifi_ssid,
+            target_device_wifi_password,
+            self.resume_automation_event, # Pass the threading.Event
+            self, # Pass the app instance to update GUI from thread
+            self.WAIT_BUDGETS,
+            self.ECACHE_DELETE_MODE,
+            self.DEVICE_DRIVER_BACKEND,
+            self._on_automation_progress,
+            self.driver_pool,
+            self.current_run_report,
+            checkpoint,
+            self.automation_cancel_token,
+            self.artifact_writer,
+            on_done=lambda succeeded: self.automation_finished_callback()
         )
-        self.automation_thread.start()
-        self.after(100, self.check_automation_thread) # Start checking thread status
+
+    def _on_automation_progress(self, status):
+        """progress_func of the single-device run (called on the automation thread)."""
+        if status != "Waiting for reconnect" or not self.AUTO_RESUME_ENABLED:
+            return
+        if not self.automation_device_ssid.startswith(self.JUICENET_SSID_PATTERN):
+            self.log_message(f"Auto-resume unavailable: the PC was on '{self.automation_device_ssid}', not a JuiceNet "
+                             f"network, when automation started. Reconnect manually and click Resume.")
+            return
+        watcher = self._start_auto_resume(self.automation_device_ssid, self.automation_device_password, self.WIFI_ADAPTER_NAME,
+                                          self.TARGET_URL, self.resume_automation_event, self.log_message)
+        self.automation_cancel_token.on_cancel(watcher.stop)
+
+    def _start_auto_resume(self, device_ssid, device_password, adapter_name, url, resume_event, log_func):
+        """Starts an AutoReconnectWatcher that sets resume_event once the PC is back on device_ssid."""
+        watcher = AutoReconnectWatcher(
+            device_ssid, device_password, adapter_name, url, resume_event,
+            scan_func=self._scan_pc_wifi_networks_sync,
+            connect_func=self._connect_pc_to_wifi_sync,
+            status_func=lambda adapter: self._get_current_ip_sync(adapter, max_age=0),
+            log_func=log_func,
+            workers=self.workers,
+            wait_budgets=self.WAIT_BUDGETS)
+        watcher.start()
+        return watcher
+
+    def cancel_automation(self):
+        """Called when the 'Cancel Run' button is clicked: stops the single-device run at its next step or wait."""
+        if not self.automation_running():
+            return
+        self.log_message("\n--- 'Cancel Run' clicked. Stopping the automation... ---")
+        self.get_page(Page3_Automation).cancel_button.config(state=tk.DISABLED)
+        # Cancel callbacks (browser teardown, watcher stop) may block, so they run off the Tk thread
+        self.workers.submit(self.automation_cancel_token.cancel, "Cancelled by operator")
 
     def resume_automation(self):
         """Called when the 'Resume Script' button is clicked."""
         self.log_message("\n--- 'Resume Script' button clicked. ---")
 
-        # Perform an immediate check on PC's connection status
-        ip_address, connected_ssid, error_message = self._get_current_ip_sync()
+        # Check the PC's connection on the network monitor's thread so the GUI stays responsive
+        self.network_monitor.request_refresh(
+            self.WIFI_ADAPTER_NAME, max_age=0,
+            callback=lambda snapshot: self.gui_bridge.post(self._finish_resume_check, snapshot))
+
+    def _finish_resume_check(self, snapshot):
+        """Resumes the automation if the fresh snapshot shows a JuiceNet connection. Runs on main Tkinter thread."""
+        ip_address, connected_ssid, error_message = snapshot.as_tuple()
 
         if error_message:
             self.log_message(f"ERROR during resume check: {error_message}")
@@ -1215,21 +4967,21 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
         if connected_ssid.startswith(self.JUICENET_SSID_PATTERN):
             self.log_message("PC is connected to a JuiceNet SSID. Resuming automation.")
             self.resume_automation_event.set() # Signal the automation thread to continue
-            # The disable_resume_button will be called by automation_thread.finally block via app_instance.after(0, app_instance.automation_finished_callback)
+            # automate_web_actions disables the resume button; automation_finished_callback runs when it returns
         else:
             self.log_message(f"WARNING: PC is currently connected to '{connected_ssid}'. "
                              f"Please manually connect to a network starting with '{self.JUICENET_SSID_PATTERN}' before resuming.")
             messagebox.showwarning("Not Connected to JuiceNet",
                                    f"Your PC is currently connected to '{connected_ssid}'. "
                                    f"Please connect to a JuiceNet network (e.g., JuiceNet-BC9) before clicking 'Resume'.")
-            self.get_and_display_current_ip_threaded_wrapper() # Refresh PC IP display
 
 
     def automation_finished_callback(self):
         """Called by the automation thread when it finishes."""
         self.log_message("\n--- Automation thread has completed its work. ---")
         self.automation_finished_flag = True
-        self.get_and_display_current_ip_threaded_wrapper() # Refresh PC IP display
+        self._record_run_report(self.current_run_report)
+        self.get_and_display_current_ip_threaded_wrapper(force=True) # Refresh PC IP display
 
         # Re-enable navigation buttons (especially the 'Next' to Page 4)
         for page_name in self.frames:
@@ -1239,24 +4991,211 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
                  page.prev_button.config(state=tk.NORMAL)
 
         # Enable the specific "Next" button on Page 3 and re-enable start button
-        page3 = self.frames["Page3_Automation"]
+        page3 = self.get_page(Page3_Automation)
         if page3.next_button: # Check if it exists
             page3.next_button.config(state=tk.NORMAL)
         page3.start_button.config(state=tk.NORMAL) # Allow restart if desired
         page3.resume_script_button.config(state=tk.DISABLED) # Ensure resume is disabled
+        page3.cancel_button.config(state=tk.DISABLED)
+
+
+    def automation_running(self):
+        return bool(self.automation_future and not self.automation_future.done())
+
+
+    def preinstall_wifi_profiles(self, jobs):
+        """Installs the PC Wi-Fi profiles of the jobs' devices in the background, so later connects skip that step."""
+        credentials = [(job.device_ssid, job.device_password) for job in jobs if job.device_password]
+        if not credentials:
+            return
+
+        def preinstall():
+            installed = self.network_backend.preinstall_profiles(credentials)
+            self.log_message(f"Pre-installed {installed} PC Wi-Fi profile(s); "
+                             f"{len(credentials) - installed} were already up to date or failed.")
+
+        self.workers.submit(preinstall)
 
+    def open_batch_window(self):
+        """Opens (or raises) the batch provisioning window."""
+        if self.batch_window and self.batch_window.winfo_exists():
+            self.batch_window.lift()
+            return
+        self.batch_window = BatchProvisioningWindow(self)
 
-    def check_automation_thread(self):
-        """Checks if the automation thread is still alive."""
-        if self.automation_thread and self.automation_thread.is_alive():
-            # Keep checking as long as it's alive. automation_finished_callback will handle UI updates.
-            self.after(1000, self.check_automation_thread) # Check again in 1 second
-        # If it's not alive, automation_finished_callback has already been called.
+    def batch_running(self):
+        return bool(self.batch_scheduler and self.batch_scheduler.is_running())
 
+    def start_batch(self, jobs, max_workers, pipelined=False):
+        """
+        Starts provisioning jobs in parallel. Returns True if the batch was started.
+        pipelined: overlap each device's reboot wait with preparing the next one (see ProvisioningScheduler).
+        """
+        if self.automation_running():
+            messagebox.showwarning("Automation Running", "Finish the current single-device automation before starting a batch.")
+            return False
+        if self.batch_running():
+            messagebox.showwarning("Batch Running", "A batch provisioning run is already in progress.")
+            return False
+        if not jobs:
+            return False
+
+        self.batch_jobs = {job.device_ssid: job for job in jobs}
+        self.batch_resume_events = {job.device_ssid: threading.Event() for job in jobs}
+        self.batch_cancel_tokens = {job.device_ssid: CancellationToken() for job in jobs}
+        try:
+            scheduler = ProvisioningScheduler(
+                self._run_provisioning_job, max_workers,
+                lambda job, status: self.gui_bridge.post(self._on_batch_progress, job, status),
+                prepare_func=self._prepare_batch_job, pipelined=pipelined)
+        except ValueError as e:
+            messagebox.showwarning("Batch Not Started", str(e))
+            return False
+        self.log_message(f"\n--- Starting batch provisioning of {len(jobs)} device(s), up to {max_workers} in parallel"
+                         f"{', pipelined' if pipelined else ''} ---")
+        self.batch_scheduler = scheduler
+        self.batch_scheduler.start(jobs)
+        return True
+
+    def provisioning_settings(self):
+        """Returns the current settings as the ProvisioningSettings used by provision_device."""
+        return ProvisioningSettings(url=self.TARGET_URL, command=self.COMMAND_TO_EXECUTE, adapter=self.WIFI_ADAPTER_NAME,
+                                    webdriver_path=self.EDGE_DRIVER_PATH, wait_budgets=self.WAIT_BUDGETS,
+                                    ecache_delete_mode=self.ECACHE_DELETE_MODE, driver_backend=self.DEVICE_DRIVER_BACKEND,
+                                    checkpoint_dir=self.CHECKPOINT_DIR, firmware_command=self.console_command)
+
+    def _prepare_batch_job(self, job):
+        """
+        Readies a queued batch job while the device ahead of it reboots (prepare_func of a pipelined
+        ProvisioningScheduler): validates its manifest entry, installs its PC Wi-Fi profile and warms a browser.
+        """
+        for problem in validate_device_job(job, self.JUICENET_SSID_PATTERN):
+            self.log_message(f"Manifest entry: {problem}", level="WARNING", device=job.device_ssid)
+        if job.device_password:
+            self.network_backend.preinstall_profiles([(job.device_ssid, job.device_password)])
+        if self.driver_pool and self.DEVICE_DRIVER_BACKEND == "selenium":
+            self.driver_pool.prewarm()
+        self.log_message("Prepared during the previous device's reboot.", device=job.device_ssid)
+
+    def _run_provisioning_job(self, job, progress):
+        """
+        Provisions one DeviceJob on its own adapter through provision_device. Runs on a scheduler worker thread.
+        """
+        log_func = lambda message: self.log_message(message, device=job.device_ssid)
+        cancel_token = self.batch_cancel_tokens[job.device_ssid]
+        cancel_token.raise_if_cancelled() # Cancelled while queued
+        report = RunReport(job.device_ssid)
+        with report.activate():
+            succeeded = provision_device(
+                job, self.provisioning_settings(), log_func, progress, self.batch_resume_events[job.device_ssid],
+                connect_func=self._connect_pc_to_wifi_sync,
+                status_func=lambda adapter: self._get_current_ip_sync(adapter, max_age=0),
+                set_static_ip_func=lambda adapter: self._set_static_ip_threaded(adapter, show_dialogs=False),
+                revert_ip_func=lambda adapter: self._revert_ip_to_dhcp_threaded(adapter, show_dialogs=False,
+                                                                                cancel_token=cancel_token),
+                auto_resume_func=(lambda job, adapter, resume_event: self._start_auto_resume(
+                    job.device_ssid, job.device_password, adapter, job.url or self.TARGET_URL, resume_event, log_func))
+                    if self.AUTO_RESUME_ENABLED else None,
+                driver_pool=self.driver_pool,
+                run_report=report,
+                cancel_token=cancel_token,
+                artifact_writer=self.artifact_writer)
+        if report.succeeded is None: # Skipped before automate_web_actions ran
+            report.finish(False)
+        self._record_run_report(report)
+        return succeeded
+
+    def _record_run_report(self, report):
+        """Saves a finished run's JSON report and updates the session step summary. Safe from any thread."""
+        if report is None or report.succeeded is None:
+            return
+        self.timing_summary.add(report)
+        try:
+            path = report.save(self.RUN_REPORT_DIR)
+            self.timing_summary.save(os.path.join(self.RUN_REPORT_DIR, "session_summary.json"))
+            self.log_message(f"Run report saved: {path}", device=report.device)
+        except OSError as e:
+            self.log_message(f"WARNING: Could not save the run report: {e}", device=report.device)
+        self.timing_summary.log_summary(self.log_message)
+
+    def _on_batch_progress(self, job, status):
+        """Receives batch job status changes. Runs on the main Tkinter thread."""
+        self._log_steps[job.device_ssid] = status
+        self.log_message(f"Status: {status}", device=job.device_ssid)
+        if self.batch_window and self.batch_window.winfo_exists():
+            self.batch_window.update_status(job, status)
+        if status in FINAL_JOB_STATUSES and not self.batch_running():
+            results = self.batch_scheduler.results
+            succeeded = sum(1 for ok in results.values() if ok)
+            self.log_message(f"\n--- Batch provisioning finished: {succeeded}/{len(results)} device(s) succeeded ---")
+            self.get_and_display_current_ip_threaded_wrapper(force=True)
+
+    def cancel_batch_job(self, device_ssid):
+        """Cancels one batch job, queued or running; it reverts its adapter and finishes as "Cancelled"."""
+        self.log_message("Cancelling...", device=device_ssid)
+        self.batch_resume_events[device_ssid].set() # A job paused for a manual reconnect has nothing left to wait for
+        self.workers.submit(self.batch_cancel_tokens[device_ssid].cancel, "Cancelled by operator")
+
+    def resume_batch_job(self, device_ssid):
+        """Reconnects a paused batch job's adapter to its device, then lets the job continue."""
+        job = self.batch_jobs[device_ssid]
+        adapter = job.adapter or self.WIFI_ADAPTER_NAME
+
+        def reconnect_and_resume():
+            success_message, error_message = self._connect_pc_to_wifi_sync(job.device_ssid, job.device_password, adapter)
+            if error_message:
+                self.log_message(f"Could not reconnect '{adapter}': {error_message}", level="ERROR", device=device_ssid)
+                self.gui_bridge.post(self._on_batch_progress, job, "Waiting for reconnect")
+                return
+            self.log_message(f"Reconnected '{adapter}'. Resuming.", device=device_ssid)
+            self.batch_resume_events[device_ssid].set()
+
+        self.log_message(f"Reconnecting adapter '{adapter}' to the device...", device=device_ssid)
+        self.workers.submit(reconnect_and_resume)
+
+
+    def destroy(self):
+        """Closes the driver pool's browsers, the network monitor, Wi-Fi scanner, background workers, firmware mirror and backend, and flushes the artifacts and log file along with the window."""
+        for token in self.batch_cancel_tokens.values():
+            token.cancel("Application closing")
+        if self.driver_pool:
+            self.driver_pool.close()
+        self.network_monitor.stop()
+        self.wifi_scanner.stop()
+        self.workers.stop()
+        if self.firmware_mirror:
+            self.firmware_mirror.stop()
+        self.artifact_writer.close()
+        self.network_backend.close()
+        self._log_file_listener.stop()
+        super().destroy()
+
+    BATCH_EXIT_TIMEOUT = 30 # Seconds closing the app waits for cancelled batch lanes to revert their adapters
+
+    def _stop_batch_for_exit(self):
+        """
+        Asks before closing over a running batch, then cancels its jobs and waits (up to BATCH_EXIT_TIMEOUT)
+        for the lanes to revert their adapters. Returns False if the user chose to keep the batch running.
+        """
+        if not self.batch_running():
+            return True
+        if not messagebox.askyesno("Confirm Exit", "A batch provisioning run is still in progress.\n"
+                                   "Cancel it, revert its adapters to DHCP and quit?"):
+            return False
+        self.log_message("Cancelling the batch before closing; waiting for its adapters to be reverted...")
+        for token in self.batch_cancel_tokens.values():
+            token.cancel("Application closing")
+        self.batch_scheduler.wait(self.BATCH_EXIT_TIMEOUT)
+        if self.batch_running():
+            self.log_message(f"WARNING: Batch lanes did not finish within {self.BATCH_EXIT_TIMEOUT}s; "
+                             f"adapters {sorted(self.static_ip_adapters)} may keep their static IP.")
+        return True
 
     def on_exit(self):
         """Handles graceful exit of the application when 'Exit' button is clicked."""
-        if self.ip_was_set_statically:
+        if not self._stop_batch_for_exit():
+            return
+        if self.static_ip_adapters:
             # Check current page and if it's not Page4_Cleanup
             if self.current_frame.__class__ != Page4_Cleanup:
                 response = messagebox.askyesno(
@@ -1272,11 +5211,11 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
                 else:
                     self.log_message("WARNING: User chose to exit without reverting PC IP to DHCP. IP may remain static.")
 
-        if self.automation_thread and self.automation_thread.is_alive():
+        if self.automation_running():
             if messagebox.askyesno("Confirm Exit", "Automation is still running. Do you want to force quit?"):
                 self.log_message("Force quitting application and trying to terminate automation thread.")
-                self.resume_automation_event.set() # Unblock if it's waiting
-                self.automation_thread.join(timeout=3) # Give it a moment to react
+                self.automation_cancel_token.cancel("Application closing") # Stops it at its next step or wait
+                concurrent.futures.wait([self.automation_future], timeout=3) # Give it a moment to react
                 self.destroy() # Close the Tkinter window
             else:
                 return # User cancelled exit
@@ -1290,7 +5229,9 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
         This method is called when the Tkinter window's X button is clicked.
         It prompts the user to revert IP if it was set by the program.
         """
-        if self.ip_was_set_statically:
+        if not self._stop_batch_for_exit():
+            return
+        if self.static_ip_adapters:
             response = messagebox.askyesno(
                 "Confirm Exit - IP Not Reverted!",
                 "Your PC's IP was set to static by this program and has NOT been reverted to DHCP.\n"
@@ -1304,12 +5245,12 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
             else:
                 self.log_message("WARNING: User chose to close window without reverting PC IP to DHCP. IP may remain static.")
 
-        if self.automation_thread and self.automation_thread.is_alive():
+        if self.automation_running():
             # If automation is running, prompt for force quit
             if messagebox.askyesno("Confirm Exit", "Automation is still running. Do you want to force quit?"):
                 self.log_message("Force quitting application and trying to terminate automation thread.")
-                self.resume_automation_event.set() # Unblock if it's waiting
-                self.automation_thread.join(timeout=3) # Give it a moment to react
+                self.automation_cancel_token.cancel("Application closing") # Stops it at its next step or wait
+                concurrent.futures.wait([self.automation_future], timeout=3) # Give it a moment to react
                 self.destroy()
             else:
                 return # User cancelled closing
@@ -1317,6 +5258,44 @@ Please ensure 'msedgedriver.exe' is in the correct location or bundled correctly
             self.log_message("Destroying Tkinter window.")
             self.destroy() # Close the Tkinter window
 
-if __name__ == "__main__":
-    app = Application()
+def main():
+    parser = argparse.ArgumentParser(description="JuiceNet device provisioning tool.")
+    parser.add_argument("--startup-timing", action="store_true",
+                        help="Report how long each start-up stage took, then exit.")
+    batch = parser.add_argument_group("headless batch mode (no GUI)")
+    batch.add_argument("--batch", metavar="MANIFEST", help="Provision the devices of this CSV manifest unattended.")
+    batch.add_argument("--results", default="batch_results.json", help="JSON file receiving per-device results and timings.")
+    batch.add_argument("--workers", type=int, default=1,
+                       help=f"Devices provisioned in parallel (one per adapter); at most {ProvisioningScheduler.MAX_LANES} for now.")
+    batch.add_argument("--pipeline", action="store_true",
+                       help="Prepare the next device during each reboot wait.")
+    batch.add_argument("--adapter", default="Wi-Fi" if sys.platform == "win32" else "wlan0",
+                       help="PC Wi-Fi adapter for manifest rows without one.")
+    batch.add_argument("--network-backend", choices=NETWORK_BACKENDS, default="netsh" if sys.platform == "win32" else "linux")
+    batch.add_argument("--driver-backend", choices=DEVICE_DRIVER_BACKENDS, default="selenium")
+    batch.add_argument("--webdriver", default=None, help="msedgedriver path (selenium driver backend).")
+    batch.add_argument("--ecache-delete-endpoint", metavar="PATH", default=None,
+                       help="Device file-delete path with a {data_id} placeholder, e.g. /delete?id={data_id}. "
+                            "Needed by the http driver backend; unset, the http delete mode drives the page UI.")
+    batch.add_argument("--ecache-delete-method", default="POST", help="HTTP method of --ecache-delete-endpoint.")
+    batch.add_argument("--artifacts", choices=ARTIFACT_MODES, default="screenshot",
+                       help="Diagnostic captures on errors: PNG screenshots, DOM snapshots, both or none.")
+    batch.add_argument("--artifact-quota-mb", type=int, default=200, help="Disk cap of the artifacts directory.")
+    mirror = parser.add_argument_group("local firmware mirror (headless batch mode)")
+    mirror.add_argument("--firmware", metavar="SOURCE",
+                        help="http(s) URL or local file of the dfuu image; cached once and served to the devices.")
+    mirror.add_argument("--firmware-sha256", default=None, help="Expected SHA-256 of the image.")
+    mirror.add_argument("--firmware-cache", default="firmware_cache", help="Directory of the content-addressed cache.")
+    mirror.add_argument("--mirror-port", type=int, default=8070)
+    mirror.add_argument("--mirror-host", default=None, help="Address the devices reach this PC at (default: guessed LAN address).")
+    mirror.add_argument("--firmware-command", default=FIRMWARE_COMMAND_TEMPLATE,
+                        help="Console command template with {command}, {url} and {sha256}.")
+    args = parser.parse_args()
+    if args.batch:
+        sys.exit(run_headless_batch(args))
+    app = Application(startup_timing=args.startup_timing)
     app.mainloop()
+
+
+if __name__ == "__main__":
+    main()